@@ -1,12 +1,10 @@
 import streamlit as st
-import pandas as pd
-import matplotlib.pyplot as plt
 
-# Importa las funciones de tus módulos
-from modules.monthly_comparison import show_monthly_comparison
-from modules.historical_averages import show_historical_averages
-from modules.extreme_analysis import show_extreme_analysis
-from modules.annual_comparison import show_annual_comparison
+# Importa las funciones de tus módulos (las vistas se importan al elegirlas)
+from modules.views import VIEWS, load_view, view_arguments
+from modules.stations import StationRegistry, station_label
+from modules.debug_panel import debug_enabled, show_debug_panel
+from modules.telemetry import TELEMETRY, span
 
 # --- Configuración básica de la página ---
 st.set_page_config(
@@ -17,115 +15,103 @@ st.set_page_config(
 
 st.title("☀️ MeteoAnalitica: Análisis de Datos Climáticos")
 
-# --- Carga de datos (Cacheado para eficiencia) ---
-CSV_FILE = "data/datos_clima.csv"
+# Cada ejecución es una traza con los tiempos de cada etapa (ver
+# modules/telemetry.py); la vista y la estación se añaden al conocerlas
+trace = TELEMETRY.start_trace("ejecucion")
 
-@st.cache_data
-def load_data(file_path):
+# --- Carga de datos (Cacheado para eficiencia) ---
+# Cada CSV de la carpeta data/ es una estación (mismo formato de columnas)
+DATA_DIR = "data"
+
+# Registro de estaciones compartido por todas las sesiones (datos + cubo
+# climatológico + índice de extremos de cada una). Los CSV se leen en
+# paralelo la primera vez; después, en cada ejecución solo se comprueba si
+# han cambiado y los registros añadidos al final se incorporan sin volver a
+# procesar el histórico.
+@st.cache_resource
+def get_registry(data_dir):
+    return StationRegistry(data_dir)
+
+def load_data(data_dir):
     try:
-        df = pd.read_csv(file_path, parse_dates=['DAY'], dayfirst=True, decimal=',')
-        # Asegurarse de que Mes y Año están disponibles si no los creas en el módulo
-        df['Mes'] = df['DAY'].dt.month
-        df['Año'] = df['DAY'].dt.year
-        return df
+        registry = get_registry(data_dir)
+        registry.refresh()
     except FileNotFoundError:
-        st.error(f"Error: El archivo {file_path} no se encontró. Asegúrate de que esté en la carpeta 'data/'.")
-        return pd.DataFrame()
-    except Exception as e:
-        st.error(f"Error al cargar los datos: {e}. Revisa el formato de tu CSV y los nombres de las columnas.")
+        st.error(f"Error: La carpeta {data_dir} no se encontró. Asegúrate de que tus CSV estén en la carpeta 'data/'.")
+        return None
+    for station_id, e in registry.errors.items():
+        st.error(f"Error al cargar los datos de {station_label(station_id)}: {e}. Revisa el formato de tu CSV y los nombres de las columnas.")
         st.info("Asegúrate de que la columna de fecha se llama 'DAY' y que el formato sea compatible (DD/MM/AAAA si usas dayfirst=True).")
-        return pd.DataFrame()
+    return registry
 
-df = load_data(CSV_FILE)
+with span("datos"):
+    registry = load_data(DATA_DIR)
 
-if df.empty:
-    st.warning("No se pudieron cargar los datos o el archivo está vacío. Por favor, revisa el CSV.")
+if registry is None or not registry.stations():
+    st.warning("No se pudieron cargar los datos o no hay ningún CSV en la carpeta 'data/'. Por favor, revisa los ficheros.")
     st.stop() # Detiene la ejecución si no hay datos
 
+# --- Selección de estación (común a todas las vistas) ---
+station_ids = registry.stations()
+if len(station_ids) > 1:
+    selected_station = st.sidebar.selectbox("Estación:", options=station_ids, format_func=station_label)
+else:
+    selected_station = station_ids[0]
+dataset = registry.get(selected_station)
+trace.labels["estacion"] = selected_station
+
+# Vista del DataFrame compartido: no se copian datos en cada ejecución
+with span("vista_df"):
+    df = dataset.view()
+cube = dataset.cube
+
+# Cubos del resto de estaciones, para las comparaciones entre estaciones
+other_stations = {station_label(sid): registry.get(sid) for sid in station_ids if sid != selected_station}
+
 # --- Barra Lateral de Navegación ---
-st.sidebar.info("MeteoAnalitica: Tu herramienta para explorar el clima de La Pobla Tornesa.")
+st.sidebar.info(f"MeteoAnalitica: Tu herramienta para explorar el clima de {station_label(selected_station)}.")
+# Avisos del control de calidad hecho al cargar los datos (ver el dashboard)
+calidad = dataset.quality.summary()
+avisos = [
+    f"{calidad['dias_sin_registro']} días sin registro" if calidad['dias_sin_registro'] else "",
+    f"{calidad['dias_repetidos']} días repetidos" if calidad['dias_repetidos'] else "",
+    f"{calidad['lecturas_fuera_de_rango']} lecturas fuera de rango" if calidad['lecturas_fuera_de_rango'] else "",
+]
+if any(avisos):
+    st.sidebar.caption("Calidad de los datos: " + ", ".join(a for a in avisos if a))
 st.sidebar.markdown("---")
 
 st.sidebar.title("Navegación")
-options = ["Dashboard ultimos registros", "Comparación Mensual Detallada", "Promedios Históricos", "Análisis de Extremos Climáticos", "Comparación Anual"] # ¡Añade la nueva opción!
+# Las opciones salen del registro de vistas; cada vista se importa la primera
+# vez que se elige (ver modules/views.py)
+options = list(VIEWS)
 choice = st.sidebar.radio("Ir a:", options)
+trace.labels["vista"] = choice
 
 # --- Contenido Principal Basado en la Selección del Menú ---
 
-if choice == "Dashboard ultimos registros":
-    st.header("📊 Dashboard ultimos registros")
-    st.write("Aquí se muestran los análisis clave del mes más reciente disponible en tus datos.")
-
-    if not df.empty:
-        # Encuentra la fecha más reciente
-        latest_date = df['DAY'].max()
-        # Filtra los datos del último mes
-        df_latest_month = df[(df['DAY'].dt.month == latest_date.month) & (df['DAY'].dt.year == latest_date.year)].copy()
-
-        if not df_latest_month.empty:
-            st.write(f"**Últimos 7 registros disponibles:**") # Cambiado para mostrar los últimos 7 registros
-            # Ocultar columnas específicas
-            columns_to_hide = ['RECORD_NUMBER', 'Mes', 'Año']
-            columns_to_show = [col for col in df_latest_month.columns if col not in columns_to_hide]
-            df_display = df_latest_month[columns_to_show].copy()
-            if 'DAY' in df_display.columns:
-                df_display['DAY'] = df_display['DAY'].dt.strftime('%d/%m/%Y') # Formato DD/MM/AAAA
-            # Mostrar solo los últimos 7 registros
-            df_display = df_display.tail(7)
-            st.dataframe(df_display, hide_index=True) # Muestra los últimos 7 registros sin las columnas ocultas y sin el índice
-
-            # --- Ejemplo de visualización para el dashboard del último mes ---
-            # Puedes personalizar esto con los gráficos y métricas que quieras
-            st.subheader("Temperaturas Diarias del Último Mes")
-            
-            # Asegúrate de que 'Temperatura_Maxima' y 'Temperatura_Minima' (o similar) existen en tu CSV
-            # Adapta estos nombres a tus columnas reales
-            temperatura_cols = [col for col in ['TEMP_MAX', 'TEMP_MIN', 'TEMP_MEDIA'] if col in df_latest_month.columns]
-
-            if temperatura_cols:
-                fig, ax = plt.subplots(figsize=(12, 6))
-                for col in temperatura_cols:
-                    ax.plot(df_latest_month['DAY'].dt.day, df_latest_month[col], label=col.replace('_', ' '))
-                
-                ax.set_title(f'Temperaturas Diarias en {latest_date.strftime("%B de %Y")}')
-                ax.set_xlabel('Día del Mes')
-                ax.set_ylabel('Temperatura (°C)') # Ajusta la unidad según tus datos
-                ax.legend()
-                ax.grid(True)
-                st.pyplot(fig)
-            else:
-                st.warning("No se encontraron columnas de temperatura para mostrar en el dashboard.")
-
-            st.subheader("Resumen Estadístico del Último Mes")
-            st.write(df_latest_month.describe())
-
-        else:
-            st.warning("No se encontraron datos para el mes más reciente.")
-    
-elif choice == "Comparación Mensual Detallada":
-    if not df.empty:
-        # Llamada a la función del módulo de comparación mensual
-        show_monthly_comparison(df.copy()) # Pasa una copia para evitar SettingWithCopyWarning
-    else:
-        st.error("No hay datos cargados para realizar la comparación mensual.")
-
-elif choice == "Promedios Históricos":
-    if not df.empty:
-        # Llamada a la función del módulo de promedios históricos
-        show_historical_averages(df.copy()) # Pasa una copia para evitar SettingWithCopyWarning
-    else:
-        st.error("No hay datos cargados para calcular promedios históricos.")
-    
-elif choice == "Análisis de Extremos Climáticos":
-    if not df.empty:
-        # Llamada a la función del módulo de análisis de extremos
-        show_extreme_analysis(df.copy()) # Pasa una copia para evitar SettingWithCopyWarning
-    else:
-        st.error("No hay datos cargados para realizar el análisis de extremos climáticos.")
-
-elif choice == "Comparación Anual":
-    if not df.empty:
-        # Llamada a la función del módulo de comparación anual
-        show_annual_comparison(df.copy()) # Pasa una copia para evitar SettingWithCopyWarning
-    else:
-        st.error("No hay datos cargados para realizar la comparación anual.")
\ No newline at end of file
+# Datos comunes que reciben las vistas. Todas usan la vista compartida del
+# DataFrame: los módulos no lo modifican.
+context = {
+    "df": df,
+    "cube": cube,
+    "extremes": dataset.extremes,
+    "detail": dataset.detail,
+    "rolling": dataset.rolling,
+    "quality": dataset.quality,
+    "dashboard": dataset.dashboard,
+    "version": dataset.version,
+    "other_stations": other_stations,
+}
+if not df.empty:
+    with span("importar_vista"):
+        show_view = load_view(choice)
+    with span("vista"):
+        show_view(*view_arguments(choice, context))
+elif VIEWS[choice].get("sin_datos"):
+    st.error(VIEWS[choice]["sin_datos"])
+
+TELEMETRY.finish_trace(trace)
+if debug_enabled():
+    # Después de la vista, para que los contadores incluyan esta ejecución
+    show_debug_panel(trace, dataset.last_load)
@@ -0,0 +1,114 @@
+# benchmarks/bench_import.py
+# Tiempo de importación al arrancar la aplicación: los módulos que importa
+# app.py al principio (las vistas se cargan al elegirlas, ver
+# modules/views.py) frente a importar todas las vistas de entrada, y coste de
+# la primera selección de cada vista.
+#
+#   python benchmarks/bench_import.py [--repeticiones 7] [--json]
+#
+# Cada medida se hace en un intérprete nuevo con python -X importtime, con
+# streamlit ya importado (lo importa siempre la aplicación) para contar
+# solo lo que añaden nuestros módulos.
+import argparse
+import ast
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def startup_modules(app_file=os.path.join(ROOT, "app.py")):
+    # Módulos propios que importa app.py al arrancar (las importaciones de
+    # primer nivel), leídos del propio fichero para que la lista no se quede
+    # desfasada
+    with open(app_file, encoding="utf-8") as f:
+        arbol = ast.parse(f.read())
+    modulos = []
+    for nodo in arbol.body:
+        if isinstance(nodo, ast.ImportFrom) and nodo.module:
+            nombres = [nodo.module]
+        elif isinstance(nodo, ast.Import):
+            nombres = [alias.name for alias in nodo.names]
+        else:
+            continue
+        modulos += [m for m in nombres if m.startswith("modules.") and m not in modulos]
+    return modulos
+
+
+# Lo que importa app.py al arrancar
+STARTUP_MODULES = startup_modules()
+# Módulos pesados cuya carga interesa vigilar
+HEAVY_MODULES = ["matplotlib", "matplotlib.pyplot", "matplotlib.dates", "pandas", "pyarrow"]
+
+_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def import_profile(preload, modules):
+    # (microsegundos de importar 'modules' habiendo importado 'preload',
+    # módulos cargados al hacerlo)
+    codigo = "; ".join(f"import {m}" for m in ["streamlit"] + preload)
+    codigo += "; import sys; sys.stderr.write('---\\n'); " + "; ".join(f"import {m}" for m in modules)
+    salida = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", codigo],
+        check=True, capture_output=True, text=True, cwd=ROOT,
+    ).stderr
+    total, cargados = 0, set()
+    for linea in salida.split("---\n", 1)[1].splitlines():
+        encontrado = _LINE.match(linea)
+        if not encontrado:
+            continue
+        cargados.add(encontrado.group(4))
+        if len(encontrado.group(3)) == 1:  # importación de primer nivel
+            total += int(encontrado.group(2))
+    return total, cargados
+
+
+def measure(preload, modules, repeats):
+    tiempos, cargados = [], set()
+    for _ in range(repeats):
+        total, cargados = import_profile(preload, modules)
+        tiempos.append(total)
+    return {
+        "ms": round(statistics.median(tiempos) / 1000, 1),
+        "pesados": [m for m in HEAVY_MODULES if m in cargados],
+    }
+
+
+def main():
+    from modules.views import VIEWS
+
+    parser = argparse.ArgumentParser(description="Tiempo de importación de la aplicación")
+    parser.add_argument("--repeticiones", type=int, default=7)
+    parser.add_argument("--json", action="store_true", help="Muestra el resultado en JSON")
+    args = parser.parse_args()
+
+    vistas = [vista["module"] for vista in VIEWS.values()]
+    informe = {
+        "arranque_perezoso": measure([], STARTUP_MODULES, args.repeticiones),
+        "arranque_todas_las_vistas": measure([], STARTUP_MODULES + vistas, args.repeticiones),
+        "primera_seleccion": {
+            etiqueta: measure(STARTUP_MODULES, [vista["module"]], args.repeticiones)
+            for etiqueta, vista in VIEWS.items()
+        },
+    }
+    if args.json:
+        print(json.dumps(informe, indent=2, ensure_ascii=False))
+        return
+
+    perezoso = informe["arranque_perezoso"]
+    todas = informe["arranque_todas_las_vistas"]
+    print(f"Arranque (solo registro de vistas): {perezoso['ms']:8.1f} ms  {', '.join(perezoso['pesados'])}")
+    print(f"Arranque (todas las vistas):        {todas['ms']:8.1f} ms  {', '.join(todas['pesados'])}")
+    print(f"Ahorro al arrancar:                 {todas['ms'] - perezoso['ms']:8.1f} ms")
+    print("Primera selección de cada vista:")
+    for etiqueta, medida in informe["primera_seleccion"].items():
+        print(f"  {etiqueta:<34} {medida['ms']:8.1f} ms  {', '.join(medida['pesados'])}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+# benchmarks/bench_memory.py
+# Memoria por ejecución de las vistas con el DataFrame compartido frente a
+# pasar una copia completa a cada vista (como hacía app.py con df.copy()).
+#
+#   python benchmarks/bench_memory.py [ruta_csv] [--reruns N]
+#
+# Cada modo se mide en un proceso separado para que el pico de RSS
+# (ru_maxrss) no se mezcle entre ellos.
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+
+def _rss_mb():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+
+
+def _peak_rss_mb():
+    # En Linux ru_maxrss está en KiB
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_mode(csv_file, mode, reruns):
+    import st_stub
+    st_stub.install()
+
+    from modules.dataset import Dataset
+    from modules.annual_comparison import show_annual_comparison
+    from modules.extreme_analysis import show_extreme_analysis
+    from modules.historical_averages import show_historical_averages
+    from modules.monthly_comparison import show_monthly_comparison
+
+    dataset = Dataset(csv_file)
+    vistas = [
+        ("monthly_comparison", lambda df: show_monthly_comparison(df, dataset.cube)),
+        ("historical_averages", lambda df: show_historical_averages(df, dataset.cube)),
+        ("extreme_analysis", lambda df: show_extreme_analysis(df, dataset.extremes)),
+        ("annual_comparison", lambda df: show_annual_comparison(df, dataset.cube)),
+    ]
+    rss_inicial = _rss_mb()
+    picos = {nombre: [] for nombre, _ in vistas}
+    for _ in range(reruns):
+        for nombre, vista in vistas:
+            tracemalloc.start()
+            df = dataset.df.copy() if mode == "copia" else dataset.view()
+            vista(df)
+            del df
+            picos[nombre].append(tracemalloc.get_traced_memory()[1] / 2**20)
+            tracemalloc.stop()
+    return {
+        "modo": mode,
+        "rss_inicial_mb": round(rss_inicial, 1),
+        "pico_rss_mb": round(_peak_rss_mb(), 1),
+        "pico_por_ejecucion_mb": {nombre: round(max(v), 2) for nombre, v in picos.items()},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memoria por ejecución de las vistas")
+    parser.add_argument("csv", nargs="?", default=os.path.join(ROOT, "data", "datos_clima.csv"))
+    parser.add_argument("--reruns", type=int, default=5)
+    parser.add_argument("--modo", choices=["copia", "compartido"])
+    args = parser.parse_args()
+
+    if args.modo:
+        print(json.dumps(run_mode(args.csv, args.modo, args.reruns)))
+        return
+
+    resultados = []
+    for modo in ("copia", "compartido"):
+        salida = subprocess.run(
+            [sys.executable, __file__, args.csv, "--reruns", str(args.reruns), "--modo", modo],
+            check=True, capture_output=True, text=True, cwd=ROOT,
+        ).stdout
+        resultados.append(json.loads(salida.strip().splitlines()[-1]))
+
+    for r in resultados:
+        print(f"{r['modo']:>10}: pico RSS {r['pico_rss_mb']:.1f} MB (inicial {r['rss_inicial_mb']:.1f} MB)")
+        for nombre, mb in r["pico_por_ejecucion_mb"].items():
+            print(f"{'':>12}{nombre:<22} {mb:8.2f} MB por ejecución")
+
+
+if __name__ == "__main__":
+    main()
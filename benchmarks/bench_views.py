@@ -0,0 +1,326 @@
+# benchmarks/bench_views.py
+# Pruebas de rendimiento sin navegador: carga de datos (load_data) y cada
+# página de app.py (dashboard y vistas show_*) con un módulo streamlit
+# sustituto, sobre datasets sintéticos generados a partir del CSV real.
+#
+#   python benchmarks/bench_views.py [--escalas 1 10 100] [--estaciones 8]
+#                                    [--repeticiones 3] [--salida informe.json]
+#   python benchmarks/bench_views.py --comparar base.json nuevo.json [--umbral 0.2]
+#
+# Para cada escenario se mide, en un proceso aparte:
+#   - carga en frío (parseando los CSV), desde la caché columnar y como otra
+#     réplica (solo con la caché compartida), y primera página de esa réplica;
+#   - por página: tiempo total, tiempo de los gráficos (crear la figura y
+#     convertirla en PNG), tiempo de una segunda ejecución (con los gráficos
+#     ya en caché) y pico de memoria (tracemalloc);
+#   - pico de RSS del proceso.
+# El informe JSON de dos ejecuciones se puede comparar con --comparar.
+import argparse
+import json
+import os
+import platform
+import resource
+import runpy
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+APP = os.path.join(ROOT, "app.py")
+DEFAULT_CSV = os.path.join(ROOT, "data", "datos_clima.csv")
+REPORT_FORMAT = 1
+# Diferencia absoluta mínima para marcar una métrica como peor (evita marcar
+# el ruido de las medidas de pocos milisegundos)
+MIN_DELTA = {"_s": 0.01, "_mb": 0.5}
+
+# Páginas de app.py (opciones del menú "Ir a:") que se miden
+PAGES = {
+    "dashboard": "Dashboard ultimos registros",
+    "monthly_comparison": "Comparación Mensual Detallada",
+    "historical_averages": "Promedios Históricos",
+    "extreme_analysis": "Análisis de Extremos Climáticos",
+    "annual_comparison": "Comparación Anual",
+    "rolling_analysis": "Medias Móviles y Anomalías",
+}
+# Páginas que dibujan algún gráfico (el análisis de extremos solo muestra
+# tablas): en cada una se tiene que haber medido al menos una figura
+FIGURE_PAGES = set(PAGES) - {"extreme_analysis"}
+
+
+def _peak_rss_mb():
+    # En Linux ru_maxrss está en KiB
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class FigureTimer:
+    # Acumula el tiempo que se pasa creando figuras y convirtiéndolas en PNG
+    # (solo ocurre cuando el gráfico no está en la caché de figuras)
+
+    def __init__(self):
+        from modules import figure_cache
+        self.total_s = 0.0
+        self.figuras = 0
+        to_png = figure_cache.figure_to_png
+        get_or_render = figure_cache.FIGURE_CACHE.get_or_render
+
+        def timed_to_png(fig):
+            inicio = time.perf_counter()
+            try:
+                return to_png(fig)
+            finally:
+                self.total_s += time.perf_counter() - inicio
+                self.figuras += 1
+
+        def timed_get_or_render(key, render):
+            def timed_render():
+                inicio = time.perf_counter()
+                try:
+                    return render()
+                finally:
+                    self.total_s += time.perf_counter() - inicio
+            return get_or_render(key, timed_render)
+
+        figure_cache.figure_to_png = timed_to_png
+        figure_cache.FIGURE_CACHE.get_or_render = timed_get_or_render
+
+    def reset(self):
+        self.total_s = 0.0
+        self.figuras = 0
+
+
+def run_page(choice):
+    # Ejecuta app.py completo (como hace streamlit en cada interacción) con
+    # la página indicada seleccionada en el menú
+    import st_stub
+    st_stub.CHOICES["Ir a:"] = choice
+    inicio = time.perf_counter()
+    runpy.run_path(APP, run_name="__main__")
+    return time.perf_counter() - inicio
+
+
+def measure_load(data_dir, shared):
+    from modules import shared_cache
+    from modules.stations import StationRegistry
+
+    shutil.rmtree(os.path.join(data_dir, ".cache"), ignore_errors=True)
+    shutil.rmtree(shared.directory, ignore_errors=True)
+    # En frío: sin caché local ni compartida (la carga publica las estaciones)
+    shared_cache.set_default_backend(shared)
+    inicio = time.perf_counter()
+    registry = StationRegistry(data_dir)
+    fria_s = time.perf_counter() - inicio
+    # Solo con la caché columnar local
+    shared_cache.set_default_backend(None)
+    inicio = time.perf_counter()
+    registry = StationRegistry(data_dir)
+    cache_s = time.perf_counter() - inicio
+    # Otra réplica: sin caché local, con la compartida que ha llenado la primera
+    shutil.rmtree(os.path.join(data_dir, ".cache"), ignore_errors=True)
+    shared_cache.set_default_backend(shared)
+    inicio = time.perf_counter()
+    registry = StationRegistry(data_dir)
+    replica_s = time.perf_counter() - inicio
+    return registry, {
+        "estaciones": len(registry.stations()),
+        "filas": sum(len(registry.get(sid).df) for sid in registry.stations()),
+        "fria_s": round(fria_s, 4),
+        "cache_s": round(cache_s, 4),
+        "replica_s": round(replica_s, 4),
+        "errores": {sid: str(e) for sid, e in registry.errors.items()},
+    }
+
+
+def run_scenario(root, repeats):
+    # Mide un escenario (root/data/*.csv). Se ejecuta en su propio proceso.
+    import st_stub
+    st_stub.install()
+    os.chdir(root)
+
+    from modules.figure_cache import FIGURE_CACHE
+    from modules.shared_cache import DiskBackend
+    from modules.stations import station_label
+
+    shared = DiskBackend(os.path.join(root, "compartida"))
+    registry, carga = measure_load("data", shared)
+    # Primera ejecución de la app: load_data con el registro aún sin crear
+    FIGURE_CACHE.shared = shared
+    inicio = time.perf_counter()
+    run_page(PAGES["dashboard"])
+    carga["app_s"] = round(time.perf_counter() - inicio, 4)
+    # Misma página en otra réplica: los gráficos salen de la caché compartida
+    FIGURE_CACHE.clear()
+    inicio = time.perf_counter()
+    run_page(PAGES["dashboard"])
+    carga["replica_app_s"] = round(time.perf_counter() - inicio, 4)
+    # Las vistas se miden renderizando (solo con la caché del proceso)
+    FIGURE_CACHE.shared = None
+
+    otras = [station_label(sid) for sid in registry.stations()[1:]]
+    if otras:
+        st_stub.CHOICES["Comparar con otras estaciones:"] = otras
+
+    timer = FigureTimer()
+    vistas = {}
+    for nombre, choice in PAGES.items():
+        totales, figuras, repetidas = [], [], []
+        for _ in range(repeats):
+            FIGURE_CACHE.clear()
+            timer.reset()
+            totales.append(run_page(choice))
+            figuras.append(timer.total_s)
+            n_figuras = timer.figuras
+            # Misma página otra vez: los gráficos salen de la caché
+            repetidas.append(run_page(choice))
+
+        FIGURE_CACHE.clear()
+        tracemalloc.start()
+        run_page(choice)
+        pico = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        vistas[nombre] = {
+            "total_s": round(statistics.median(totales), 4),
+            "figura_s": round(statistics.median(figuras), 4),
+            "calculo_s": round(statistics.median(t - f for t, f in zip(totales, figuras)), 4),
+            "repetida_s": round(statistics.median(repetidas), 4),
+            "figuras": n_figuras,
+            "pico_memoria_mb": round(pico / 2**20, 2),
+        }
+        if nombre in FIGURE_PAGES and not n_figuras:
+            raise AssertionError(f"la página {nombre} no ha renderizado ninguna figura: no se ha medido su gráfico")
+    return {"carga": carga, "vistas": vistas, "pico_rss_mb": round(_peak_rss_mb(), 1)}
+
+
+def prepare_scenarios(csv_file, scales, n_stations, work_dir):
+    # {nombre: carpeta raíz con data/} de cada escenario sintético
+    from synthetic import make_scaled, make_stations
+
+    escenarios = {}
+    for factor in scales:
+        raiz = os.path.join(work_dir, f"x{factor}")
+        make_scaled(csv_file, factor, raiz)
+        escenarios[f"x{factor}"] = raiz
+    if n_stations > 1:
+        raiz = os.path.join(work_dir, f"estaciones_{n_stations}")
+        make_stations(csv_file, n_stations, raiz)
+        escenarios[f"estaciones_{n_stations}"] = raiz
+    return escenarios
+
+
+def environment():
+    import matplotlib
+    import numpy
+    import pandas
+    import pyarrow
+    import streamlit
+    return {
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "cpus": os.cpu_count(),
+        "pandas": pandas.__version__,
+        "numpy": numpy.__version__,
+        "matplotlib": matplotlib.__version__,
+        "pyarrow": pyarrow.__version__,
+        "streamlit": streamlit.__version__,
+    }
+
+
+def _flatten(informe, prefijo=""):
+    # {'x10.vistas.dashboard.total_s': 0.12, ...} con las métricas numéricas
+    plano = {}
+    for clave, valor in informe.items():
+        ruta = f"{prefijo}{clave}"
+        if isinstance(valor, dict):
+            plano.update(_flatten(valor, ruta + "."))
+        elif isinstance(valor, (int, float)) and not isinstance(valor, bool):
+            plano[ruta] = valor
+    return plano
+
+
+def compare_reports(base, nuevo, umbral=0.2):
+    # Compara los tiempos (_s) y memorias (_mb) de dos informes. Devuelve las
+    # métricas que empeoran más que 'umbral' (proporción).
+    antes = _flatten(base["escenarios"])
+    despues = _flatten(nuevo["escenarios"])
+    regresiones = []
+    print(f"{'métrica':<60} {'base':>10} {'nuevo':>10} {'cambio':>8}")
+    for ruta in sorted(antes.keys() & despues.keys()):
+        if not ruta.endswith(("_s", "_mb")):
+            continue
+        a, d = antes[ruta], despues[ruta]
+        cambio = (d - a) / a if a else 0.0
+        marca = ""
+        if cambio > umbral and d - a >= MIN_DELTA[ruta[ruta.rindex("_"):]]:
+            marca = "  <-- peor"
+            regresiones.append(ruta)
+        print(f"{ruta:<60} {a:>10.4f} {d:>10.4f} {cambio:>+8.1%}{marca}")
+    return regresiones
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rendimiento de la carga y de las vistas de MeteoAnalitica")
+    parser.add_argument("--csv", default=DEFAULT_CSV, help="CSV real a partir del que se generan los datos")
+    parser.add_argument("--escalas", type=int, nargs="+", default=[1, 10, 100],
+                        help="Veces que se repite el registro en cada escenario")
+    parser.add_argument("--estaciones", type=int, default=8,
+                        help="Número de estaciones del escenario multiestación (0 para omitirlo)")
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--salida", help="Fichero JSON donde guardar el informe (por defecto, salida estándar)")
+    parser.add_argument("--trabajo", help="Carpeta para los datos sintéticos (por defecto, una temporal)")
+    parser.add_argument("--comparar", nargs=2, metavar=("BASE", "NUEVO"), help="Compara dos informes")
+    parser.add_argument("--umbral", type=float, default=0.2,
+                        help="Empeoramiento (proporción) a partir del que se marca una métrica")
+    parser.add_argument("--escenario", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.comparar:
+        with open(args.comparar[0]) as f:
+            base = json.load(f)
+        with open(args.comparar[1]) as f:
+            nuevo = json.load(f)
+        sys.exit(1 if compare_reports(base, nuevo, args.umbral) else 0)
+
+    if args.escenario:
+        print(json.dumps(run_scenario(args.escenario, args.repeticiones)))
+        return
+
+    work_dir = args.trabajo or tempfile.mkdtemp(prefix="meteo_bench_")
+    try:
+        escenarios = prepare_scenarios(args.csv, args.escalas, args.estaciones, work_dir)
+        resultados = {}
+        for nombre, raiz in escenarios.items():
+            print(f"Midiendo {nombre}...", file=sys.stderr)
+            salida = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--escenario", raiz,
+                 "--repeticiones", str(args.repeticiones)],
+                check=True, capture_output=True, text=True,
+            ).stdout
+            resultados[nombre] = json.loads(salida.strip().splitlines()[-1])
+    finally:
+        if not args.trabajo:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    informe = {
+        "formato": REPORT_FORMAT,
+        "fecha": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "entorno": environment(),
+        "escenarios": resultados,
+    }
+    texto = json.dumps(informe, indent=2, ensure_ascii=False)
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            f.write(texto + "\n")
+    else:
+        print(texto)
+
+
+if __name__ == "__main__":
+    main()
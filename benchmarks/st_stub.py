@@ -0,0 +1,95 @@
+# benchmarks/st_stub.py
+# Sustituto mínimo del módulo streamlit para ejecutar las vistas sin
+# navegador. Los widgets devuelven su valor por defecto (o el indicado en
+# CHOICES por etiqueta) y los gráficos se cierran sin mostrarse.
+import contextlib
+import sys
+import types
+
+# Valores que devolverán los widgets, por etiqueta: {"Selecciona un mes:": "Enero"}
+CHOICES = {}
+
+
+def _noop(*args, **kwargs):
+    return None
+
+
+def _pick(label, options, index=0):
+    options = list(options)
+    if label in CHOICES:
+        if CHOICES[label] not in options:
+            raise ValueError(f"{CHOICES[label]!r} no es una opción de {label!r}")
+        return CHOICES[label]
+    return options[index] if options else None
+
+
+def selectbox(label, options, index=0, **kwargs):
+    return _pick(label, options, index)
+
+
+def radio(label, options, index=0, **kwargs):
+    return _pick(label, options, index)
+
+
+def multiselect(label, options, default=None, **kwargs):
+    return CHOICES.get(label, list(default or []))
+
+
+def slider(label, min_value=None, max_value=None, value=None, **kwargs):
+    return CHOICES.get(label, value)
+
+
+def pyplot(fig=None, **kwargs):
+    import matplotlib.pyplot as plt
+    plt.close(fig)
+
+
+def expander(label, **kwargs):
+    return contextlib.nullcontext()
+
+
+def _identity_decorator(func=None, **kwargs):
+    if func is None:
+        return lambda f: f
+    return func
+
+
+# Resultados de las funciones con st.cache_resource, por función y argumentos.
+# Como en streamlit, la clave no depende del objeto función, así que se
+# conservan aunque el script se vuelva a ejecutar (runpy).
+_RESOURCES = {}
+
+
+def _cache_resource(func=None, **kwargs):
+    if func is None:
+        return _cache_resource
+
+    def wrapper(*args, **kw):
+        clave = (func.__module__, func.__qualname__, args, tuple(sorted(kw.items())))
+        if clave not in _RESOURCES:
+            _RESOURCES[clave] = func(*args, **kw)
+        return _RESOURCES[clave]
+
+    return wrapper
+
+
+def install():
+    st = types.ModuleType("streamlit")
+    sidebar = types.SimpleNamespace()
+    for name in ("header", "subheader", "write", "markdown", "info", "warning", "error",
+                 "caption", "title", "dataframe", "image", "json", "code"):
+        setattr(st, name, _noop)
+        setattr(sidebar, name, _noop)
+    for name, func in (("selectbox", selectbox), ("radio", radio),
+                       ("multiselect", multiselect), ("slider", slider), ("expander", expander)):
+        setattr(st, name, func)
+        setattr(sidebar, name, func)
+    st.sidebar = sidebar
+    st.pyplot = pyplot
+    st.cache_data = _identity_decorator
+    st.cache_resource = _cache_resource
+    st.stop = _noop
+    st.set_page_config = _noop
+    st.query_params = {}
+    sys.modules["streamlit"] = st
+    return st
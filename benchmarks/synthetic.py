@@ -0,0 +1,81 @@
+# benchmarks/synthetic.py
+# Datasets sintéticos a partir del CSV real (data/datos_clima.csv) para las
+# pruebas de rendimiento: el mismo fichero repetido hacia atrás en el tiempo
+# (10x, 100x... filas) o copiado como varias estaciones. Se escriben con el
+# mismo formato que el original (coma decimal, fechas DD/MM/AAAA).
+import os
+
+import numpy as np
+import pandas as pd
+
+from modules.schema import DATE_COLUMN, parse_dates
+
+
+def read_raw(csv_file):
+    # Se leen todas las columnas como texto para reescribirlas sin cambios
+    return pd.read_csv(csv_file, dtype=str, keep_default_na=False)
+
+
+def _shift_years(fechas, años):
+    # Fechas (texto DD/MM/AAAA) desplazadas 'años' años hacia atrás. El 29 de
+    # febrero que cae en un año no bisiesto no existe y se descarta (None).
+    # Se construyen como texto porque los años pueden quedar fuera del rango
+    # de los tipos de fecha de pandas con resolución de nanosegundos.
+    year = fechas.dt.year.to_numpy() - años
+    month = fechas.dt.month.to_numpy()
+    day = fechas.dt.day.to_numpy()
+    bisiesto = (year % 4 == 0) & ((year % 100 != 0) | (year % 400 == 0))
+    validas = ~((month == 2) & (day == 29) & ~bisiesto)
+    texto = pd.Series([f"{d:02d}/{m:02d}/{y:04d}" for d, m, y in zip(day, month, year)])
+    return texto.where(validas, None)
+
+
+def scaled_frame(raw, factor):
+    # 'factor' copias del registro, cada una desplazada un bloque de años
+    # hacia atrás (múltiplo de 4 para conservar casi todos los bisiestos)
+    fechas = parse_dates(raw[DATE_COLUMN])
+    bloque = int(fechas.dt.year.max() - fechas.dt.year.min()) + 1
+    bloque += -bloque % 4
+    copias = []
+    for i in range(factor):
+        desplazadas = _shift_years(fechas, i * bloque)
+        validas = desplazadas.notna().to_numpy()
+        copia = raw[validas].copy()
+        copia[DATE_COLUMN] = desplazadas[validas].to_numpy()
+        copias.append(copia)
+    # Del más antiguo al más reciente, como el CSV original
+    return pd.concat(copias[::-1], ignore_index=True)
+
+
+def _jitter(raw, seed):
+    # Pequeñas variaciones en las lecturas para que cada estación copiada no
+    # sea idéntica a la original (mismo formato de texto, coma decimal)
+    rng = np.random.default_rng(seed)
+    copia = raw.copy()
+    for col in ("TEMP_MEDIA", "TEMP_MAX", "TEMP_MIN"):
+        if col not in copia.columns:
+            continue
+        valores = pd.to_numeric(copia[col].str.replace(",", ".", regex=False), errors="coerce")
+        valores = valores + rng.normal(0, 1, len(valores)).round(1)
+        copia[col] = valores.map(lambda v: "" if pd.isna(v) else f"{v:.1f}".replace(".", ","))
+    return copia
+
+
+def write_csv(df, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    df.to_csv(path, index=False)
+    return path
+
+
+def make_scaled(csv_file, factor, out_dir):
+    # out_dir/data/datos_clima.csv con 'factor' veces las filas del original
+    return write_csv(scaled_frame(read_raw(csv_file), factor), os.path.join(out_dir, "data", "datos_clima.csv"))
+
+
+def make_stations(csv_file, n_stations, out_dir):
+    # out_dir/data/ con la estación original y n_stations - 1 copias
+    raw = read_raw(csv_file)
+    paths = [write_csv(raw, os.path.join(out_dir, "data", "datos_clima.csv"))]
+    for i in range(1, n_stations):
+        paths.append(write_csv(_jitter(raw, i), os.path.join(out_dir, "data", f"estacion_{i:02d}.csv")))
+    return paths
@@ -0,0 +1,361 @@
+# modules/analytics.py
+# Cálculos de cada vista, sin Streamlit: reciben el DataFrame (y, si ya
+# existen, el cubo climatológico o el índice de extremos precalculados) y
+# devuelven arrays o DataFrames. Las vistas show_* los muestran y el modo
+# por lotes (modules/batch.py) los usa para generar los informes estáticos.
+import warnings
+from typing import NamedTuple, Optional
+
+import numpy as np
+import pandas as pd
+
+from modules.climatology import ClimatologyCube
+from modules.data_loader import ensure_calendar_columns
+from modules.extremes_index import ExtremesIndex
+from modules.rolling import RollingEngine, default_kind
+from modules.telemetry import timed
+
+MONTH_NAMES = {
+    1: 'Enero', 2: 'Febrero', 3: 'Marzo', 4: 'Abril',
+    5: 'Mayo', 6: 'Junio', 7: 'Julio', 8: 'Agosto',
+    9: 'Septiembre', 10: 'Octubre', 11: 'Noviembre', 12: 'Diciembre'
+}
+# Columnas que no se muestran en el dashboard
+HIDDEN_COLUMNS = ['RECORD_NUMBER', 'Mes', 'Año', 'Dia_del_Año']
+# Granularidades de la comparación anual y agrupación del cubo que usan
+GRANULARITIES = {
+    'day_of_year': 'Dia_del_Año_Año',
+    'month': 'Mes_Año',
+}
+DIRECTIONS = ('max', 'min')
+TEMPERATURE_COLUMNS = ['TEMP_MAX', 'TEMP_MIN', 'TEMP_MEDIA']
+# Percentiles de las comparaciones con los años anteriores y días a cada lado
+# de un día del año con los que se forma su banda (para que cada percentil
+# salga de más de un valor por año)
+BAND_PERCENTILES = (10, 25, 50, 75, 90)
+BAND_HALF_WINDOW = 3
+# Años anteriores necesarios para calcular percentiles
+MIN_BAND_YEARS = 3
+
+
+def pivot_years(years, slots, values, n_slots):
+    # Matriz años x posiciones (días del mes, días del año...) con NaN donde no
+    # hay dato; las posiciones 'slots' empiezan en 1
+    lista_años = np.unique(years)
+    matriz = np.full((len(lista_años), n_slots), np.nan)
+    matriz[np.searchsorted(lista_años, years), np.asarray(slots) - 1] = values
+    return lista_años, matriz
+
+
+class LatestMonth(NamedTuple):
+    date: pd.Timestamp       # fecha más reciente de los datos
+    rows: pd.DataFrame       # registros de su mes (vista, sin copiar)
+    summary: pd.DataFrame    # describe() sin las columnas ocultas ni las vacías
+
+
+class PercentileBands(NamedTuple):
+    variable: str
+    days: np.ndarray         # días del año (columnas de 'values')
+    percentiles: tuple       # percentiles (filas de 'values')
+    values: np.ndarray       # percentiles x días, NaN sin años anteriores
+
+
+class MonthlyComparison(NamedTuple):
+    variable: str
+    month: int
+    years: np.ndarray        # años (filas de 'values')
+    days: np.ndarray         # días del mes, 1-31 (columnas de 'values')
+    values: np.ndarray       # años x días, NaN donde no hay dato
+
+
+class HistoricalAverages(NamedTuple):
+    variable: str
+    days: np.ndarray                      # días del año con datos
+    mean: np.ndarray                      # promedio histórico de cada día
+    year: Optional[int] = None            # año comparado (si se pide)
+    year_values: Optional[np.ndarray] = None  # valores de ese año, alineados con 'days'
+
+
+class AnnualComparison(NamedTuple):
+    variable: str
+    granularity: str         # 'day_of_year' o 'month'
+    positions: np.ndarray    # días del año o meses (columnas de 'values')
+    years: np.ndarray        # años (filas de 'values')
+    values: np.ndarray       # años x posiciones, media de cada una
+
+    def to_frame(self):
+        # Tabla posiciones x años, como el pivote que muestra la vista
+        nombre = 'Dia_del_Año' if self.granularity == 'day_of_year' else 'Mes'
+        return pd.DataFrame(
+            self.values.T,
+            index=pd.Index(self.positions, name=nombre),
+            columns=pd.Index(self.years, name='Año'),
+        )
+
+
+def _month_rows(df, date):
+    if 'Mes' in df.columns and 'Año' in df.columns:
+        mascara = (df['Mes'] == date.month) & (df['Año'] == date.year)
+    else:
+        mascara = (df['DAY'].dt.month == date.month) & (df['DAY'].dt.year == date.year)
+    return df[mascara]
+
+
+def _describe(df):
+    # Lo mismo que df.describe(), pero las columnas numéricas se resumen todas
+    # a la vez con NumPy: describe() va columna a columna y, con los pocos
+    # registros de un mes, casi todo su tiempo es sobrecarga por columna
+    numericas = [col for col in df.columns if pd.api.types.is_numeric_dtype(df[col])]
+    otras = [col for col in df.columns if col not in numericas]
+    if not numericas:
+        return df.describe()
+    valores = df[numericas].to_numpy(dtype='float64', na_value=np.nan)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        filas = [
+            (~np.isnan(valores)).sum(axis=0).astype('float64'),
+            np.nanmean(valores, axis=0),
+            np.nanstd(valores, axis=0, ddof=1),
+            np.nanmin(valores, axis=0),
+            *np.nanpercentile(valores, [25, 50, 75], axis=0),
+            np.nanmax(valores, axis=0),
+        ]
+    resumen = pd.DataFrame(np.vstack(filas), index=['count', 'mean', 'std', 'min', '25%', '50%', '75%', 'max'],
+                           columns=numericas)
+    # Los enteros con nulos se resumen con el tipo decimal con nulos, como en describe()
+    for col in numericas:
+        if isinstance(df[col].dtype, pd.api.extensions.ExtensionDtype):
+            resumen[col] = resumen[col].astype('Float64')
+    if otras:
+        # Fechas: count, mean, min, cuartiles y max (std queda vacío)
+        resumen = pd.concat([df[otras].describe(), resumen], axis=1)
+    return resumen[list(df.columns)]
+
+
+def _latest_month(latest_date, rows):
+    # Las columnas sin ningún dato en el mes no aparecen en el resumen
+    summary = _describe(rows.drop(columns=HIDDEN_COLUMNS, errors='ignore').dropna(axis=1, how='all'))
+    return LatestMonth(latest_date, rows, summary)
+
+
+@timed()
+def latest_month(df):
+    # Registros del mes más reciente y su resumen estadístico
+    latest_date = df['DAY'].max()
+    return _latest_month(latest_date, _month_rows(df, latest_date))
+
+
+@timed()
+def extend_latest_month(latest, new_rows):
+    # latest_month() de los datos con 'new_rows' añadidas al final, a partir
+    # del anterior y mirando solo las filas nuevas
+    if new_rows.empty or not new_rows['DAY'].notna().any():
+        return latest
+    latest_date = max(latest.date, new_rows['DAY'].max())
+    nuevas = _month_rows(new_rows, latest_date)
+    if latest_date.to_period('M') != latest.date.to_period('M'):
+        # Mes nuevo: las filas anteriores son todas de meses previos
+        return _latest_month(latest_date, nuevas)
+    return _latest_month(latest_date, pd.concat([latest.rows, nuevas]) if len(nuevas) else latest.rows)
+
+
+def _year_matrix(cube, variables, stat):
+    # Estadístico de Dia_del_Año_Año como array días del año (1-366) x
+    # variables x años, con NaN donde no hay dato
+    tabla = cube.tables['Dia_del_Año_Año'][stat][variables].unstack('Año')
+    años = tabla.columns.unique(level='Año').to_numpy()
+    tabla = tabla.reindex(index=np.arange(1, 367), columns=pd.MultiIndex.from_product([variables, años]))
+    # Copia propia: YearMatrix.update la modifica y, con Copy-on-Write, el
+    # array podría ser una vista de solo lectura de la tabla del cubo
+    matriz = tabla.to_numpy(dtype='float64', na_value=np.nan, copy=True)
+    return años, matriz.reshape(366, len(variables), len(años))
+
+
+class YearMatrix:
+    # Sumas y conteos de Dia_del_Año_Año del cubo como arrays días del año
+    # (1-366) x variables x años, con NaN donde no hay dato: la entrada de
+    # las bandas de percentiles y de la comparación del mes en curso. Cuando
+    # llegan registros nuevos se actualizan solo los días que tocan, en lugar
+    # de volver a reagrupar (unstack) la tabla entera.
+
+    def __init__(self, cube, variables=None):
+        self.variables = list(variables) if variables is not None else list(cube.variables)
+        self.years, self.sum = _year_matrix(cube, self.variables, 'sum')
+        _, self.count = _year_matrix(cube, self.variables, 'count')
+
+    def select(self, variables):
+        # (años, sumas, conteos) de 'variables'
+        if list(variables) == self.variables:
+            return self.years, self.sum, self.count
+        columnas = [self.variables.index(v) for v in variables]
+        return self.years, self.sum[:, columnas], self.count[:, columnas]
+
+    def update(self, cube, new_rows):
+        # Vuelve a leer del cubo (ya actualizado con 'new_rows') los días del
+        # año y años que tocan las filas nuevas; los años nuevos se insertan
+        # en su sitio
+        new_rows = ensure_calendar_columns(new_rows)
+        claves = pd.MultiIndex.from_frame(new_rows[['Dia_del_Año', 'Año']].dropna()).unique()
+        if claves.empty:
+            return
+        nuevos = np.setdiff1d(claves.get_level_values('Año').to_numpy(), self.years)
+        if len(nuevos):
+            posiciones = np.searchsorted(self.years, nuevos)
+            self.years = np.insert(self.years, posiciones, nuevos)
+            self.sum = np.insert(self.sum, posiciones, np.nan, axis=2)
+            self.count = np.insert(self.count, posiciones, np.nan, axis=2)
+        tablas = cube.tables['Dia_del_Año_Año']
+        filas = tablas['sum'].index.get_indexer(claves)
+        dias = claves.get_level_values('Dia_del_Año').to_numpy(dtype='int64') - 1
+        años = np.searchsorted(self.years, claves.get_level_values('Año').to_numpy())
+        for stat, matriz in (('sum', self.sum), ('count', self.count)):
+            valores = tablas[stat].iloc[filas][self.variables].to_numpy(dtype='float64', na_value=np.nan)
+            matriz[dias, :, años] = valores
+
+
+def _percentiles(samples, percentiles, axis):
+    # np.nanpercentile avisa de las filas sin ningún valor, que quedan en NaN
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        return np.nanpercentile(samples, percentiles, axis=axis)
+
+
+@timed()
+def percentile_bands(cube, variable, days, exclude_year=None, percentiles=BAND_PERCENTILES,
+                     half_window=BAND_HALF_WINDOW, matrix=None):
+    # Percentiles históricos del valor diario de 'variable' en cada día del
+    # año de 'days', con los días a ±half_window de todos los años salvo
+    # 'exclude_year' (el que se compara con ellos). Sale del cubo, sin
+    # recorrer los datos ('matrix', una YearMatrix ya calculada del cubo).
+    if matrix is None:
+        matrix = YearMatrix(cube, [variable])
+    años, suma, conteo = matrix.select([variable])
+    otros = años != exclude_year
+    medias = (suma / np.where(conteo > 0, conteo, np.nan))[:, 0, otros]
+    dias = np.asarray(days, dtype='int64')
+    if otros.sum() < MIN_BAND_YEARS:
+        return PercentileBands(variable, dias, tuple(percentiles), np.full((len(percentiles), len(dias)), np.nan))
+    filas = (dias[:, None] - 1 + np.arange(-half_window, half_window + 1)) % 366
+    valores = _percentiles(medias[filas].reshape(len(dias), -1), percentiles, axis=1)
+    return PercentileBands(variable, dias, tuple(percentiles), valores)
+
+
+@timed()
+def month_to_date_percentiles(cube, date, variables, percentiles=BAND_PERCENTILES, matrix=None):
+    # Media de cada variable desde el día 1 del mes de 'date' hasta ese día,
+    # frente a la del mismo periodo en los años anteriores: sus percentiles,
+    # la posición del valor actual entre ellos (% de años por debajo) y
+    # cuántos años hay. Sale del cubo (sumas y conteos por día y año, o de
+    # 'matrix' si ya están calculadas).
+    date = pd.Timestamp(date)
+    if matrix is None:
+        matrix = YearMatrix(cube, variables)
+    años, suma, conteo = matrix.select(variables)
+    # Mismas fechas de calendario en cada año (el día del año cambia en los bisiestos)
+    inicios = pd.to_datetime(pd.DataFrame({'year': años, 'month': date.month, 'day': 1})).dt.dayofyear.to_numpy()
+    fines = inicios + date.day - 1
+    columnas = np.arange(len(años))
+
+    def periodo(matriz):
+        # Total de cada variable y año entre 'inicios' y 'fines' (sumas
+        # acumuladas solo de los días del año que abarca el periodo)
+        desde, hasta = (inicios.min() - 1, fines.max()) if len(años) else (0, 0)
+        tramo = matriz[desde:hasta]
+        acumulada = np.concatenate([np.zeros((1,) + tramo.shape[1:]), np.nancumsum(tramo, axis=0)])
+        return acumulada[fines - desde, :, columnas] - acumulada[inicios - 1 - desde, :, columnas]
+
+    conteos = periodo(conteo)
+    medias = periodo(suma) / np.where(conteos > 0, conteos, np.nan)  # años x variables
+    actual = años == date.year
+    media = medias[actual][0] if actual.any() else np.full(len(variables), np.nan)
+    anteriores = medias[años < date.year]
+    n_años = (~np.isnan(anteriores)).sum(axis=0)
+    suficientes = n_años >= MIN_BAND_YEARS
+    tabla = pd.DataFrame({'media': media}, index=pd.Index(variables, name='variable'))
+    valores = _percentiles(anteriores, percentiles, axis=0)
+    for p, fila in zip(percentiles, valores):
+        tabla[f'P{p}'] = np.where(suficientes, fila, np.nan)
+    por_debajo = (anteriores < media).sum(axis=0) + 0.5 * (anteriores == media).sum(axis=0)
+    tabla['percentil'] = np.where(suficientes, 100 * por_debajo / np.maximum(n_años, 1), np.nan)
+    tabla['años'] = n_años
+    return tabla
+
+
+@timed()
+def monthly_comparison(df, month, variable):
+    # Valores diarios de 'variable' en el mes 'month' de cada año
+    if 'Mes' not in df.columns or 'Año' not in df.columns:
+        df = df.assign(Mes=df['DAY'].dt.month, Año=df['DAY'].dt.year)
+    filtrado = df.loc[df['Mes'] == month, ['DAY', 'Año', variable]]
+    años, matriz = pivot_years(
+        filtrado['Año'].to_numpy(),
+        filtrado['DAY'].dt.day.to_numpy(),
+        filtrado[variable].to_numpy(dtype='float64', na_value=np.nan),
+        31,
+    )
+    return MonthlyComparison(variable, month, años, np.arange(1, 32), matriz)
+
+
+@timed()
+def historical_averages(df, variable, year=None, cube=None):
+    # Promedio histórico de cada día del año y, opcionalmente, los valores
+    # de un año concreto alineados con él
+    if cube is None:
+        cube = ClimatologyCube.build(df)
+    promedios = cube.mean('Dia_del_Año', variable)
+    valores_año = None
+    if year is not None:
+        por_año = cube.mean('Dia_del_Año_Año', variable)
+        if year in por_año.index.get_level_values('Año'):
+            valores_año = por_año.xs(year, level='Año').reindex(promedios.index).to_numpy()
+        else:
+            valores_año = np.full(len(promedios), np.nan)
+    return HistoricalAverages(variable, promedios.index.to_numpy(), promedios.to_numpy(), year, valores_año)
+
+
+@timed()
+def extremes(df, variable, k=10, direction='max', months=None, years=None, index=None):
+    # Los k días con el valor más alto ('max') o más bajo ('min') de la
+    # variable, opcionalmente limitados a unos meses y a un rango de años.
+    # k está limitado al tamaño del índice (TOP_K).
+    if direction not in DIRECTIONS:
+        raise ValueError(f"direction debe ser uno de {DIRECTIONS}, no {direction!r}")
+    if index is None:
+        index = ExtremesIndex.build(df, [variable])
+    return index.query(variable, k, largest=direction == 'max', months=months, years=years)
+
+
+@timed()
+def annual_comparison(df, variable, granularity='day_of_year', cube=None):
+    # Media de la variable por día del año (o por mes) de cada año
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"granularity debe ser uno de {tuple(GRANULARITIES)}, no {granularity!r}")
+    if cube is None:
+        cube = ClimatologyCube.build(df)
+    pivote = cube.mean(GRANULARITIES[granularity], variable).unstack(level='Año')
+    return AnnualComparison(
+        variable,
+        granularity,
+        pivote.index.to_numpy(),
+        pivote.columns.to_numpy(),
+        pivote.to_numpy(dtype='float64').T,
+    )
+
+
+@timed()
+def rolling_series(df, variable, kind=None, window=30, years=None, engine=None, cube=None):
+    # Media o suma móvil de 'window' días, acumulado anual o anomalía
+    # respecto al promedio histórico (ver modules/rolling.py); por defecto
+    # el tipo que corresponde a la variable. 'years' = (primero, último)
+    # limita el resultado a esos años.
+    if kind is None:
+        kind = default_kind(variable)
+    if engine is None:
+        engine = RollingEngine(df, cube if cube is not None else ClimatologyCube.build(df))
+    serie = engine.series(variable, kind, window)
+    if years is not None:
+        desde, hasta = np.searchsorted(
+            serie.days, [np.datetime64(f'{years[0]}-01-01'), np.datetime64(f'{years[1] + 1}-01-01')]
+        )
+        serie = serie._replace(days=serie.days[desde:hasta], values=serie.values[desde:hasta])
+    return serie
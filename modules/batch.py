@@ -0,0 +1,175 @@
+# modules/batch.py
+# Modo por lotes: genera los informes estáticos (PNG y HTML) de todas las
+# combinaciones mes x variable de cada estación, en paralelo, sin Streamlit.
+# Pensado para la publicación nocturna.
+#
+#   python -m modules.batch [--datos data] [--salida informes] [--procesos N]
+#                           [--formatos png html]
+#
+# Estructura de la salida:
+#   informes/index.html                      estaciones
+#   informes/<estacion>/index.html           variables x meses
+#   informes/<estacion>/<variable>/MM.png    comparación mensual
+#   informes/<estacion>/<variable>/MM.html   gráfico + extremos del mes
+import argparse
+import html
+import logging
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from modules.analytics import MONTH_NAMES, extremes, monthly_comparison
+from modules.dataset import Dataset
+from modules.plotting import figure_to_png  # fija el backend Agg de matplotlib
+from modules.rendering import monthly_comparison_figure
+from modules.stations import DATA_DIR, StationRegistry, mp_context, station_label
+from modules.tables import extremes_table_html
+
+logger = logging.getLogger(__name__)
+
+OUTPUT_DIR = "informes"
+FORMATS = ("png", "html")
+# Días extremos que se listan en cada informe mensual
+REPORT_EXTREMES = 10
+
+PAGE_TEMPLATE = """<!DOCTYPE html>
+<html lang="es">
+<head><meta charset="utf-8"><title>{titulo}</title></head>
+<body style="font-family: sans-serif; max-width: 1200px; margin: 0 auto;">
+<h1>{titulo}</h1>
+{contenido}
+</body>
+</html>
+"""
+
+# Datasets cargados en cada proceso de trabajo, por ruta del CSV
+_DATASETS = {}
+
+
+def _dataset(path):
+    # Cada proceso carga cada estación una sola vez (desde la caché columnar)
+    if path not in _DATASETS:
+        _DATASETS[path] = Dataset(path)
+    return _DATASETS[path]
+
+
+def safe_name(texto):
+    # Nombre de fichero a partir de un nombre de variable o estación
+    return re.sub(r"[^0-9A-Za-z_.-]+", "_", texto)
+
+
+def _write(path, contenido):
+    modo = "wb" if isinstance(contenido, bytes) else "w"
+    with open(path, modo, **({} if modo == "wb" else {"encoding": "utf-8"})) as f:
+        f.write(contenido)
+
+
+def render_variable(station_id, path, variable, months, out_dir, formats=FORMATS):
+    # Informes de una variable de una estación para cada mes. Se ejecuta en
+    # los procesos de trabajo; devuelve [(mes, ruta relativa del informe)].
+    dataset = _dataset(path)
+    carpeta = os.path.join(out_dir, safe_name(station_id), safe_name(variable))
+    os.makedirs(carpeta, exist_ok=True)
+    informes = []
+    for month in months:
+        nombre = f"{month:02d}"
+        resultado = monthly_comparison(dataset.df, month, variable)
+        if np.isnan(resultado.values).all():
+            continue
+        if "png" in formats:
+            _write(os.path.join(carpeta, nombre + ".png"), figure_to_png(monthly_comparison_figure(resultado)))
+        if "html" in formats:
+            titulo = f"{station_label(station_id)}: {variable} en {MONTH_NAMES[month]}"
+            secciones = []
+            if "png" in formats:
+                secciones.append(f'<img src="{nombre}.png" alt="{html.escape(titulo)}" style="width: 100%;">')
+            for direction, texto in (("max", "más altos"), ("min", "más bajos")):
+                tabla = extremes(dataset.df, variable, REPORT_EXTREMES, direction,
+                                 months=[month], index=dataset.extremes)
+                secciones.append(f"<h2>Días con los valores {texto}</h2>")
+                secciones.append(extremes_table_html(tabla))
+            _write(os.path.join(carpeta, nombre + ".html"),
+                   PAGE_TEMPLATE.format(titulo=html.escape(titulo), contenido="\n".join(secciones)))
+        extension = "html" if "html" in formats else "png"
+        informes.append((month, f"{safe_name(variable)}/{nombre}.{extension}"))
+    return station_id, variable, informes
+
+
+def _station_index(station_id, variables, informes, out_dir):
+    # Tabla variables x meses con enlaces a los informes
+    meses = sorted({mes for enlaces in informes.values() for mes, _ in enlaces})
+    filas = []
+    for variable in variables:
+        enlaces = dict(informes.get(variable, []))
+        celdas = "".join(
+            f'<td><a href="{enlaces[mes]}">{MONTH_NAMES[mes][:3]}</a></td>' if mes in enlaces else "<td></td>"
+            for mes in meses
+        )
+        filas.append(f"<tr><th style='text-align: left;'>{html.escape(variable)}</th>{celdas}</tr>")
+    cabecera = "".join(f"<th>{MONTH_NAMES[mes]}</th>" for mes in meses)
+    contenido = f"<table><thead><tr><th></th>{cabecera}</tr></thead><tbody>{''.join(filas)}</tbody></table>"
+    _write(os.path.join(out_dir, safe_name(station_id), "index.html"),
+           PAGE_TEMPLATE.format(titulo=html.escape(f"Comparación mensual: {station_label(station_id)}"),
+                                contenido=contenido))
+
+
+def run_batch(data_dir=DATA_DIR, out_dir=OUTPUT_DIR, max_workers=None, formats=FORMATS):
+    # Genera todos los informes. Devuelve el número de informes escritos.
+    inicio = time.perf_counter()
+    # El registro deja la caché columnar lista, así que los procesos de
+    # trabajo cargan cada estación sin volver a parsear el CSV
+    registry = StationRegistry(data_dir, max_workers)
+    for station_id, e in registry.errors.items():
+        logger.error("No se pudo cargar la estación %s: %s", station_id, e)
+
+    tareas = []
+    for station_id in registry.stations():
+        dataset = registry.get(station_id)
+        for variable in dataset.cube.variables:
+            tareas.append((station_id, dataset.file_path, variable, dataset.cube.months(), out_dir, formats))
+
+    workers = min(len(tareas), max_workers or os.cpu_count() or 1)
+    if workers <= 1:
+        for station_id in registry.stations():
+            _DATASETS[registry.get(station_id).file_path] = registry.get(station_id)
+        resultados = [render_variable(*tarea) for tarea in tareas]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=mp_context()) as pool:
+            resultados = list(pool.map(render_variable, *zip(*tareas)))
+
+    por_estacion = {}
+    for station_id, variable, informes in resultados:
+        por_estacion.setdefault(station_id, {})[variable] = informes
+    if "html" in formats:
+        for station_id in registry.stations():
+            informes = por_estacion.get(station_id, {})
+            _station_index(station_id, registry.get(station_id).cube.variables, informes, out_dir)
+        enlaces = "".join(
+            f'<li><a href="{safe_name(sid)}/index.html">{html.escape(station_label(sid))}</a></li>'
+            for sid in registry.stations()
+        )
+        _write(os.path.join(out_dir, "index.html"),
+               PAGE_TEMPLATE.format(titulo="MeteoAnalitica: informes", contenido=f"<ul>{enlaces}</ul>"))
+    total = sum(len(informes) for _, _, informes in resultados)
+    logger.info("%d informes generados en %s en %.1f s", total, out_dir, time.perf_counter() - inicio)
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Genera los informes estáticos de MeteoAnalitica")
+    parser.add_argument("--datos", default=DATA_DIR, help="Carpeta con los CSV de las estaciones")
+    parser.add_argument("--salida", default=OUTPUT_DIR, help="Carpeta donde se escriben los informes")
+    parser.add_argument("--procesos", type=int, help="Número de procesos (por defecto, uno por núcleo)")
+    parser.add_argument("--formatos", nargs="+", choices=FORMATS, default=list(FORMATS))
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    total = run_batch(args.datos, args.salida, args.procesos, tuple(args.formatos))
+    print(f"{total} informes en {args.salida}")
+
+
+if __name__ == "__main__":
+    main()
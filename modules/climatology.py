@@ -0,0 +1,217 @@
+# modules/climatology.py
+import numpy as np
+import pandas as pd
+
+from modules.data_loader import ensure_calendar_columns
+from modules.telemetry import timed
+
+# Columnas de calendario que se añaden al cargar los datos (no son variables)
+CALENDAR_COLUMNS = ['Mes', 'Año', 'Dia_del_Año']
+EXCLUDED_COLUMNS = ['RECORD_NUMBER', 'DAY'] + CALENDAR_COLUMNS
+
+# Agrupaciones disponibles en el cubo y columnas de calendario que usan
+GROUPINGS = {
+    'Dia_del_Año': ['Dia_del_Año'],
+    'Mes': ['Mes'],
+    'Año': ['Año'],
+    'Dia_del_Año_Año': ['Dia_del_Año', 'Año'],
+    'Mes_Año': ['Mes', 'Año'],
+}
+# Agrupaciones que se calculan a partir de otra más fina sin volver a los datos
+ROLLUPS = {
+    'Mes': ('Mes_Año', 'Mes'),
+    'Año': ('Mes_Año', 'Año'),
+}
+STATS = ('count', 'sum', 'sumsq', 'min', 'max')
+# Agrupaciones que se agregan desde los datos, con sus estadísticos y tipo. Por
+# día del año y año hay casi una fila por registro: solo se guardan el conteo
+# y la suma (para las medias), en float32, para que el cubo no ocupe varias
+# veces lo que los propios datos.
+BASE_TABLES = {
+    'Dia_del_Año_Año': (('count', 'sum'), 'float32'),
+    'Dia_del_Año': (STATS, 'float64'),
+    'Mes_Año': (STATS, 'float64'),
+}
+# Agrupaciones que no se reordenan al añadirles claves en update(): tienen
+# una fila por día del histórico y quienes las usan las reagrupan (unstack),
+# así que no dependen del orden
+UNSORTED_TABLES = {'Dia_del_Año_Año'}
+
+
+def analysis_variables(df):
+    # Columnas numéricas que tiene sentido analizar (sin columnas de calendario)
+    numeric_cols = df.select_dtypes(include=['number']).columns.tolist()
+    return [col for col in numeric_cols if col not in EXCLUDED_COLUMNS]
+
+
+def _aggregate(df, keys, variables, stats=STATS, dtype='float64'):
+    # Se agrega en float64: las lecturas están en float32 y los enteros
+    # pequeños (UInt8, Int16) desbordarían al elevarlos al cuadrado
+    valores = df[variables].astype('float64')
+    grupos = valores.groupby([df[k] for k in keys])
+    calculos = {
+        'count': grupos.count,
+        'sum': lambda: grupos.sum(min_count=0),
+        'sumsq': lambda: (valores * valores).groupby([df[k] for k in keys]).sum(min_count=0),
+        'min': grupos.min,
+        'max': grupos.max,
+    }
+    return {stat: calculos[stat]().astype(dtype) for stat in stats}
+
+
+def _aggregate_base(df, variables):
+    # Todas las agrupaciones de BASE_TABLES de un DataFrame (o de un bloque)
+    return {
+        name: _aggregate(df, GROUPINGS[name], variables, stats, dtype)
+        for name, (stats, dtype) in BASE_TABLES.items()
+    }
+
+
+def _rollup(tabla, level):
+    # Combina estadísticos ya agregados: los conteos y sumas se suman y los
+    # mínimos/máximos se reducen, así que no hace falta recorrer los datos
+    return {
+        'count': tabla['count'].groupby(level=level).sum(),
+        'sum': tabla['sum'].groupby(level=level).sum(),
+        'sumsq': tabla['sumsq'].groupby(level=level).sum(),
+        'min': tabla['min'].groupby(level=level).min(),
+        'max': tabla['max'].groupby(level=level).max(),
+    }
+
+
+def _merge(tabla, nueva, ordenar=True):
+    # Suma los estadísticos de dos agregados de la misma agrupación operando
+    # solo las claves de 'nueva': las que ya existían se combinan en su
+    # posición y las que no, se añaden al final. Con 'ordenar' la tabla
+    # resultante se reordena si esas claves nuevas no quedan en orden (solo
+    # para las tablas pequeñas, ver UNSORTED_TABLES).
+    indice = tabla['count'].index
+    nuevo_indice = nueva['count'].index
+    posiciones = indice.get_indexer(nuevo_indice)
+    existentes = posiciones >= 0
+    filas = posiciones[existentes]
+    añadidas = ~existentes
+    indice = indice.append(nuevo_indice[añadidas]) if añadidas.any() else indice
+    orden = None
+    if ordenar and añadidas.any() and not indice.is_monotonic_increasing:
+        orden = indice.argsort()
+        indice = indice[orden]
+    resultado = {}
+    for stat, t in tabla.items():
+        relleno = 0.0 if stat in ('count', 'sum', 'sumsq') else np.nan
+        valores = t.to_numpy(copy=True)
+        nuevo = nueva[stat].reindex(columns=t.columns, fill_value=relleno).to_numpy(dtype=valores.dtype)
+        if len(filas):
+            viejo = valores[filas]
+            if stat == 'min':
+                valores[filas] = np.fmin(viejo, nuevo[existentes])
+            elif stat == 'max':
+                valores[filas] = np.fmax(viejo, nuevo[existentes])
+            else:
+                valores[filas] = viejo + nuevo[existentes]
+        if añadidas.any():
+            valores = np.concatenate([valores, nuevo[añadidas]])
+        if orden is not None:
+            valores = valores[orden]
+        resultado[stat] = pd.DataFrame(valores, index=indice, columns=t.columns)
+    return resultado
+
+
+class ClimatologyCube:
+    # Estadísticos (count/sum/sumsq/min/max) de todas las variables numéricas
+    # por día del año, mes y año (y conteo y suma por día del año y año, ver
+    # BASE_TABLES). Se construye una vez por versión del dataset y los
+    # módulos lo consultan en lugar de agrupar el DataFrame completo.
+
+    def __init__(self, tables, variables):
+        self.tables = tables
+        self.variables = variables
+
+    @classmethod
+    @timed('cubo')
+    def build(cls, df):
+        df = ensure_calendar_columns(df)
+        variables = analysis_variables(df)
+        tables = _aggregate_base(df, variables)
+        for name, (origen, level) in ROLLUPS.items():
+            tables[name] = _rollup(tables[origen], level)
+        return cls(tables, variables)
+
+    def to_frames(self):
+        # Tablas de BASE_TABLES como DataFrames planos (claves de la agrupación
+        # como columnas y una columna 'estadístico|variable' por valor), para
+        # guardarlas fuera del proceso; las agregaciones de ROLLUPS se
+        # recalculan al leerlas
+        return {
+            name: pd.concat(
+                [self.tables[name]['count'].index.to_frame(index=False)]
+                + [t.add_prefix(f'{stat}|').reset_index(drop=True) for stat, t in self.tables[name].items()],
+                axis=1,
+            )
+            for name in BASE_TABLES
+        }
+
+    @classmethod
+    def from_frames(cls, frames, variables):
+        # Inversa de to_frames
+        tables = {}
+        for name in BASE_TABLES:
+            # Índice con el tipo original de las claves (set_index lo pasaría a int64)
+            keys = GROUPINGS[name]
+            frame = frames[name]
+            indice = pd.MultiIndex.from_frame(frame[keys]) if len(keys) > 1 else pd.Index(frame[keys[0]])
+            frame = frame.drop(columns=keys).set_axis(indice)
+            stats = {}
+            for columna in frame.columns:
+                stat, variable = columna.split('|', 1)
+                stats.setdefault(stat, {})[variable] = frame[columna]
+            tables[name] = {stat: pd.DataFrame(cols, columns=variables) for stat, cols in stats.items()}
+        for name, (origen, level) in ROLLUPS.items():
+            tables[name] = _rollup(tables[origen], level)
+        return cls(tables, variables)
+
+    def update(self, new_rows):
+        # Incorpora filas nuevas (p. ej. los registros añadidos al CSV) sin
+        # recalcular el cubo: solo se agregan las filas nuevas y se combinan
+        # con las claves (días, meses, años) que tocan
+        if new_rows.empty:
+            return
+        variables = [v for v in self.variables if v in new_rows.columns]
+        nuevas = _aggregate_base(new_rows, variables)
+        for name, (origen, level) in ROLLUPS.items():
+            nuevas[name] = _rollup(nuevas[origen], level)
+        # Se sustituye el diccionario completo para que las lecturas
+        # concurrentes vean siempre un cubo coherente
+        self.tables = {
+            name: _merge(self.tables[name], nuevas[name], ordenar=name not in UNSORTED_TABLES)
+            for name in self.tables
+        }
+
+    def select(self, variables):
+        # Cubo con solo 'variables' (p. ej. sin las columnas que han quedado
+        # vacías tras una lectura por bloques)
+        tables = {name: {stat: t[variables] for stat, t in stats.items()} for name, stats in self.tables.items()}
+        return ClimatologyCube(tables, list(variables))
+
+    def stat(self, grouping, variable, stat):
+        return self.tables[grouping][stat][variable]
+
+    def mean(self, grouping, variable):
+        count = self.stat(grouping, variable, 'count')
+        media = self.stat(grouping, variable, 'sum') / count.where(count > 0)
+        return media.astype('float64').rename(variable)
+
+    def std(self, grouping, variable):
+        # Desviación típica muestral a partir de las sumas acumuladas
+        count = self.stat(grouping, variable, 'count')
+        suma = self.stat(grouping, variable, 'sum')
+        sumsq = self.stat(grouping, variable, 'sumsq')
+        n = count.where(count > 1)
+        varianza = ((sumsq - suma * suma / n) / (n - 1)).clip(lower=0)
+        return np.sqrt(varianza).rename(variable)
+
+    def years(self):
+        return self.tables['Año']['count'].index.tolist()
+
+    def months(self):
+        return self.tables['Mes']['count'].index.tolist()
@@ -0,0 +1,91 @@
+# modules/dashboard.py
+import streamlit as st
+
+from modules.analytics import MONTH_NAMES
+from modules.climatology import ClimatologyCube
+from modules.dashboard_snapshot import DashboardSnapshot
+from modules.figure_cache import FIGURE_CACHE
+from modules.telemetry import span
+
+def show_dashboard(df, dashboard=None, quality=None):
+    st.header("📊 Dashboard ultimos registros")
+    st.write("Aquí se muestran los análisis clave del mes más reciente disponible en tus datos.")
+
+    if not df.empty:
+        # Estado del dashboard (registros del último mes, tabla, resumen,
+        # comparación con los años anteriores y gráfico); el Dataset lo
+        # calcula al cargar los datos, si no se recibe se calcula aquí
+        if dashboard is None:
+            dashboard = DashboardSnapshot(df, ClimatologyCube.build(df), quality)
+        latest = dashboard.latest
+
+        if not latest.rows.empty:
+            st.write(f"**Últimos 7 registros disponibles:**") # Cambiado para mostrar los últimos 7 registros
+            # Sin las columnas ocultas ni las variables sin datos en el mes,
+            # con las fechas y horas ya formateadas
+            st.dataframe(dashboard.last_records, hide_index=True) # Muestra los últimos 7 registros sin las columnas ocultas y sin el índice
+
+            # --- Ejemplo de visualización para el dashboard del último mes ---
+            # Puedes personalizar esto con los gráficos y métricas que quieras
+            st.subheader("Temperaturas Diarias del Último Mes")
+
+            # El gráfico se renderiza una vez por versión de los datos
+            with span("figura"):
+                png = dashboard.chart(FIGURE_CACHE)
+                if png is not None:
+                    with span("mostrar"):
+                        st.image(png, width="stretch")
+            if png is None:
+                st.warning("No se encontraron columnas de temperatura para mostrar en el dashboard.")
+
+            st.subheader("Resumen Estadístico del Último Mes")
+            st.write(latest.summary)
+
+            show_comparison(dashboard)
+
+            if quality is not None:
+                show_quality(quality)
+
+        else:
+            st.warning("No se encontraron datos para el mes más reciente.")
+
+
+def show_comparison(dashboard):
+    # Media del mes hasta la fecha frente al mismo periodo de los años anteriores
+    comparacion = dashboard.comparison
+    if comparacion.empty or comparacion['años'].max() == 0:
+        return
+    fecha = dashboard.latest.date
+    st.subheader("Último Mes frente a los Años Anteriores")
+    st.write(
+        f"Media del 1 al {fecha.day} de {MONTH_NAMES[fecha.month].lower()} de {fecha.year} y percentiles "
+        "de la media del mismo periodo en los años anteriores."
+    )
+    st.dataframe(comparacion.round(1))
+
+
+def show_quality(quality):
+    # Resultados del control de calidad hecho al cargar los datos
+    st.subheader("Calidad de los Datos")
+    resumen = quality.summary()
+    st.write(
+        f"{resumen['dias']} días entre {quality.start} y {quality.end}: "
+        f"{resumen['dias_sin_registro']} sin registro, {resumen['dias_repetidos']} repetidos y "
+        f"{resumen['lecturas_fuera_de_rango']} lecturas fuera del rango válido."
+    )
+
+    incompletas = resumen['variables_incompletas']
+    if incompletas:
+        st.write("**Cobertura por año de las variables incompletas (% de días con dato):**")
+        cobertura = quality.coverage('Año')[incompletas].T.mul(100).round(0)
+        cobertura.columns = [str(año) for año in cobertura.columns]
+        st.dataframe(cobertura)
+
+    for titulo, tabla in (
+        ("Días sin registro", quality.missing_days),
+        ("Días repetidos", quality.duplicate_days),
+        ("Lecturas fuera de rango", quality.out_of_range),
+    ):
+        if not tabla.empty:
+            with st.expander(f"{titulo} ({len(tabla)})"):
+                st.dataframe(tabla, hide_index=True)
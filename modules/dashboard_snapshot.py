@@ -0,0 +1,120 @@
+# modules/dashboard_snapshot.py
+# Estado precalculado del dashboard, la página más visitada: registros y
+# resumen del último mes, últimos registros ya formateados, días sin
+# registro, comparación con los años anteriores y los datos del gráfico
+# (la imagen se guarda en la caché de gráficos). El Dataset lo
+# construye al cargar los datos y, cuando llegan filas nuevas, lo rehace a
+# partir del anterior (updated) mirando solo esas filas, así que mostrar el
+# dashboard no vuelve a recorrer el DataFrame.
+import numpy as np
+import pandas as pd
+
+from modules.analytics import (
+    HIDDEN_COLUMNS,
+    TEMPERATURE_COLUMNS,
+    YearMatrix,
+    extend_latest_month,
+    latest_month,
+    month_to_date_percentiles,
+    percentile_bands,
+)
+from modules.schema import TIME_COLUMNS, format_times
+
+# Registros que se muestran en la tabla del dashboard
+LAST_RECORDS = 7
+# Valoración del valor actual según su percentil entre los años anteriores
+# (límite superior de cada tramo)
+PERCENTILE_LABELS = (
+    (10, 'muy por debajo'),
+    (25, 'por debajo'),
+    (75, 'normal'),
+    (90, 'por encima'),
+    (100, 'muy por encima'),
+)
+
+
+def percentile_label(percentil):
+    if np.isnan(percentil):
+        return ''
+    return next(etiqueta for limite, etiqueta in PERCENTILE_LABELS if percentil <= limite)
+
+
+class DashboardSnapshot:
+    # Se construye a partir del DataFrame, del cubo climatológico (para las
+    # bandas de percentiles, sin recorrer los datos) y, si lo hay, del control
+    # de calidad (para ocultar las variables sin datos y marcar los huecos).
+    # 'latest' y 'matrix' (el último mes y la YearMatrix del cubo) los pasa
+    # updated() para no volver a calcularlos.
+
+    def __init__(self, df, cube, quality=None, version=None, latest=None, matrix=None):
+        self.version = version
+        self.latest = latest = latest if latest is not None else latest_month(df)
+        self._matrix = matrix = matrix if matrix is not None else YearMatrix(cube)
+        fecha = latest.date
+        inicio_mes = fecha.to_period('M').start_time
+
+        # Variables sin ningún dato en el mes: no se muestran
+        vacias = set()
+        if quality is not None:
+            con_datos = quality.available_variables(months=[fecha.month], years=(fecha.year, fecha.year))
+            vacias = set(quality.variables) - set(con_datos)
+        columnas = [col for col in latest.rows.columns if col not in HIDDEN_COLUMNS and col not in vacias]
+
+        # Últimos registros con las fechas en DD/MM/AAAA y las horas (minutos
+        # desde medianoche) en HH:MM
+        ultimos = latest.rows[columnas].tail(LAST_RECORDS)
+        if 'DAY' in ultimos.columns:
+            ultimos = ultimos.assign(DAY=ultimos['DAY'].dt.strftime('%d/%m/%Y'))
+        self.last_records = ultimos.assign(
+            **{col: format_times(ultimos[col]) for col in TIME_COLUMNS if col in ultimos.columns})
+
+        # Días del mes sin ningún registro, que se marcan en el gráfico
+        self.gaps = quality.gaps(None, inicio_mes, fecha) if quality is not None else None
+
+        # Franjas de percentiles de los años anteriores en cada día del mes,
+        # para las temperaturas del gráfico
+        self.temperature_columns = [col for col in TEMPERATURE_COLUMNS if col in columnas]
+        dias = pd.date_range(inicio_mes, periods=fecha.days_in_month).dayofyear
+        self.bands = {
+            col: percentile_bands(cube, col, dias, exclude_year=fecha.year, matrix=matrix)
+            for col in self.temperature_columns if col in cube.variables
+        }
+
+        # Media del mes hasta la fecha frente al mismo periodo de los años
+        # anteriores (las horas no se comparan)
+        variables = [v for v in cube.variables if v in columnas and v not in TIME_COLUMNS]
+        comparacion = month_to_date_percentiles(cube, fecha, variables, matrix=matrix)
+        comparacion = comparacion[comparacion['media'].notna()]
+        self.comparison = comparacion.assign(
+            valoracion=[percentile_label(p) for p in comparacion['percentil']])
+
+    def updated(self, new_rows, cube, quality=None, version=None):
+        # Estado con 'new_rows' añadidas a los datos ('cube' y 'quality' ya
+        # las incluyen): el último mes se amplía con las filas nuevas y la
+        # matriz por día del año y año solo cambia en los días que tocan.
+        self._matrix.update(cube, new_rows)
+        latest = extend_latest_month(self.latest, new_rows)
+        return DashboardSnapshot(None, cube, quality, version, latest=latest, matrix=self._matrix)
+
+    @property
+    def chart_key(self):
+        # Clave del gráfico en la caché de gráficos (y en la compartida)
+        return (self.version, 'dashboard')
+
+    def chart(self, cache=None):
+        # PNG del gráfico de temperaturas (None si no hay columnas de
+        # temperatura). Se renderiza al pedirlo, para no importar matplotlib
+        # al cargar los datos. Con 'cache' (una FigureCache) la imagen se
+        # guarda allí con la clave chart_key, y no en el estado: así se
+        # descarta con el resto de gráficos y puede tenerla ya otra réplica.
+        if not self.temperature_columns:
+            return None
+
+        def render():
+            from modules.rendering import latest_month_figure
+            return latest_month_figure(self.latest, self.temperature_columns, self.gaps, self.bands)
+
+        if cache is not None and self.version is not None:
+            return cache.get_or_render(self.chart_key, render)
+        from modules.plotting import figure_to_png
+        return figure_to_png(render())
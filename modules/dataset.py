@@ -0,0 +1,230 @@
+# modules/dataset.py
+import logging
+import threading
+import time
+
+import pandas as pd
+
+from modules.climatology import ClimatologyCube
+from modules.dashboard_snapshot import DashboardSnapshot
+from modules.extremes_index import ExtremesIndex
+from modules.level_of_detail import LevelOfDetail
+from modules.quality import QualityIndex
+from modules.rolling import RollingEngine
+from modules.data_loader import (
+    align_dtypes,
+    append_to_cache,
+    load_dataframe,
+    read_appended_rows,
+    schema_matches,
+    source_signature,
+)
+from modules.shared_cache import Snapshot, default_backend, load_snapshot, publish_snapshot
+from modules.telemetry import count, span
+
+logger = logging.getLogger(__name__)
+
+# Con Copy-on-Write (siempre activo desde pandas 3.0) las vistas ligeras del
+# DataFrame compartido no copian datos y nunca pueden modificarlo
+if int(pd.__version__.split(".")[0]) < 3:
+    pd.set_option("mode.copy_on_write", True)
+
+
+class RunningAggregates:
+    # Cubo climatológico e índice de extremos que se van actualizando con
+    # cada bloque de una lectura por bloques, sin volver a recorrer después
+    # el DataFrame completo. Si un bloque no tiene los mismos tipos que el
+    # primero (p. ej. un entero con decimales) se abandonan y se calculan
+    # al final sobre el DataFrame, con sus tipos definitivos.
+
+    def __init__(self):
+        self.cube = None
+        self.extremes = None
+        self._dtypes = None
+
+    def add(self, chunk):
+        if self._dtypes is None:
+            self._dtypes = chunk.dtypes
+            self.cube = ClimatologyCube.build(chunk)
+            self.extremes = ExtremesIndex.build(chunk, self.cube.variables)
+        elif self.cube is not None and chunk.dtypes.equals(self._dtypes):
+            self.cube.update(chunk)
+            self.extremes.update(chunk)
+        else:
+            self.cube = self.extremes = None
+
+    def result(self, df):
+        # (cubo, índice) con las variables que tiene el DataFrame final (sin
+        # las columnas que han quedado vacías), o None si no los hay
+        if self.cube is None:
+            return None
+        cube = self.cube.select([v for v in self.cube.variables if v in df.columns])
+        return cube, self.extremes.select(df)
+
+
+def read_source(file_path, shared=None):
+    # Firma del CSV (tomada antes de leerlo) + DataFrame + informe de carga +
+    # (cubo, índice de extremos). Si la caché compartida ('shared' o la del
+    # entorno) tiene la estación se usa esa; si no, se lee el CSV (o la caché
+    # local) y se publica para las demás réplicas. Es una función de módulo
+    # para poder ejecutarla en otro proceso.
+    inicio = time.perf_counter()
+    signature = source_signature(file_path)
+    backend = shared if shared is not None else default_backend()
+    if backend is not None:
+        try:
+            with span("cache_compartida"):
+                snapshot = load_snapshot(backend, file_path)
+        except Exception as e:
+            logger.warning("No se pudo leer %s de la caché compartida: %s", file_path, e)
+            snapshot = None
+        count("cache_compartida", resultado="fallo" if snapshot is None else "acierto")
+        if snapshot is not None:
+            timings = {
+                "origen": "caché compartida",
+                "lectura_s": time.perf_counter() - inicio,
+                "escritura_cache_s": 0.0,
+                "filas_nuevas": snapshot.new_rows,
+                "estado": snapshot.state,
+                "version": snapshot.version,
+            }
+            if snapshot.new_rows:
+                # La instantánea se queda al día para las siguientes réplicas
+                _publish(backend, file_path, snapshot, timings)
+            timings["total_s"] = time.perf_counter() - inicio
+            return signature, snapshot.df, timings, (snapshot.cube, snapshot.extremes)
+
+    agregados = RunningAggregates()
+    with span("lectura"):
+        df, timings = load_dataframe(file_path, on_chunk=agregados.add)
+    with span("agregados"):
+        agregados = agregados.result(df)
+        if agregados is None:
+            cube = ClimatologyCube.build(df)
+            agregados = cube, ExtremesIndex.build(df, cube.variables)
+    timings["version"] = timings["estado"]["version"]
+    if backend is not None:
+        _publish(backend, file_path, _snapshot_of(df, agregados, timings), timings)
+    return signature, df, timings, agregados
+
+
+def _snapshot_of(df, agregados, timings):
+    cube, extremes = agregados
+    return Snapshot(df, cube, extremes, timings["estado"], timings["version"], timings["filas_nuevas"])
+
+
+def _publish(backend, file_path, snapshot, timings):
+    t0 = time.perf_counter()
+    try:
+        with span("publicar"):
+            publish_snapshot(backend, file_path, snapshot.version, snapshot.state,
+                             snapshot.df, snapshot.cube, snapshot.extremes)
+    except Exception as e:
+        logger.warning("No se pudo publicar %s en la caché compartida: %s", file_path, e)
+    timings["escritura_cache_s"] = timings.get("escritura_cache_s", 0.0) + time.perf_counter() - t0
+
+
+class Dataset:
+    # Datos de un CSV ya cargados junto con sus estructuras derivadas (cubo
+    # climatológico, índice de extremos, series reducidas para gráficos,
+    # series móviles, control de calidad y estado del dashboard). Se comparte entre sesiones y,
+    # cuando el CSV crece con registros nuevos, solo se leen esas filas y se
+    # actualizan los agregados.
+
+    def __init__(self, file_path, loaded=None):
+        # 'loaded' permite construirlo a partir del resultado de read_source
+        # ya calculado (p. ej. en un pool de procesos)
+        self.file_path = file_path
+        self._lock = threading.Lock()
+        self._load_full(loaded)
+
+    def _load_full(self, loaded=None):
+        signature, df, timings, (self.cube, self.extremes) = loaded if loaded is not None else read_source(self.file_path)
+        count("carga", origen=timings["origen"])
+        self.df = df
+        self.detail = LevelOfDetail(self.cube)
+        self.rolling = RollingEngine(df, self.cube)
+        with span("calidad"):
+            self.quality = QualityIndex(df, self.cube)
+        self._state = timings.get("estado")
+        self._signature = signature
+        # La versión es la huella de los bytes del CSV que se han leído (no
+        # de la ruta ni de la fecha del fichero): es la misma en todas las
+        # réplicas y sirve de clave en la caché compartida de gráficos
+        self.version = timings["version"]
+        self.dashboard = self._dashboard()
+        self.last_load = timings
+
+    def _dashboard(self):
+        # Estado precalculado del dashboard para la versión actual de los datos
+        if self.df.empty:
+            return None
+        with span("dashboard"):
+            return DashboardSnapshot(self.df, self.cube, self.quality, self.version)
+
+    def view(self):
+        # Vista ligera (sin copiar datos) del DataFrame compartido. Cada vista
+        # recibe la suya: si añade columnas o modifica valores, Copy-on-Write
+        # copia solo lo que cambia y el DataFrame compartido queda intacto.
+        return self.df.copy(deep=False)
+
+    def refresh(self):
+        # Comprueba (solo con un stat) si el CSV ha cambiado. Si solo tiene
+        # registros nuevos al final se incorporan a los índices (cubo,
+        # extremos, calidad, series móviles y dashboard) recorriendo solo las
+        # filas nuevas; si se ha reescrito se vuelve a cargar entero. Devuelve
+        # el número de filas nuevas. Lo que sigue dependiendo del tamaño del
+        # histórico: la huella del contenido ya leído (read_appended_rows lo
+        # vuelve a leer del disco para detectar ediciones), la copia del
+        # DataFrame al añadirle las filas (las vistas necesitan un único
+        # DataFrame) y los arrays de un valor por día de las series móviles.
+        signature = source_signature(self.file_path)
+        if signature == self._signature:
+            return 0
+        with self._lock:
+            if signature == self._signature:
+                return 0
+            inicio = time.perf_counter()
+            appended = read_appended_rows(self.file_path, self._state) if self._state else None
+            if appended is not None:
+                new_rows, state = appended
+                new_rows = align_dtypes(new_rows, self.df)
+            if appended is None or not schema_matches(new_rows, self.df):
+                logger.info("%s ha cambiado; se vuelve a cargar completo", self.file_path)
+                self._load_full()
+                return len(self.df)
+
+            try:
+                append_to_cache(self.file_path, new_rows, self._state, state)
+            except OSError as e:
+                logger.warning("No se pudo actualizar la caché de %s: %s", self.file_path, e)
+            count("carga", origen="incremental")
+            if len(new_rows):
+                with span("incorporar"):
+                    self.df = pd.concat([self.df, new_rows], ignore_index=True)
+                    self.cube.update(new_rows)
+                    self.extremes.update(new_rows)
+                # Las series reducidas se vuelven a calcular desde el cubo al pedirlas
+                self.detail = LevelOfDetail(self.cube)
+                self.rolling = self.rolling.updated(self.df, new_rows, self.cube)
+                with span("calidad"):
+                    self.quality.update(new_rows, self.cube)
+            self._state = state
+            self._signature = signature
+            # Huella de lo leído hasta ahora: read_appended_rows ya ha
+            # comprobado que el contenido anterior no ha cambiado
+            self.version = state["version"]
+            if len(new_rows):
+                if self.dashboard is None:
+                    self.dashboard = self._dashboard()
+                else:
+                    with span("dashboard"):
+                        self.dashboard = self.dashboard.updated(new_rows, self.cube, self.quality, self.version)
+            self.last_load = {
+                "origen": "incremental",
+                "filas_nuevas": len(new_rows),
+                "estado": state,
+                "total_s": time.perf_counter() - inicio,
+            }
+            logger.info("Añadidas %d filas nuevas de %s", len(new_rows), self.file_path)
+            return len(new_rows)
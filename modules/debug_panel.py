@@ -0,0 +1,70 @@
+# modules/debug_panel.py
+# Panel de depuración de la barra lateral: origen y tiempo de la carga de
+# los datos, estado de la caché de gráficos, tramos de la ejecución actual
+# (duración y variación de memoria), eventos de las cachés y métricas
+# acumuladas del proceso. Se muestra con ?debug=1 en la URL o con la variable
+# de entorno METEO_DEBUG=1.
+import os
+
+import pandas as pd
+import streamlit as st
+
+from modules.figure_cache import FIGURE_CACHE
+from modules.telemetry import SEPARATOR, TELEMETRY, rss_bytes
+
+DEBUG_VAR = "METEO_DEBUG"
+MB = 1024 * 1024
+
+
+def debug_enabled():
+    return os.environ.get(DEBUG_VAR) == "1" or st.query_params.get("debug") == "1"
+
+
+def _indent(ruta):
+    nivel = ruta.count(SEPARATOR)
+    nombre = ruta.rsplit(SEPARATOR, 1)[-1]
+    # Sangría con espacios eme (U+2003), que se distinguen en la tabla
+    return '\u2003' * (nivel - 1) + f"└ {nombre}" if nivel else nombre
+
+
+def show_debug_panel(trace, load_timings=None):
+    # 'load_timings' es el informe de la última carga del dataset (last_load)
+    with st.sidebar.expander("🛠️ Depuración", expanded=True):
+        if load_timings:
+            st.caption(f"Datos leídos desde {load_timings['origen']} en {load_timings['total_s'] * 1000:.0f} ms")
+        figure_stats = FIGURE_CACHE.stats()
+        compartidos = f" ({figure_stats['compartidos']} de la caché compartida)" if figure_stats["compartidos"] else ""
+        st.caption(f"Caché de gráficos: {figure_stats['aciertos']} aciertos, {figure_stats['fallos']} fallos{compartidos}")
+
+        if not TELEMETRY.enabled:
+            st.caption("La instrumentación está desactivada (METEO_TELEMETRY=0).")
+            return
+        rss = rss_bytes()
+        memoria = f", memoria residente {rss / MB:.0f} MB" if rss is not None else ""
+        st.caption(f"Ejecución: {trace.seconds * 1000:.0f} ms{memoria}")
+
+        # Tramos en el orden en que empezaron, sangrados según su anidamiento
+        tramos = sorted(trace.spans, key=lambda s: s.start_s)
+        st.dataframe(pd.DataFrame({
+            'tramo': [_indent(s.name) for s in tramos],
+            'ms': [round(s.seconds * 1000, 1) for s in tramos],
+            'Δ MB': [round(s.memory_bytes / MB, 1) if s.memory_bytes is not None else None for s in tramos],
+        }), hide_index=True)
+
+        if trace.events:
+            st.write("**Eventos de esta ejecución:**")
+            st.dataframe(pd.DataFrame(
+                [{'evento': nombre, **dict(etiquetas), 'n': valor} for (nombre, etiquetas), valor in trace.events.items()]
+            ), hide_index=True)
+
+        # Métricas acumuladas del proceso (todas las sesiones) por vista
+        acumulado = TELEMETRY.snapshot()["tramos"]
+        vistas = pd.DataFrame(
+            [(dict(etiquetas).get('vista', ''), n, segundos)
+             for (nombre, etiquetas), (n, segundos) in acumulado.items() if nombre == trace.name],
+            columns=['vista', 'ejecuciones', 'segundos'],
+        ).groupby('vista', as_index=False).sum()
+        if not vistas.empty:
+            st.write("**Ejecuciones del proceso por vista:**")
+            vistas['media ms'] = (vistas['segundos'] / vistas['ejecuciones'] * 1000).round(1)
+            st.dataframe(vistas.drop(columns='segundos'), hide_index=True)
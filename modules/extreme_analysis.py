@@ -1,18 +1,22 @@
 import streamlit as st
-import pandas as pd
 
-def show_extreme_analysis(df):
+from modules.analytics import MONTH_NAMES, extremes as extremes_query
+from modules.extremes_index import ExtremesIndex, SEASONS
+from modules.quality import VALID_RANGES
+from modules.tables import extremes_table_html
+
+def show_extreme_analysis(df, extremes=None, quality=None):
     st.header("🌡️ Análisis de Extremos Climáticos")
     st.write("Identifica los días con los valores más altos o más bajos para una variable específica.")
 
-    # Identificar columnas numéricas para la selección de variables
-    # Excluimos 'Mes', 'Año' y 'Dia_del_Año' (si existe de historical_averages)
-    columnas_numericas = df.select_dtypes(include=['number']).columns.tolist()
-    for col in ['Mes', 'Año', 'Dia_del_Año']:
-        if col in columnas_numericas:
-            columnas_numericas.remove(col)
-    if 'DAY' in columnas_numericas: # Por si 'DAY' se interpreta como numérico (raro)
-        columnas_numericas.remove('DAY')
+    # Los extremos se consultan en un índice precalculado (los valores más
+    # altos y más bajos de cada variable) en lugar de ordenar todo el
+    # DataFrame en cada interacción; si no se recibe uno se construye aquí
+    if extremes is None:
+        extremes = ExtremesIndex.build(df)
+
+    # Variables numéricas (sin 'Mes', 'Año', 'Dia_del_Año' ni 'DAY')
+    columnas_numericas = extremes.variables
 
     if not columnas_numericas:
         st.warning("No se encontraron columnas numéricas para realizar el análisis de extremos.")
@@ -34,61 +38,63 @@ def show_extreme_analysis(df):
         min_value=5, max_value=50, value=10, step=5
     )
 
+    # Filtros opcionales por mes, estación del año y rango de años
+    meses_nombres = MONTH_NAMES
+    filtro_periodo = st.sidebar.selectbox(
+        "Limitar a:",
+        options=["Todo el año", "Un mes", "Una estación del año"]
+    )
+    selected_months = None
+    if filtro_periodo == "Un mes":
+        nombre_mes = st.sidebar.selectbox("Mes:", options=list(meses_nombres.values()))
+        selected_months = [m for m, nombre in meses_nombres.items() if nombre == nombre_mes]
+    elif filtro_periodo == "Una estación del año":
+        estacion = st.sidebar.selectbox("Estación del año:", options=list(SEASONS.keys()))
+        selected_months = SEASONS[estacion]
+
+    selected_years = None
+    año_min, año_max = extremes.year_range
+    if año_min < año_max:
+        rango_años = st.sidebar.slider(
+            "Rango de años:",
+            min_value=año_min, max_value=año_max, value=(año_min, año_max)
+        )
+        if rango_años != (año_min, año_max):
+            selected_years = rango_años
+
     st.subheader(f"Los {num_records} días con la {selected_variable} {extreme_type}")
 
-    # Ordenar el DataFrame según la selección
-    if extreme_type == "Más Alta":
-        # Asegúrate de que los valores NaN no afecten el orden
-        df_sorted = df.sort_values(by=selected_variable, ascending=False, na_position='last')
-    else: # Más Baja
-        df_sorted = df.sort_values(by=selected_variable, ascending=True, na_position='first')
-
-    # Seleccionar las columnas relevantes para mostrar
-    # Asegúrate de incluir 'DAY' y la variable seleccionada
-    columns_to_display = ['DAY', selected_variable]
-
-    # Opcional: añadir otras columnas descriptivas si existen
-    # if 'Temperatura_Maxima' in df.columns: columns_to_display.append('Temperatura_Maxima')
-    # if 'Temperatura_Minima' in df.columns: columns_to_display.append('Temperatura_Minima')
-    # if 'Precipitacion' in df.columns: columns_to_display.append('Precipitacion')
-    # ... y así con otras columnas importantes para el contexto
-
-    # Formatear la columna DAY para mostrar solo la fecha en formato DD/MM/AAAA
-    df_sorted['DAY'] = df_sorted['DAY'].dt.strftime('%d/%m/%Y')
-    
-    # Mostrar solo las columnas deseadas y los 'num_records' primeros
-    # Usamos .reset_index(drop=True) para limpiar el índice después de la ordenación
-    df_to_show = df_sorted[columns_to_display].head(num_records).reset_index(drop=True)
-    
-    # Crear una tabla HTML personalizada
-    table_html = """
-    <div style="display: flex; justify-content: center;">
-        <table style="border-collapse: collapse; width: 100%; max-width: 800px; margin: 20px auto;">
-            <thead>
-                <tr style="background-color: #f0f0f0; color: #333;">
-    """
-    
-    # Agregar las cabeceras de la tabla
-    for col in df_to_show.columns:
-        table_html += f"<th style='text-align: center; padding: 8px; border: 1px solid #ddd;'>{col}</th>"
-    
-    table_html += "</tr></thead><tbody>"
-    
-    # Agregar las filas de datos
-    for _, row in df_to_show.iterrows():
-        table_html += "<tr>"
-        for value in row:
-            table_html += f"<td style='text-align: center; padding: 8px; border: 1px solid #ddd;'>{value}</td>"
-        table_html += "</tr>"
-    
-    table_html += "</tbody></table></div>"
-    
-    # Mostrar la tabla HTML con st.markdown
-    st.markdown(table_html, unsafe_allow_html=True)
+    df_to_show = extremes_query(
+        df,
+        selected_variable,
+        num_records,
+        direction='max' if extreme_type == "Más Alta" else 'min',
+        months=selected_months,
+        years=selected_years,
+        index=extremes,
+    )
+
+    if df_to_show.empty:
+        st.warning(f"No hay datos de {selected_variable} para el periodo seleccionado.")
+        return
+
+    # Tabla HTML personalizada (la fecha en formato DD/MM/AAAA se formatea
+    # solo en las filas que se muestran)
+    st.markdown(extremes_table_html(df_to_show), unsafe_allow_html=True)
+
+    # Aviso si alguno de los días mostrados es una lectura fuera del rango
+    # válido detectada en el control de calidad
+    if quality is not None:
+        sospechosos = quality.out_of_range[quality.out_of_range['variable'] == selected_variable]
+        n_sospechosos = int(df_to_show['DAY'].isin(sospechosos['DAY']).sum())
+        if n_sospechosos:
+            minimo, maximo = VALID_RANGES[selected_variable]
+            st.warning(f"{n_sospechosos} de estos valores están fuera del rango válido de {selected_variable} "
+                       f"({minimo} a {maximo}) y probablemente son lecturas erróneas.")
 
     # Opcional: mostrar un pequeño gráfico de dispersión de estos puntos
     # import altair as alt # Si quieres gráficos interactivos, necesitarías instalar altair
-    # chart_df = df_sorted.head(num_records).copy()
+    # chart_df = df_to_show.copy()
     # if not chart_df.empty:
     #     chart = alt.Chart(chart_df).mark_point().encode(
     #         x='DAY',
@@ -0,0 +1,329 @@
+# modules/extremes_index.py
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from modules.climatology import analysis_variables
+from modules.schema import DATE_COLUMN, DATE_DTYPE
+from modules.telemetry import timed
+
+# Número máximo de extremos que devuelve una consulta: se guardan los TOP_K
+# más altos y más bajos de todo el registro y de cada mes de cada año
+TOP_K = 50
+
+# Meses de cada estación del año (hemisferio norte, estaciones meteorológicas)
+SEASONS = {
+    'Invierno': [12, 1, 2],
+    'Primavera': [3, 4, 5],
+    'Verano': [6, 7, 8],
+    'Otoño': [9, 10, 11],
+}
+
+
+def _numpy_values(serie):
+    # Valores como array de NumPy con el tipo de la columna (los enteros con
+    # nulos, con su tipo NumPy). Los nulos quedan con un valor cualquiera:
+    # quien llama solo usa los no nulos.
+    tipo = np.dtype(getattr(serie.dtype, 'numpy_dtype', serie.dtype))
+    return serie.to_numpy(dtype=tipo, na_value=np.nan if tipo.kind == 'f' else 0)
+
+
+def _calendar(df):
+    # Mes (meses desde 1970) y día del mes (0 = día 1) de cada fila, y
+    # máscara de las filas con fecha
+    dias = df[DATE_COLUMN].to_numpy().astype('datetime64[D]')
+    con_fecha = ~np.isnat(dias)
+    dias = dias[con_fecha]
+    meses = dias.astype('datetime64[M]')
+    return meses.astype(np.int64), (dias - meses.astype('datetime64[D]')).astype(np.uint8), con_fecha
+
+
+def _month_start(meses):
+    # Primer día (días desde 1970) de cada mes (meses desde 1970)
+    return meses.astype('datetime64[M]').astype('datetime64[D]').astype(np.int64)
+
+
+def _ranges(inicios, largos):
+    # Posiciones de los tramos [inicio, inicio + largo) seguidos
+    if not len(largos):
+        return np.array([], dtype=np.int64)
+    desplazamiento = np.repeat(inicios - (np.cumsum(largos) - largos), largos)
+    return np.arange(int(largos.sum())) + desplazamiento
+
+
+def _order(valores, dias, n, largest):
+    # Posiciones de los n valores más altos (o más bajos) ordenadas, con una
+    # selección parcial (argpartition) en lugar de ordenar todo el array. A
+    # igualdad de valor va antes el día más antiguo.
+    if n <= 0 or not len(valores):
+        return np.array([], dtype=np.int64)
+    claves = valores.astype('float64')
+    if largest:
+        claves = -claves
+    if len(claves) > n:
+        umbral = claves[np.argpartition(claves, n - 1)[n - 1]]
+        mejores = np.flatnonzero(claves < umbral)
+        empates = np.flatnonzero(claves == umbral)
+        empates = empates[np.argsort(dias[empates], kind='stable')[:n - len(mejores)]]
+        posiciones = np.concatenate([mejores, empates])
+    else:
+        posiciones = np.arange(len(claves))
+    return posiciones[np.lexsort((dias[posiciones], claves[posiciones]))]
+
+
+def _keep(valores, dias, k):
+    # Candidatos de un mes: solo pueden ser extremos de alguna consulta sus k
+    # valores más altos y sus k más bajos (con datos diarios, un mes nunca
+    # pasa de 2k registros y se guardan todos)
+    if len(valores) <= 2 * k:
+        return np.arange(len(valores))
+    return np.union1d(_order(valores, dias, k, True), _order(valores, dias, k, False))
+
+
+class _Candidates(NamedTuple):
+    # Candidatos de una variable, agrupados por mes. Los de cada mes ocupan
+    # valores[inicios[i]:fines[i]]; al rehacer un mes se escriben a partir
+    # de 'usados' (lo anterior no se modifica, así que una consulta que está
+    # leyendo el estado anterior sigue viéndolo entero) y cuando se acaba el
+    # espacio libre se compacta todo en arrays nuevos.
+    valores: np.ndarray
+    dias: np.ndarray       # día del mes de cada candidato (0 = día 1)
+    inicios: np.ndarray
+    fines: np.ndarray
+    usados: int
+    globales: dict         # {largest: (valores, días desde 1970)}: los k extremos del registro
+
+
+class ExtremesIndex:
+    # Índice de extremos por variable: los TOP_K valores más altos y más bajos
+    # de todo el registro (para la consulta sin filtros) y, de cada mes de
+    # cada año, sus TOP_K más altos y más bajos (candidatos), con los que se
+    # responden las consultas por mes, estación o rango de años mirando solo
+    # los meses que cumplen el filtro. Al añadir registros solo se vuelven a
+    # seleccionar los meses que tocan.
+
+    def __init__(self, k=TOP_K):
+        self.k = k
+        self.variables = []
+        self.year_range = None
+        self._dtypes = {}
+        # (meses con registros, ordenados; {variable: _Candidates}). Se
+        # sustituye entero en cada actualización para que las consultas
+        # concurrentes vean siempre un índice coherente.
+        self._estado = (np.array([], dtype=np.int64), {})
+
+    @classmethod
+    @timed('indice_extremos')
+    def build(cls, df, variables=None, k=TOP_K):
+        index = cls(k)
+        index.variables = list(variables) if variables is not None else analysis_variables(df)
+        vacio = {True: (np.array([]), np.array([], dtype=np.int64))}
+        vacio[False] = vacio[True]
+        candidatos = {}
+        for variable in index.variables:
+            tipo = df[variable].dtype
+            index._dtypes[variable] = tipo
+            candidatos[variable] = _Candidates(
+                np.array([], dtype=getattr(tipo, 'numpy_dtype', tipo)), np.array([], dtype=np.uint8),
+                np.array([], dtype=np.int64), np.array([], dtype=np.int64), 0, vacio)
+        index._estado = (np.array([], dtype=np.int64), candidatos)
+        index.update(df)
+        return index
+
+    def update(self, new_rows):
+        # Incorpora registros nuevos: por variable, los candidatos de los
+        # meses que tocan se combinan con las filas nuevas y se vuelven a
+        # seleccionar, y los extremos del registro se combinan con ellas
+        if new_rows.empty:
+            return
+        meses, dias, con_fecha = _calendar(new_rows)
+        if not len(meses):
+            return
+        cubetas, candidatos = self._estado
+        años = (int(meses.min() // 12) + 1970, int(meses.max() // 12) + 1970)
+        if self.year_range is not None:
+            años = (min(años[0], self.year_range[0]), max(años[1], self.year_range[1]))
+
+        # Meses que aún no tenían registros: se añaden con cero candidatos
+        nuevas = np.setdiff1d(meses, cubetas)
+        if len(nuevas):
+            posiciones = np.searchsorted(cubetas, nuevas)
+            cubetas = np.insert(cubetas, posiciones, nuevas)
+            candidatos = {
+                variable: c._replace(inicios=np.insert(c.inicios, posiciones, 0), fines=np.insert(c.fines, posiciones, 0))
+                for variable, c in candidatos.items()
+            }
+
+        # Posición del mes de cada fila en 'cubetas', meses que tocan las filas
+        # nuevas y fecha (días desde 1970) de cada fila
+        cubeta = np.searchsorted(cubetas, meses)
+        afectadas = np.flatnonzero(np.bincount(cubeta, minlength=len(cubetas)))
+        completos = _month_start(meses) + dias
+        candidatos = dict(candidatos)
+        for variable in self.variables:
+            if variable not in new_rows.columns:
+                continue
+            serie = new_rows[variable]
+            validos = serie.notna().to_numpy()
+            valores = _numpy_values(serie)
+            if not con_fecha.all():
+                validos, valores = validos[con_fecha], valores[con_fecha]
+            if not validos.any():
+                continue
+            valores = valores[validos]
+            candidatos[variable] = self._merge(
+                candidatos[variable], afectadas, cubeta[validos], dias[validos], completos[validos], valores)
+        self._estado = (cubetas, candidatos)
+        self.year_range = años
+
+    def select(self, df):
+        # Índice con solo las variables de 'df' y con sus tipos (p. ej. tras
+        # una lectura por bloques, sin las columnas que han quedado vacías)
+        index = ExtremesIndex(self.k)
+        index.variables = [v for v in self.variables if v in df.columns]
+        index.year_range = self.year_range
+        index._dtypes = {v: df[v].dtype for v in index.variables}
+        cubetas, candidatos = self._estado
+        index._estado = (cubetas, {v: candidatos[v] for v in index.variables})
+        return index
+
+    def _merge(self, c, afectadas, cubeta, dias, completos, valores):
+        # Candidatos 'c' con las filas nuevas incorporadas. 'afectadas' son
+        # los meses que se rehacen (los de todas las filas nuevas) y 'cubeta'
+        # el mes de cada fila, como posiciones en la lista de meses.
+        valores = valores.astype(c.valores.dtype, copy=False)
+
+        # Extremos del registro: los anteriores más los de las filas nuevas
+        globales = {}
+        for largest in (True, False):
+            previos_v, previos_d = c.globales[largest]
+            todos_v = np.concatenate([previos_v.astype(valores.dtype, copy=False), valores])
+            todos_d = np.concatenate([previos_d, completos])
+            orden = _order(todos_v, todos_d, self.k, largest)
+            globales[largest] = (todos_v[orden], todos_d[orden])
+
+        largos = c.fines[afectadas] - c.inicios[afectadas]
+        anteriores = _ranges(c.inicios[afectadas], largos)
+        cubeta = np.concatenate([np.repeat(afectadas, largos), cubeta])
+        valores = np.concatenate([c.valores[anteriores], valores])
+        dias = np.concatenate([c.dias[anteriores], dias])
+        if len(cubeta) > 1 and (np.diff(cubeta) < 0).any():
+            orden = np.argsort(cubeta, kind='stable')
+            cubeta, valores, dias = cubeta[orden], valores[orden], dias[orden]
+
+        # Selección de los candidatos de cada mes afectado (solo hace falta
+        # en los que tienen más de 2k registros)
+        cortes = np.flatnonzero(np.diff(cubeta)) + 1
+        inicios = np.concatenate([[0], cortes])
+        fines = np.concatenate([cortes, [len(cubeta)]])
+        grandes = np.flatnonzero(fines - inicios > 2 * self.k)
+        if len(grandes):
+            conservar = np.ones(len(cubeta), dtype=bool)
+            for i in grandes:
+                conservar[inicios[i]:fines[i]] = False
+                conservar[inicios[i] + _keep(valores[inicios[i]:fines[i]], dias[inicios[i]:fines[i]], self.k)] = True
+            cubeta, valores, dias = cubeta[conservar], valores[conservar], dias[conservar]
+        nuevos_largos = np.bincount(cubeta, minlength=len(c.inicios))[afectadas]
+
+        inicios = c.inicios.copy()
+        fines = c.fines.copy()
+        fin = c.usados + len(valores)
+        if fin <= len(c.valores):
+            # Hay espacio libre: los meses rehechos se escriben al final
+            buffer_v, buffer_d = c.valores, c.dias
+            buffer_v[c.usados:fin] = valores
+            buffer_d[c.usados:fin] = dias
+            inicios[afectadas] = c.usados + np.cumsum(nuevos_largos) - nuevos_largos
+            fines[afectadas] = inicios[afectadas] + nuevos_largos
+            return _Candidates(buffer_v, buffer_d, inicios, fines, fin, globales)
+
+        # Sin espacio: se compactan todos los meses, en orden, en arrays
+        # nuevos con un octavo de espacio libre para las próximas filas
+        largos = fines - inicios
+        largos[afectadas] = nuevos_largos
+        nuevos_inicios = np.cumsum(largos) - largos
+        total = int(largos.sum())
+        buffer_v = np.empty(total + total // 8 + 64, dtype=c.valores.dtype)
+        buffer_d = np.empty(len(buffer_v), dtype=np.uint8)
+        resto = np.ones(len(largos), dtype=bool)
+        resto[afectadas] = False
+        origen = _ranges(c.inicios[resto], largos[resto])
+        destino = _ranges(nuevos_inicios[resto], largos[resto])
+        buffer_v[destino] = c.valores[origen]
+        buffer_d[destino] = c.dias[origen]
+        destino = _ranges(nuevos_inicios[afectadas], nuevos_largos)
+        buffer_v[destino] = valores
+        buffer_d[destino] = dias
+        return _Candidates(buffer_v, buffer_d, nuevos_inicios, nuevos_inicios + largos, total, globales)
+
+    def to_frames(self):
+        # Meses con registros (con el número de candidatos de cada variable
+        # en cada uno) y candidatos de cada variable, con el tipo original de
+        # sus valores, para guardarlos fuera del proceso
+        cubetas, candidatos = self._estado
+        frames = {'cubetas': pd.DataFrame({'mes': cubetas})}
+        for variable in self.variables:
+            c = candidatos[variable]
+            posiciones = _ranges(c.inicios, c.fines - c.inicios)
+            frames['cubetas'][variable] = c.fines - c.inicios
+            frames[variable] = pd.DataFrame({
+                'valor': pd.Series(c.valores[posiciones]).astype(self._dtypes[variable]),
+                'dia': c.dias[posiciones],
+            })
+        return frames
+
+    @classmethod
+    def from_frames(cls, frames, variables, year_range, k=TOP_K):
+        # Inversa de to_frames (los extremos del registro se vuelven a
+        # seleccionar entre los candidatos)
+        index = cls(k)
+        index.variables = list(variables)
+        index.year_range = tuple(year_range) if year_range is not None else None
+        cubetas = frames['cubetas']['mes'].to_numpy(dtype=np.int64)
+        candidatos = {}
+        for variable in index.variables:
+            frame = frames[variable]
+            valores = _numpy_values(frame['valor'])
+            dias = frame['dia'].to_numpy(dtype=np.uint8)
+            largos = frames['cubetas'][variable].to_numpy(dtype=np.int64)
+            inicios = np.cumsum(largos) - largos
+            completos = _month_start(np.repeat(cubetas, largos)) + dias
+            globales = {}
+            for largest in (True, False):
+                orden = _order(valores, completos, k, largest)
+                globales[largest] = (valores[orden], completos[orden])
+            index._dtypes[variable] = frame['valor'].dtype
+            candidatos[variable] = _Candidates(valores, dias, inicios, inicios + largos, len(valores), globales)
+        index._estado = (cubetas, candidatos)
+        return index
+
+    def query(self, variable, n, largest=True, months=None, years=None):
+        # Devuelve los n días con el valor más alto (o más bajo) de la
+        # variable, opcionalmente limitados a unos meses y a un rango de años.
+        # A igualdad de valor va antes el día más antiguo.
+        n = min(n, self.k)
+        cubetas, candidatos = self._estado
+        c = candidatos[variable]
+        if months is None and years is None:
+            valores, dias = (a[:n] for a in c.globales[largest])
+        else:
+            cumplen = np.ones(len(cubetas), dtype=bool)
+            if months is not None:
+                en_meses = np.zeros(13, dtype=bool)
+                en_meses[list(months)] = True
+                cumplen &= en_meses[cubetas % 12 + 1]
+            if years is not None:
+                años = cubetas // 12 + 1970
+                cumplen &= (años >= years[0]) & (años <= years[1])
+            elegidas = np.flatnonzero(cumplen)
+            largos = c.fines[elegidas] - c.inicios[elegidas]
+            posiciones = _ranges(c.inicios[elegidas], largos)
+            valores = c.valores[posiciones]
+            dias = _month_start(np.repeat(cubetas[elegidas], largos)) + c.dias[posiciones]
+            orden = _order(valores, dias, n, largest)
+            valores, dias = valores[orden], dias[orden]
+        return pd.DataFrame({
+            'DAY': dias.astype('datetime64[D]').astype(DATE_DTYPE),
+            variable: pd.Series(valores).astype(self._dtypes[variable]),
+        })
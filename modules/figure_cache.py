@@ -0,0 +1,145 @@
+# modules/figure_cache.py
+import logging
+import threading
+from collections import OrderedDict
+
+import streamlit as st
+
+from modules.shared_cache import default_backend, figure_key
+from modules.telemetry import TELEMETRY, count, span
+
+logger = logging.getLogger(__name__)
+
+# Tamaño máximo (en bytes) de las imágenes guardadas en la caché de gráficos
+MAX_CACHE_BYTES = 64 * 1024 * 1024
+
+
+def figure_to_png(fig):
+    # matplotlib se importa solo cuando hay que renderizar algo: con la
+    # caché llena, una ejecución no lo necesita
+    from modules.plotting import figure_to_png as to_png
+    return to_png(fig)
+
+
+class FigureCache:
+    # Caché LRU de gráficos ya renderizados (PNG), limitada por tamaño total.
+    # Las claves incluyen la versión del dataset, la vista y sus parámetros,
+    # así que un acierto evita tanto la agregación como el renderizado.
+    # Con 'shared' (un almacén de modules.shared_cache) los gráficos que no
+    # están en memoria se buscan también allí, y los renderizados se publican
+    # para el resto de procesos y réplicas.
+
+    def __init__(self, max_bytes=MAX_CACHE_BYTES, shared=None):
+        self.max_bytes = max_bytes
+        self.shared = shared
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.shared_hits = 0
+
+    def get(self, key):
+        with self._lock:
+            png = self._entries.get(key)
+            if png is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return png
+
+    def put(self, key, png):
+        if len(png) > self.max_bytes:
+            return
+        with self._lock:
+            anterior = self._entries.pop(key, None)
+            if anterior is not None:
+                self._bytes -= len(anterior)
+            self._entries[key] = png
+            self._bytes += len(png)
+            # Se descartan las imágenes usadas hace más tiempo
+            while self._bytes > self.max_bytes:
+                _, descartada = self._entries.popitem(last=False)
+                self._bytes -= len(descartada)
+                self.evictions += 1
+
+    def get_or_render(self, key, render):
+        # 'render' crea y devuelve la figura de matplotlib; solo se llama si
+        # la imagen no está en la caché
+        png = self.get(key)
+        if png is not None:
+            count("cache_figuras", resultado="acierto")
+            return png
+        png = self._get_shared(key)
+        if png is None:
+            count("cache_figuras", resultado="fallo")
+            with span("render"):
+                fig = render()
+            with span("png"):
+                png = figure_to_png(fig)
+            self._put_shared(key, png)
+        else:
+            count("cache_figuras", resultado="compartida")
+        self.put(key, png)
+        return png
+
+    def _get_shared(self, key):
+        if self.shared is None:
+            return None
+        try:
+            png = self.shared.get(figure_key(key))
+        except Exception as e:
+            logger.warning("No se pudo leer un gráfico de la caché compartida: %s", e)
+            return None
+        if png is None:
+            return None
+        with self._lock:
+            self.shared_hits += 1
+        return bytes(png)
+
+    def _put_shared(self, key, png):
+        if self.shared is None:
+            return
+        try:
+            self.shared.set(figure_key(key), png)
+        except Exception as e:
+            logger.warning("No se pudo guardar un gráfico en la caché compartida: %s", e)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "aciertos": self.hits,
+                "compartidos": self.shared_hits,
+                "fallos": self.misses,
+                "descartes": self.evictions,
+                "entradas": len(self._entries),
+                "bytes": self._bytes,
+            }
+
+
+# Caché única por proceso, compartida por todas las sesiones (y, a través
+# del almacén configurado, por todos los procesos y réplicas)
+FIGURE_CACHE = FigureCache(shared=default_backend())
+TELEMETRY.register("figure_cache", FIGURE_CACHE.stats)
+
+
+def show_figure(key, render):
+    # Muestra un gráfico reutilizando la imagen cacheada para 'key'. Con
+    # key=None (sin versión del dataset) se renderiza siempre.
+    with span("figura"):
+        if key is None:
+            with span("render"):
+                fig = render()
+            with span("mostrar"):
+                st.pyplot(fig)
+            return
+        png = FIGURE_CACHE.get_or_render(key, render)
+        with span("mostrar"):
+            st.image(png, width="stretch")
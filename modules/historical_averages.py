@@ -1,30 +1,21 @@
 import streamlit as st
-import pandas as pd
-import matplotlib.pyplot as plt
 
-def show_historical_averages(df):
-    st.header("📊 Promedios Históricos")
+from modules.analytics import historical_averages
+from modules.climatology import ClimatologyCube
+from modules.figure_cache import show_figure
+from modules.rendering import historical_averages_figure, year_vs_average_figure
 
-    # Asegurarse de que las columnas de fecha, mes y día del año existan
-    # 'Mes' y 'Año' ya deberían estar creadas en df si usas load_data en app.py
-    # Pero necesitamos el 'Día_del_Año' para los promedios históricos
-    if 'Mes' not in df.columns:
-        df['Mes'] = df['DAY'].dt.month
-    if 'Año' not in df.columns:
-        df['Año'] = df['DAY'].dt.year
+def show_historical_averages(df, cube=None, version=None, other_stations=None, quality=None):
+    st.header("📊 Promedios Históricos")
 
-    # Crear una columna de "Día del Año" (1 a 366) para los promedios
-    df['Dia_del_Año'] = df['DAY'].dt.dayofyear
+    # Los promedios se consultan en el cubo climatológico precalculado
+    # (agregados por día del año y por día del año y año); si no se recibe
+    # uno se construye a partir del DataFrame
+    if cube is None:
+        cube = ClimatologyCube.build(df)
 
-    # Identificar columnas numéricas para la selección de variables
-    # Excluimos 'Mes', 'Año', 'Dia_del_Año' ya que son para filtrar/agrupar, no para graficar directamente
-    columnas_numericas = df.select_dtypes(include=['number']).columns.tolist()
-    for col in ['Mes', 'Año', 'Dia_del_Año']:
-        if col in columnas_numericas:
-            columnas_numericas.remove(col)
-    # También excluimos la columna 'DAY' si por alguna razón fuera numérica
-    if 'DAY' in columnas_numericas:
-        columnas_numericas.remove('DAY')
+    # Variables numéricas (sin 'Mes', 'Año', 'Dia_del_Año', que son para filtrar/agrupar)
+    columnas_numericas = cube.variables
 
     if not columnas_numericas:
         st.warning("No se encontraron columnas numéricas para calcular promedios históricos.")
@@ -36,29 +27,39 @@ def show_historical_averages(df):
         options=columnas_numericas
     )
 
-    # Calcular el promedio histórico para cada día del año
-    promedios_historicos = df.groupby('Dia_del_Año')[selected_variable].mean().reset_index()
-    promedios_historicos.rename(columns={selected_variable: 'Promedio_Historico'}, inplace=True)
+    # Comparación con otras estaciones ({nombre: Dataset}) usando sus cubos ya calculados
+    estaciones_comparables = {
+        nombre: otro for nombre, otro in (other_stations or {}).items()
+        if selected_variable in otro.cube.variables
+    }
+    selected_stations = []
+    if estaciones_comparables:
+        selected_stations = st.sidebar.multiselect(
+            "Comparar con otras estaciones:",
+            options=list(estaciones_comparables.keys())
+        )
 
     st.subheader(f"Promedio Histórico de {selected_variable} por Día del Año")
 
-    fig, ax = plt.subplots(figsize=(12, 6))
-
-    ax.plot(promedios_historicos['Dia_del_Año'], promedios_historicos['Promedio_Historico'], label='Promedio Histórico', color='blue')
+    def render_promedio():
+        # Promedio histórico para cada día del año, y el de las estaciones elegidas
+        otras = {
+            nombre: historical_averages(estaciones_comparables[nombre].df, selected_variable,
+                                        cube=estaciones_comparables[nombre].cube)
+            for nombre in selected_stations
+        }
+        return historical_averages_figure(historical_averages(df, selected_variable, cube=cube), otras)
 
-    ax.set_title(f'Evolución del Promedio Histórico de {selected_variable}')
-    ax.set_xlabel('Día del Año')
-    ax.set_ylabel(selected_variable)
-    ax.grid(True)
-    ax.legend()
-
-    st.pyplot(fig)
+    # El gráfico se reutiliza de la caché si ya se ha generado para esta versión de los datos
+    versiones_comparadas = tuple(estaciones_comparables[nombre].version for nombre in selected_stations)
+    show_figure(version and (version, 'historical_averages', selected_variable, versiones_comparadas), render_promedio)
 
     # --- Opcional: Comparar un año específico con el promedio histórico ---
     st.subheader("Comparar un Año con el Promedio Histórico")
 
-    # Obtener la lista de años disponibles para la comparación
-    años_disponibles = sorted(df['Año'].unique())
+    # Obtener la lista de años disponibles para la comparación (solo los que
+    # tienen datos de la variable, según el control de calidad)
+    años_disponibles = quality.years_with_data(selected_variable) if quality is not None else cube.years()
     selected_year_comparison = st.sidebar.selectbox(
         "Selecciona un año para comparar:",
         options=['Todos los años (solo promedio)'] + años_disponibles,
@@ -66,25 +67,13 @@ def show_historical_averages(df):
     )
 
     if selected_year_comparison != 'Todos los años (solo promedio)':
-        df_year_comparison = df[df['Año'] == selected_year_comparison].copy()
-
-        # Asegurarse de que el año seleccionado tiene datos para el día del año
-        df_year_comparison = df_year_comparison[['Dia_del_Año', selected_variable]].dropna()
-
-        if not df_year_comparison.empty:
-            # Unir los datos del año específico con los promedios históricos
-            merged_data = pd.merge(promedios_historicos, df_year_comparison, on='Dia_del_Año', how='left')
-
-            fig_comp, ax_comp = plt.subplots(figsize=(12, 6))
-            ax_comp.plot(merged_data['Dia_del_Año'], merged_data['Promedio_Historico'], label='Promedio Histórico', color='blue')
-            ax_comp.plot(merged_data['Dia_del_Año'], merged_data[selected_variable], label=f'{selected_year_comparison}', color='red', linestyle='--')
-
-            ax_comp.set_title(f'Comparación de {selected_variable} en {selected_year_comparison} vs. Promedio Histórico')
-            ax_comp.set_xlabel('Día del Año')
-            ax_comp.set_ylabel(selected_variable)
-            ax_comp.grid(True)
-            ax_comp.legend()
-
-            st.pyplot(fig_comp)
+        # Asegurarse de que el año seleccionado tiene datos de la variable
+        if cube.stat('Año', selected_variable, 'count').get(selected_year_comparison, 0) > 0:
+            show_figure(
+                version and (version, 'historical_vs_year', selected_variable, selected_year_comparison),
+                lambda: year_vs_average_figure(
+                    historical_averages(df, selected_variable, selected_year_comparison, cube=cube)
+                ),
+            )
         else:
-            st.warning(f"No hay datos suficientes para {selected_year_comparison} para realizar la comparación.")
\ No newline at end of file
+            st.warning(f"No hay datos suficientes para {selected_year_comparison} para realizar la comparación.")
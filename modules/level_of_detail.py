@@ -0,0 +1,117 @@
+# modules/level_of_detail.py
+# Series reducidas para los gráficos de muchos años: cada línea (un año) se
+# divide en tramos de varios días y de cada tramo se dibujan solo el mínimo
+# y el máximo (en su orden), así que la forma y los extremos se conservan
+# con muchos menos vértices. La resolución se elige a partir del ancho del
+# gráfico en píxeles y del número de líneas.
+from typing import NamedTuple
+
+import numpy as np
+
+# Anchos de tramo disponibles (en posiciones: días del año, días del mes...)
+LEVELS = (1, 2, 4, 8, 16, 32)
+# Vértices por píxel de ancho del gráfico, sumando todas las líneas: más
+# vértices no se distinguen y solo hacen más lento el dibujo
+VERTICES_PER_PX = 8
+# Parte del ancho de la figura que ocupan los ejes (aproximada)
+AXES_WIDTH_FRACTION = 0.8
+
+
+class DecimatedSeries(NamedTuple):
+    width: int              # posiciones por tramo (1 = sin reducir)
+    years: np.ndarray       # años (filas)
+    x: np.ndarray           # años x 2*tramos, posición de cada vértice
+    vertices: np.ndarray    # años x 2*tramos, mínimo y máximo de cada tramo en orden
+    minimum: np.ndarray     # años x tramos
+    maximum: np.ndarray     # años x tramos
+    mean: np.ndarray        # años x tramos
+
+
+def plot_width_px(fig_width_in, dpi):
+    # Ancho aproximado (en píxeles) de la zona de datos del gráfico
+    return int(fig_width_in * dpi * AXES_WIDTH_FRACTION)
+
+
+def choose_width(n_points, n_lines, plot_px):
+    # Ancho de tramo más pequeño con el que caben las líneas en el ancho del
+    # gráfico: como mucho dos vértices por píxel en cada línea y
+    # VERTICES_PER_PX por píxel entre todas. Se prefieren los de LEVELS (los
+    # que tiene precalculados LevelOfDetail); para series más largas se
+    # calcula el necesario.
+    presupuesto = VERTICES_PER_PX * plot_px
+
+    def cabe(width):
+        vertices_por_linea = n_points if width == 1 else 2 * -(-n_points // width)
+        return vertices_por_linea <= 2 * plot_px and vertices_por_linea * max(n_lines, 1) <= presupuesto
+
+    for width in LEVELS:
+        if cabe(width):
+            return width
+    # Tramos por línea que caben (al menos uno, aunque se pase del presupuesto)
+    tramos = max(min(plot_px, presupuesto // (2 * max(n_lines, 1))), 1)
+    return max(-(-n_points // tramos), 1)
+
+
+def decimate(positions, matrix, years, width):
+    # Reduce cada fila de 'matrix' (posiciones en columnas) a tramos de
+    # 'width' columnas: mínimo, máximo y media de cada tramo, y los vértices
+    # mínimo/máximo ordenados por posición. Los tramos sin datos quedan NaN.
+    positions = np.asarray(positions, dtype='float64')
+    matrix = np.asarray(matrix, dtype='float64')
+    filas, columnas = matrix.shape
+    tramos = -(-columnas // width)
+    relleno = tramos * width - columnas
+    if relleno:
+        matrix = np.pad(matrix, ((0, 0), (0, relleno)), constant_values=np.nan)
+        positions = np.pad(positions, (0, relleno), mode='edge')
+    bloques = matrix.reshape(filas, tramos, width)
+    vacios = np.isnan(bloques)
+    sin_datos = vacios.all(axis=2)
+
+    arg_min = np.where(vacios, np.inf, bloques).argmin(axis=2)
+    arg_max = np.where(vacios, -np.inf, bloques).argmax(axis=2)
+    minimo = np.take_along_axis(bloques, arg_min[..., None], axis=2)[..., 0]
+    maximo = np.take_along_axis(bloques, arg_max[..., None], axis=2)[..., 0]
+    n = (~vacios).sum(axis=2)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        media = np.where(vacios, 0.0, bloques).sum(axis=2) / n
+    minimo[sin_datos] = maximo[sin_datos] = media[sin_datos] = np.nan
+
+    # Vértices: el mínimo y el máximo de cada tramo en el orden en que ocurren
+    inicio = np.arange(tramos) * width
+    primero = np.minimum(arg_min, arg_max)
+    segundo = np.maximum(arg_min, arg_max)
+    min_primero = arg_min <= arg_max
+    x = np.empty((filas, 2 * tramos))
+    vertices = np.empty((filas, 2 * tramos))
+    x[:, 0::2] = positions[inicio + primero]
+    x[:, 1::2] = positions[inicio + segundo]
+    vertices[:, 0::2] = np.where(min_primero, minimo, maximo)
+    vertices[:, 1::2] = np.where(min_primero, maximo, minimo)
+    return DecimatedSeries(width, np.asarray(years), x, vertices, minimo, maximo, media)
+
+
+class LevelOfDetail:
+    # Pirámide de series reducidas de la comparación anual (media de cada
+    # día del año, por año) a todas las resoluciones de LEVELS. Se calcula
+    # por variable la primera vez que se pide y se guarda mientras no
+    # cambien los datos (el Dataset crea una nueva con cada versión).
+
+    def __init__(self, cube):
+        self.cube = cube
+        self._levels = {}
+
+    def _pyramid(self, variable):
+        if variable not in self._levels:
+            pivote = self.cube.mean('Dia_del_Año_Año', variable).unstack(level='Año')
+            positions = pivote.index.to_numpy()
+            matriz = pivote.to_numpy(dtype='float64').T
+            años = pivote.columns.to_numpy()
+            self._levels[variable] = {
+                width: decimate(positions, matriz, años, width) for width in LEVELS[1:]
+            }
+        return self._levels[variable]
+
+    def series(self, variable, width):
+        # None si 'width' no es uno de los niveles precalculados
+        return self._pyramid(variable).get(width)
@@ -1,37 +1,26 @@
 # modules/monthly_comparison.py
 import streamlit as st
-import pandas as pd
-import matplotlib.pyplot as plt
-import matplotlib.dates as mdates
 
-def show_monthly_comparison(df):
+from modules.analytics import MONTH_NAMES, monthly_comparison
+from modules.climatology import ClimatologyCube
+from modules.figure_cache import show_figure
+from modules.rendering import monthly_comparison_figure
+
+def show_monthly_comparison(df, cube=None, version=None, quality=None):
     st.header("📈 Comparación Mensual Detallada")
 
     # Asegúrate de que tu columna de fecha se llama 'DAY'
-    # Estas columnas Mes y Año ya deberían estar creadas en df si usas el load_data de app.py
-    # Pero es bueno asegurarse o crearlas aquí si el módulo es muy independiente
-    if 'Mes' not in df.columns:
-        df['Mes'] = df['DAY'].dt.month
-    if 'Año' not in df.columns:
-        df['Año'] = df['DAY'].dt.year
+    # Las columnas Mes y Año vienen precalculadas desde load_data en app.py
+    # (si faltan, el cálculo las crea sin modificar el DataFrame compartido)
 
-    # Crear una lista de meses para la selección
-    meses_nombres = {
-        1: 'Enero', 2: 'Febrero', 3: 'Marzo', 4: 'Abril',
-        5: 'Mayo', 6: 'Junio', 7: 'Julio', 8: 'Agosto',
-        9: 'Septiembre', 10: 'Octubre', 11: 'Noviembre', 12: 'Diciembre'
-    }
-    meses_disponibles = sorted(df['Mes'].unique())
-    opciones_mes = {meses_nombres[m]: m for m in meses_disponibles}
+    # Meses y variables disponibles salen del cubo climatológico precalculado
+    if cube is None:
+        cube = ClimatologyCube.build(df)
+    meses_disponibles = cube.months()
+    opciones_mes = {MONTH_NAMES[m]: m for m in meses_disponibles}
 
-    # Identificar columnas numéricas para la selección de variables
-    columnas_numericas = df.select_dtypes(include=['number']).columns.tolist()
-    if 'Mes' in columnas_numericas:
-        columnas_numericas.remove('Mes')
-    if 'Año' in columnas_numericas:
-        columnas_numericas.remove('Año')
-    if 'DAY' in columnas_numericas: # Por si 'DAY' se interpreta como numérico (raro)
-        columnas_numericas.remove('DAY')
+    # Variables numéricas para la selección (sin columnas de calendario)
+    columnas_numericas = cube.variables
 
 
     if not columnas_numericas:
@@ -46,6 +35,13 @@ def show_monthly_comparison(df):
         )
         selected_month = opciones_mes[selected_month_name]
 
+        # Solo se ofrecen las variables con algún dato en el mes elegido
+        # (según el control de calidad hecho al cargar los datos)
+        if quality is not None:
+            columnas_numericas = quality.available_variables(columnas_numericas, months=[selected_month])
+            if not columnas_numericas:
+                st.warning(f"No hay datos disponibles para el mes de {selected_month_name}.")
+                return
         selected_variable = st.sidebar.selectbox(
             "Selecciona la variable a comparar:",
             options=columnas_numericas
@@ -53,24 +49,12 @@ def show_monthly_comparison(df):
 
         st.write(f"Mostrando **{selected_variable}** para el mes de **{selected_month_name}** por día y año.")
 
-        # Filtrar datos para el mes seleccionado
-        df_filtered_month = df[df['Mes'] == selected_month].copy()
-        df_filtered_month['Dia_Temporal'] = df_filtered_month['DAY'].dt.day
-
-        if not df_filtered_month.empty:
-            fig, ax = plt.subplots(figsize=(12, 6))
-
-            for year in sorted(df_filtered_month['Año'].unique()):
-                df_year = df_filtered_month[df_filtered_month['Año'] == year]
-                ax.plot(df_year['Dia_Temporal'], df_year[selected_variable], label=str(year))
-
-            ax.set_title(f'{selected_variable} diaria en {selected_month_name} por Año')
-            ax.set_xlabel('Día del Mes')
-            ax.set_ylabel(selected_variable)
-            ax.legend(title='Año')
-            ax.grid(True)
-            plt.xticks(df_filtered_month['Dia_Temporal'].unique())
-
-            st.pyplot(fig)
+        if cube.stat('Mes', selected_variable, 'count').get(selected_month, 0) > 0:
+            # Matriz años x días del mes (solo se calcula si el gráfico no
+            # está en la caché para esta versión de los datos)
+            show_figure(
+                version and (version, 'monthly_comparison', selected_variable, selected_month),
+                lambda: monthly_comparison_figure(monthly_comparison(df, selected_month, selected_variable)),
+            )
         else:
-            st.warning(f"No hay datos disponibles para el mes de {selected_month_name}.")
\ No newline at end of file
+            st.warning(f"No hay datos disponibles para el mes de {selected_month_name}.")
@@ -0,0 +1,85 @@
+# modules/plotting.py
+import io
+
+import matplotlib
+import numpy as np
+
+# Backend no interactivo: los gráficos solo se convierten en imágenes, así
+# que no hace falta (ni conviene, en un servidor) buscar uno con ventanas
+matplotlib.use("Agg")
+
+import matplotlib.pyplot as plt  # noqa: E402
+from matplotlib.cm import ScalarMappable  # noqa: E402
+from matplotlib.collections import LineCollection  # noqa: E402
+from matplotlib.colors import Normalize, to_rgba_array  # noqa: E402
+from matplotlib.lines import Line2D  # noqa: E402
+
+# Año bisiesto de referencia para convertir el día del año en fecha (así el
+# día 366 también tiene fecha)
+REFERENCE_YEAR_START = np.datetime64('2000-01-01')
+# Mismas opciones que usa st.pyplot al convertir la figura en imagen
+SAVEFIG_OPTIONS = {"format": "png", "bbox_inches": "tight", "dpi": 200}
+# Con más años que estos, una leyenda con una entrada por año no se puede
+# leer (y es lo más lento de dibujar): se colorea por año con una barra de color
+MAX_LEGEND_ENTRIES = 20
+YEAR_COLORMAP = 'viridis'
+
+
+def figure_to_png(fig):
+    buffer = io.BytesIO()
+    fig.savefig(buffer, **SAVEFIG_OPTIONS)
+    plt.close(fig)
+    return buffer.getvalue()
+
+
+def day_of_year_dates(dias):
+    # Día del año (1-366) -> fechas del año de referencia, sin bucles
+    return REFERENCE_YEAR_START + (np.asarray(dias, dtype='int64') - 1).astype('timedelta64[D]')
+
+
+def plot_year_lines(ax, x, matrix, labels, markers=False):
+    # Dibuja una línea por fila de 'matrix' (un año) en una única colección,
+    # en lugar de una llamada a ax.plot por año. Los huecos (NaN) cortan la
+    # línea. 'x' es común a todas las filas o, si es una matriz, propio de
+    # cada una (series reducidas, ver modules/level_of_detail.py). Devuelve
+    # los manejadores para la leyenda; con más de MAX_LEGEND_ENTRIES años
+    # añade una barra de color y no devuelve ninguno.
+    matrix = np.asarray(matrix, dtype='float64')
+    x = np.broadcast_to(np.asarray(x, dtype='float64'), matrix.shape)
+    con_datos = ~np.isnan(matrix).all(axis=1)
+    matrix = matrix[con_datos]
+    x = x[con_datos]
+    labels = [label for label, ok in zip(labels, con_datos) if ok]
+
+    muchos = len(matrix) > MAX_LEGEND_ENTRIES
+    if muchos:
+        valores = np.asarray(labels, dtype='float64')
+        escala = ScalarMappable(Normalize(valores.min(), valores.max()), plt.get_cmap(YEAR_COLORMAP))
+        colores = escala.to_rgba(valores)
+    else:
+        ciclo = plt.rcParams['axes.prop_cycle'].by_key()['color']
+        colores = [ciclo[i % len(ciclo)] for i in range(len(matrix))]
+
+    segmentos = np.stack([x, matrix], axis=-1)
+    ax.add_collection(LineCollection(segmentos, colors=colores, linewidths=plt.rcParams['lines.linewidth']))
+    if markers:
+        puntos = ~np.isnan(matrix)
+        filas = np.nonzero(puntos)[0]
+        ax.scatter(x[puntos], matrix[puntos], c=to_rgba_array(colores)[filas], s=16, zorder=3)
+
+    # Los límites se calculan a mano porque la colección contiene NaN
+    if matrix.size and not np.isnan(matrix).all():
+        x_con_datos = x[~np.isnan(matrix)]
+        ax.update_datalim(np.column_stack([
+            [x_con_datos.min(), x_con_datos.max()],
+            [np.nanmin(matrix), np.nanmax(matrix)],
+        ]))
+        ax.autoscale_view()
+
+    if muchos:
+        ax.figure.colorbar(escala, ax=ax, label='Año', format='%d')
+        return []
+    return [
+        Line2D([], [], color=color, marker='o' if markers else None, markersize=4, label=str(label))
+        for color, label in zip(colores, labels)
+    ]
@@ -0,0 +1,228 @@
+# modules/quality.py
+# Control de calidad de los datos al cargarlos: cobertura de cada variable
+# por año y mes, días sin registro, días repetidos, lecturas fuera de rango
+# y huecos de cada variable. Se calcula al cargar el dataset, se actualiza
+# con los registros que se añaden y las vistas lo consultan (p. ej. para no
+# ofrecer variables sin datos o marcar los huecos en los gráficos) sin volver
+# a recorrer el DataFrame.
+import numpy as np
+import pandas as pd
+
+from modules.schema import DATE_COLUMN, TIME_COLUMNS
+
+# Rango físicamente posible de cada variable (unidades de la estación: °C,
+# mm, km/h, %, hPa, W/m², grados y minutos desde medianoche). Lo que queda
+# fuera se considera una lectura errónea.
+VALID_RANGES = {
+    'TEMP_MEDIA': (-40, 50), 'TEMP_MAX': (-40, 55), 'TEMP_MIN': (-45, 45),
+    'TEMP_MEDIA_1,5m': (-40, 50), 'TEMP_MAX_1,5m': (-40, 55), 'TEMP_MIN_1,5m': (-45, 45),
+    'GRADO-DIA_CALENTAMIENTO': (0, 60), 'GRADO-DIA_ENFRIAMIENTO': (0, 40), 'GRADOS_DIA_CRECIMIENTO': (0, 40),
+    'LLUVIA': (0, 500),
+    'VEL_VIENTO_MEDIA': (0, 150), 'VEL_VIENTO_MAX': (0, 200),
+    'DIRECCION_DOMINANTE_VIENTO': (0, 360),
+    'HUMEDAD_MEDIA': (0, 100), 'HUMEDAD_MAX': (0, 100), 'HUMEDAD_MIN': (0, 100),
+    'PRESION_MEDIA': (850, 1090), 'PRESION_MAX': (850, 1090), 'PRESION_MIN': (850, 1090),
+    'RADIACION_MEDIA': (0, 1400), 'RADIACION_MAX': (0, 1400),
+    'UV_MAX': (0, 20),
+    **{col: (0, 24 * 60 - 1) for col in TIME_COLUMNS},
+}
+
+
+def _ranges(mascara, days):
+    # Tramos consecutivos de 'mascara' (True) como DataFrame inicio/fin/días
+    borde = np.diff(np.concatenate([[False], mascara, [False]]).astype(np.int8))
+    inicios = np.flatnonzero(borde == 1)
+    fines = np.flatnonzero(borde == -1) - 1
+    return pd.DataFrame({
+        'inicio': days[inicios],
+        'fin': days[fines],
+        'dias': fines - inicios + 1,
+    })
+
+
+def _expected_days(start, end):
+    # Días de cada mes (Año, Mes) dentro del periodo [start, end]
+    meses = pd.period_range(start, end, freq='M')
+    dias = meses.days_in_month.to_numpy().copy()
+    inicio, fin = pd.Timestamp(start), pd.Timestamp(end)
+    dias[0] -= inicio.day - 1
+    dias[-1] -= fin.days_in_month - fin.day
+    return pd.Series(dias, index=pd.MultiIndex.from_arrays(
+        [meses.year.astype('int64'), meses.month.astype('int64')], names=['Año', 'Mes']))
+
+
+class QualityIndex:
+    # Resultados del control de calidad de un dataset. Al añadir registros
+    # se actualiza con update(), que solo recorre las filas nuevas y los días
+    # desde el primero que tocan (normalmente, los del final); las consultas
+    # solo leen estas tablas.
+
+    def __init__(self, df, cube):
+        self.variables = list(cube.variables)
+        self.records = 0
+        self.start = self.end = None
+        self.days = np.array([], dtype='datetime64[D]')
+        # Registros de cada día de 'days'
+        self._registros = np.array([], dtype=np.int32)
+        self.missing_days = _ranges(np.array([], dtype=bool), self.days)
+        self.duplicate_days = pd.DataFrame({'DAY': self.days, 'registros': np.array([], dtype=np.int64)})
+        self._gaps = {variable: self.missing_days for variable in self.variables}
+        self.out_of_range = pd.DataFrame({
+            'DAY': pd.Series(dtype=df[DATE_COLUMN].dtype), 'variable': pd.Series(dtype='str'),
+            'valor': pd.Series(dtype='float64'),
+        })
+        self.update(df, cube)
+
+    def update(self, new_rows, cube):
+        # Incorpora registros nuevos. 'cube' es el cubo climatológico ya
+        # actualizado con ellos (de él salen los conteos de cobertura).
+        fechas = new_rows[DATE_COLUMN].to_numpy()
+        dias = fechas.astype('datetime64[D]')
+        con_fecha = ~np.isnat(dias)
+        fechas, dias = fechas[con_fecha], dias[con_fecha]
+        if len(dias):
+            anterior = (self.start, self.end)
+            inicio = dias.min() if self.start is None else min(self.start, dias.min())
+            fin = dias.max() if self.end is None else max(self.end, dias.max())
+            if self.start is None:
+                self._registros = np.zeros(int((fin - inicio).astype('int64')) + 1, dtype=np.int32)
+            else:
+                self._registros = np.pad(self._registros, (
+                    int((self.start - inicio).astype('int64')), int((fin - self.end).astype('int64'))))
+            self.start, self.end = inicio, fin
+            self.days = np.arange(inicio, fin + 1)
+            posiciones = (dias - inicio).astype('int64')
+            # Solo cambian los días desde el primero con registros nuevos o,
+            # si el periodo se alarga, desde el día siguiente al último anterior
+            desde = int(posiciones.min())
+            if anterior[1] is not None:
+                desde = min(desde, self._position(anterior[1]) + 1)
+
+            # Días sin ningún registro y días con más de uno
+            tocados, registros = np.unique(posiciones, return_counts=True)
+            self._registros[tocados] += registros.astype(np.int32)
+            self.records += len(dias)
+            self.missing_days = self._update_ranges(self.missing_days, anterior, desde, tocados)
+            repetidos = tocados[self._registros[tocados] > 1]
+            if len(repetidos):
+                nuevos = pd.DataFrame({'DAY': self.days[repetidos], 'registros': self._registros[repetidos].astype(np.int64)})
+                anteriores = self.duplicate_days[~self.duplicate_days['DAY'].isin(nuevos['DAY'])]
+                self.duplicate_days = (
+                    pd.concat([anteriores, nuevos], ignore_index=True).sort_values('DAY', kind='stable').reset_index(drop=True)
+                )
+
+            # Lecturas fuera de rango y huecos (días sin dato) de cada variable
+            fuera = []
+            for variable in self.variables:
+                if variable in new_rows.columns:
+                    valores = new_rows[variable].to_numpy(dtype='float64', na_value=np.nan)[con_fecha]
+                else:
+                    valores = np.full(len(dias), np.nan)
+                validos = ~np.isnan(valores)
+                if variable in VALID_RANGES:
+                    minimo, maximo = VALID_RANGES[variable]
+                    erroneos = validos & ((valores < minimo) | (valores > maximo))
+                    if erroneos.any():
+                        fuera.append(pd.DataFrame({
+                            'DAY': fechas[erroneos], 'variable': variable, 'valor': valores[erroneos],
+                        }))
+                self._gaps[variable] = self._update_ranges(self._gaps[variable], anterior, desde, posiciones[validos])
+            if fuera:
+                self.out_of_range = (
+                    pd.concat([self.out_of_range, *fuera], ignore_index=True)
+                    .sort_values('DAY', kind='stable').reset_index(drop=True)
+                )
+
+        # Cobertura: registros de cada variable / días de cada mes dentro del
+        # periodo de datos (los conteos salen del cubo climatológico)
+        if self.start is not None:
+            esperados = _expected_days(self.start, self.end)
+        else:
+            esperados = pd.Series([], dtype='int64', index=pd.MultiIndex.from_arrays(
+                [np.array([], dtype='int64')] * 2, names=['Año', 'Mes']))
+        conteos = cube.tables['Mes_Año']['count'].reorder_levels(['Año', 'Mes'])
+        conteos.index = conteos.index.set_levels(
+            [conteos.index.levels[0].astype('int64'), conteos.index.levels[1].astype('int64')])
+        self.counts = conteos.reindex(esperados.index, fill_value=0)
+        self.expected_days = esperados
+
+    def _update_ranges(self, huecos, anterior, desde, con_dato_nuevo):
+        # Tramos sin dato 'huecos' con los días a partir de la posición 'desde'
+        # recalculados: los que ya tenían dato (los del periodo 'anterior' que
+        # no estaban en un hueco) más las posiciones 'con_dato_nuevo'. La
+        # región empieza en el hueco que llega hasta el día anterior, para
+        # unirlo con lo recalculado.
+        inicios = huecos['inicio'].to_numpy().astype('datetime64[D]')
+        fines = huecos['fin'].to_numpy().astype('datetime64[D]')
+        afectados = fines >= self.days[desde - 1] if desde > 0 else np.ones(len(huecos), dtype=bool)
+        if afectados.any():
+            desde = min(desde, self._position(inicios[afectados].min()))
+        con_dato = np.zeros(len(self.days) - desde, dtype=bool)
+        if anterior[0] is not None:
+            con_dato[max(self._position(anterior[0]), desde) - desde:self._position(anterior[1]) + 1 - desde] = True
+            for inicio, fin in zip(inicios[afectados], fines[afectados]):
+                con_dato[self._position(inicio) - desde:self._position(fin) + 1 - desde] = False
+        con_dato[con_dato_nuevo - desde] = True
+        if not afectados.any() and con_dato.all():
+            # Lo habitual: días nuevos al final, todos con dato
+            return huecos
+        recalculados = _ranges(~con_dato, self.days[desde:])
+        if afectados.all():
+            return recalculados
+        return pd.concat([huecos[~afectados], recalculados], ignore_index=True)
+
+    def _position(self, dia):
+        # Posición de un día en 'days'
+        return int((dia - self.start).astype('int64'))
+
+    def coverage(self, by='Año'):
+        # Parte de los días con dato de cada variable, por año ('Año') o por
+        # año y mes (by=None). Los días repetidos no cuentan más de una vez.
+        if by is None:
+            return self.counts.div(self.expected_days, axis=0).clip(upper=1)
+        conteos = self.counts.groupby(level=by).sum()
+        return conteos.div(self.expected_days.groupby(level=by).sum(), axis=0).clip(upper=1)
+
+    def available_variables(self, variables=None, months=None, years=None):
+        # Variables (de 'variables', por defecto todas) con algún dato en los
+        # meses y el rango de años indicados
+        conteos = self.counts
+        if months is not None:
+            conteos = conteos[conteos.index.get_level_values('Mes').isin(months)]
+        if years is not None:
+            años = conteos.index.get_level_values('Año')
+            conteos = conteos[(años >= years[0]) & (años <= years[1])]
+        con_datos = conteos.columns[(conteos > 0).any(axis=0)]
+        return [v for v in (variables if variables is not None else self.variables) if v in con_datos]
+
+    def years_with_data(self, variable):
+        if variable not in self.counts.columns:
+            return []
+        por_año = self.counts[variable].groupby(level='Año').sum()
+        return [int(año) for año in por_año.index[por_año > 0]]
+
+    def gaps(self, variable, start=None, end=None):
+        # Tramos de días sin dato de la variable (inicio, fin y días), solo
+        # los que se solapan con [start, end] y recortados a ese intervalo.
+        # Con variable=None, los días sin ningún registro.
+        huecos = self._gaps.get(variable, self.missing_days)
+        if start is not None:
+            start = np.datetime64(start, 'D')
+            huecos = huecos[huecos['fin'] >= start].assign(inicio=lambda h: h['inicio'].clip(lower=start))
+        if end is not None:
+            end = np.datetime64(end, 'D')
+            huecos = huecos[huecos['inicio'] <= end].assign(fin=lambda h: h['fin'].clip(upper=end))
+        if start is not None or end is not None:
+            huecos = huecos.assign(dias=(huecos['fin'] - huecos['inicio']).dt.days + 1)
+        return huecos.reset_index(drop=True)
+
+    def summary(self):
+        # Variables incompletas: las que faltan en algún registro (los días sin
+        # ningún registro ya se cuentan aparte)
+        return {
+            'dias': len(self.days),
+            'dias_sin_registro': int(self.missing_days['dias'].sum()),
+            'dias_repetidos': len(self.duplicate_days),
+            'lecturas_fuera_de_rango': len(self.out_of_range),
+            'variables_incompletas': [v for v in self.variables if self.counts[v].sum() < self.records],
+        }
@@ -0,0 +1,221 @@
+# modules/rendering.py
+# Gráficos (figuras de matplotlib) a partir de los resultados de
+# modules.analytics. No dependen de Streamlit: los usan tanto las vistas
+# como el modo por lotes.
+import matplotlib
+import numpy as np
+import pandas as pd
+
+# Backend no interactivo antes de importar pyplot (este módulo se puede
+# importar sin pasar antes por modules.plotting, p. ej. en el modo por lotes)
+matplotlib.use("Agg")
+
+import matplotlib.dates as mdates  # noqa: E402
+import matplotlib.pyplot as plt  # noqa: E402
+
+from modules.analytics import MONTH_NAMES  # noqa: E402
+from modules.level_of_detail import choose_width, decimate, plot_width_px  # noqa: E402
+from modules.plotting import SAVEFIG_OPTIONS, day_of_year_dates, plot_year_lines  # noqa: E402
+from modules.rolling import KIND_NAMES  # noqa: E402
+from modules.telemetry import timed  # noqa: E402
+
+
+def _year_lines(figsize, positions, values, years, series=None):
+    # Posiciones y valores a dibujar: los originales si caben en el ancho del
+    # gráfico, si no la serie reducida a la resolución adecuada ('series'
+    # devuelve la precalculada para un ancho de tramo, si la hay). Devuelve
+    # también el ancho de tramo (1 = sin reducir).
+    ancho = choose_width(len(positions), len(years), plot_width_px(figsize[0], SAVEFIG_OPTIONS['dpi']))
+    if ancho == 1:
+        return positions, values, 1
+    reducida = series(ancho) if series is not None else None
+    if reducida is None or not np.array_equal(reducida.years, years):
+        reducida = decimate(positions, values, years, ancho)
+    return reducida.x, reducida.vertices, ancho
+
+
+def _reduced_label(label, ancho, unidad):
+    return label if ancho == 1 else f'{label} (mín./máx. cada {ancho} {unidad})'
+
+
+def _mark_gaps(ax, starts, widths):
+    # Tramos sin datos (en unidades del eje x) como bandas grises de todo el
+    # alto del gráfico, en una sola colección
+    if len(starts):
+        ax.broken_barh(list(zip(starts, widths)), (0, 1), transform=ax.get_xaxis_transform(),
+                       color='lightgray', alpha=0.6, label='Sin datos')
+
+
+@timed()
+def latest_month_figure(latest, columns, gaps=None, bands=None):
+    # Temperaturas diarias del último mes (dashboard). Los días sin registro
+    # quedan en blanco en las líneas y, con 'gaps' (tramos inicio/fin de
+    # QualityIndex.gaps), se marcan con una banda. Con 'bands' (variable ->
+    # PercentileBands de los días del mes) cada línea lleva detrás la franja
+    # entre el primer y el último percentil de los años anteriores.
+    fig, ax = plt.subplots(figsize=(12, 6))
+    dias = np.arange(1, latest.date.days_in_month + 1)
+    posiciones = latest.rows['DAY'].dt.day.to_numpy() - 1
+    etiqueta_banda = None
+    for col in columns:
+        valores = np.full(len(dias), np.nan)
+        valores[posiciones] = latest.rows[col].to_numpy(dtype='float64', na_value=np.nan)
+        linea, = ax.plot(dias, valores, label=col.replace('_', ' '))
+        banda = bands.get(col) if bands else None
+        if banda is not None and not np.isnan(banda.values).all():
+            # Una sola entrada en la leyenda para todas las franjas
+            etiqueta = f'P{banda.percentiles[0]}-P{banda.percentiles[-1]} años anteriores'
+            ax.fill_between(dias, banda.values[0], banda.values[-1], color=linea.get_color(), alpha=0.15, linewidth=0,
+                            label=etiqueta if etiqueta != etiqueta_banda else None)
+            etiqueta_banda = etiqueta
+    if gaps is not None and not gaps.empty:
+        _mark_gaps(ax, gaps['inicio'].dt.day.to_numpy() - 0.5, gaps['dias'].to_numpy())
+
+    ax.set_title(f'Temperaturas Diarias en {latest.date.strftime("%B de %Y")}')
+    ax.set_xlabel('Día del Mes')
+    ax.set_ylabel('Temperatura (°C)') # Ajusta la unidad según tus datos
+    ax.legend()
+    ax.grid(True)
+    return fig
+
+
+@timed()
+def monthly_comparison_figure(result):
+    dias_con_datos = result.days[~np.isnan(result.values).all(axis=0)]
+    figsize = (12, 6)
+    x, valores, ancho = _year_lines(figsize, result.days, result.values, result.years)
+
+    fig, ax = plt.subplots(figsize=figsize)
+
+    # Todos los años en una sola colección de líneas
+    handles = plot_year_lines(ax, x, valores, result.years)
+
+    ax.set_title(f'{result.variable} diaria en {MONTH_NAMES[result.month]} por Año')
+    ax.set_xlabel(_reduced_label('Día del Mes', ancho, 'días'))
+    ax.set_ylabel(result.variable)
+    if handles:
+        ax.legend(handles=handles, title='Año')
+    ax.grid(True)
+    ax.set_xticks(dias_con_datos)
+    return fig
+
+
+@timed()
+def historical_averages_figure(result, others=None):
+    # Promedio histórico por día del año; 'others' son {nombre: resultado}
+    # de otras estaciones que se superponen
+    fig, ax = plt.subplots(figsize=(12, 6))
+
+    ax.plot(result.days, result.mean, label='Promedio Histórico', color='blue')
+    for nombre, otro in (others or {}).items():
+        ax.plot(otro.days, otro.mean, label=f'Promedio Histórico ({nombre})')
+
+    ax.set_title(f'Evolución del Promedio Histórico de {result.variable}')
+    ax.set_xlabel('Día del Año')
+    ax.set_ylabel(result.variable)
+    ax.grid(True)
+    ax.legend()
+    return fig
+
+
+@timed()
+def year_vs_average_figure(result):
+    # Un año (result.year) frente al promedio histórico
+    fig, ax = plt.subplots(figsize=(12, 6))
+    ax.plot(result.days, result.mean, label='Promedio Histórico', color='blue')
+    ax.plot(result.days, result.year_values, label=f'{result.year}', color='red', linestyle='--')
+
+    ax.set_title(f'Comparación de {result.variable} en {result.year} vs. Promedio Histórico')
+    ax.set_xlabel('Día del Año')
+    ax.set_ylabel(result.variable)
+    ax.grid(True)
+    ax.legend()
+    return fig
+
+
+@timed()
+def annual_comparison_figure(result, detail=None):
+    # 'detail' (LevelOfDetail de los mismos datos) aporta las series por día
+    # del año ya reducidas cuando hay demasiados años para dibujarlas enteras
+    por_dia = result.granularity == 'day_of_year'
+    nombre = result.variable.replace('_', ' ')
+    figsize = (12, 7)
+    valores, ancho = result.values, 1
+    if por_dia:
+        series = (lambda w: detail.series(result.variable, w)) if detail is not None else None
+        dias, valores, ancho = _year_lines(figsize, result.positions, result.values, result.years, series)
+        # Fechas de referencia (año 2000) para formatear el eje X, vectorizadas
+        eje_x = mdates.date2num(day_of_year_dates(dias))
+    else:
+        eje_x = result.positions.astype('float64')
+
+    fig, ax = plt.subplots(figsize=figsize)
+
+    # Todos los años en una sola colección de líneas; los años sin datos
+    # válidos se omiten
+    handles = plot_year_lines(ax, eje_x, valores, result.years, markers=not por_dia) # Marcar solo si es por mes
+
+    # Configuración de los ejes y título
+    ax.set_title(f'Comparativa Anual de {nombre}')
+    ax.set_xlabel(_reduced_label('Día del Año', ancho, 'días') if por_dia else 'Mes del Año')
+    ax.set_ylabel(f'{nombre} promedio')
+    ax.grid(True, linestyle='--', alpha=0.7)
+
+    if por_dia:
+        # Mes y día en el eje X, con ticks a mitad de mes y menores semanales
+        ax.xaxis.set_major_formatter(mdates.DateFormatter('%b %d'))
+        ax.xaxis.set_major_locator(mdates.MonthLocator(bymonthday=15))
+        ax.xaxis.set_minor_locator(mdates.DayLocator(interval=7))
+
+        # Rotar las etiquetas de fecha para que no se solapen
+        fig.autofmt_xdate(rotation=45)
+    else:
+        ax.set_xticks(eje_x, [pd.Timestamp(2000, int(m), 1).strftime('%b') for m in eje_x])
+
+    if handles:
+        ax.legend(handles=handles, title="Año", bbox_to_anchor=(1.05, 1), loc='upper left') # Leyenda fuera del gráfico
+    fig.tight_layout() # Ajusta el layout para que no se solape la leyenda
+    return fig
+
+
+def _reduced_line(figsize, x, values):
+    # Una sola serie larga (muchos años de datos diarios), reducida como las
+    # líneas de los años si no cabe en el ancho del gráfico
+    x, valores, _ = _year_lines(figsize, x, np.asarray(values, dtype='float64')[None, :], [0])
+    return np.broadcast_to(x, valores.shape)[0], valores[0]
+
+
+@timed()
+def rolling_figure(result, daily=None, gaps=None):
+    # Serie móvil (modules.rolling.RollingSeries); 'daily' son los valores
+    # diarios originales, que se dibujan de fondo en las medias y sumas, y
+    # 'gaps' los tramos sin datos de la variable (QualityIndex.gaps)
+    figsize = (12, 6)
+    fechas = mdates.date2num(result.days)
+    nombre = result.variable.replace('_', ' ')
+    fig, ax = plt.subplots(figsize=figsize)
+    if gaps is not None and not gaps.empty:
+        _mark_gaps(ax, mdates.date2num(gaps['inicio'].to_numpy()) - 0.5, gaps['dias'].to_numpy())
+
+    if result.kind == 'anomaly':
+        x, valores = _reduced_line(figsize, fechas, result.values)
+        ax.axhline(0, color='black', linewidth=0.8)
+        ax.fill_between(x, 0, valores, where=valores >= 0, color='tab:red', alpha=0.5, interpolate=True, label='Por encima del promedio')
+        ax.fill_between(x, 0, valores, where=valores < 0, color='tab:blue', alpha=0.5, interpolate=True, label='Por debajo del promedio')
+        ax.set_ylabel(f'Anomalía de {nombre}')
+    else:
+        if daily is not None and result.window > 1:
+            x, valores = _reduced_line(figsize, fechas, daily)
+            ax.plot(x, valores, color='lightgray', linewidth=0.6, label='Valor diario')
+        x, valores = _reduced_line(figsize, fechas, result.values)
+        ax.plot(x, valores, color='tab:blue', label=KIND_NAMES[result.kind])
+        ax.set_ylabel(nombre)
+
+    ventana = f' ({result.window} días)' if result.window > 1 else ''
+    ax.set_title(f'{KIND_NAMES[result.kind]} de {nombre}{ventana}')
+    ax.set_xlabel('Fecha')
+    ax.xaxis_date()
+    ax.grid(True, linestyle='--', alpha=0.7)
+    ax.legend(loc='upper left')
+    fig.autofmt_xdate()
+    return fig
@@ -0,0 +1,207 @@
+# modules/rolling.py
+# Estadísticos móviles y anomalías sobre la serie diaria. Los datos se
+# colocan en un índice diario continuo (del primer al último día, con NaN en
+# los días que faltan) y todas las ventanas se calculan con sumas
+# acumuladas, en O(n) sea cual sea su tamaño.
+import copy
+from typing import NamedTuple
+
+import numpy as np
+
+from modules.climatology import analysis_variables
+
+# Ventanas (en días) que ofrece la vista
+WINDOWS = (7, 30, 90)
+# Tipos de serie: media móvil, suma móvil, acumulado desde el 1 de enero y
+# anomalía respecto al promedio histórico del mismo día del año
+KINDS = ('mean', 'sum', 'cumulative', 'anomaly')
+KIND_NAMES = {
+    'mean': 'Media móvil',
+    'sum': 'Suma móvil',
+    'cumulative': 'Acumulado anual',
+    'anomaly': 'Anomalía',
+}
+# Variables que se suman (en lugar de promediarse) o se acumulan por año
+SUM_VARIABLES = ['LLUVIA']
+CUMULATIVE_VARIABLES = ['GRADO-DIA_CALENTAMIENTO', 'GRADO-DIA_ENFRIAMIENTO', 'GRADOS_DIA_CRECIMIENTO']
+# Parte mínima de la ventana con datos para dar un valor
+MIN_COVERAGE = 0.5
+
+
+class RollingSeries(NamedTuple):
+    variable: str
+    kind: str                # uno de KINDS
+    window: int              # días de la ventana (1 en el acumulado)
+    days: np.ndarray         # fechas (datetime64[D]) del índice diario continuo
+    values: np.ndarray       # valor de la serie en cada día, NaN si no hay datos
+
+
+def default_kind(variable):
+    # Serie más útil de cada variable: la lluvia se suma, los grados-día se
+    # acumulan y el resto se promedia
+    if variable in CUMULATIVE_VARIABLES:
+        return 'cumulative'
+    if variable in SUM_VARIABLES:
+        return 'sum'
+    return 'mean'
+
+
+def _window_sums(valores, window):
+    # Suma y número de datos de cada ventana de 'window' días que termina en
+    # cada posición, con sumas acumuladas (los NaN no cuentan)
+    validos = ~np.isnan(valores)
+    suma = np.concatenate([[0.0], np.cumsum(np.where(validos, valores, 0.0))])
+    n = np.concatenate([[0], np.cumsum(validos)])
+    inicio = np.maximum(np.arange(1, len(valores) + 1) - window, 0)
+    return suma[1:] - suma[inicio], n[1:] - n[inicio]
+
+
+class RollingEngine:
+    # Serie diaria continua de cada variable y sus series móviles, que se
+    # guardan por (variable, tipo, ventana). Cuando se añaden registros el
+    # Dataset lo sustituye por updated(), que reutiliza lo ya calculado.
+
+    def __init__(self, df, cube):
+        self.cube = cube
+        self.variables = analysis_variables(df)
+        # Las filas sin fecha válida no se pueden colocar en el índice diario
+        dias = df['DAY'].to_numpy().astype('datetime64[D]')
+        self._con_fecha = ~np.isnat(dias)
+        dias = dias[self._con_fecha]
+        self._df = df
+        if len(dias):
+            self.start = dias.min()
+            self.days = np.arange(self.start, dias.max() + 1)
+        else:
+            self.start = None
+            self.days = np.array([], dtype='datetime64[D]')
+        self._positions = (dias - self.start).astype('int64') if len(dias) else np.array([], dtype='int64')
+        # Suma y número de datos de cada día, por variable
+        self._totals = {}
+        self._daily = {}
+        self._series = {}
+        self._day_of_year = None
+
+    def daily(self, variable):
+        # Valor diario en el índice continuo (media si un día se repite)
+        if variable not in self._daily:
+            if self._positions is None:
+                dias = self._df['DAY'].to_numpy().astype('datetime64[D]')
+                self._con_fecha = ~np.isnat(dias)
+                self._positions = (dias[self._con_fecha] - self.start).astype('int64')
+            valores = self._df[variable].to_numpy(dtype='float64', na_value=np.nan)[self._con_fecha]
+            validos = ~np.isnan(valores)
+            n = np.bincount(self._positions[validos], minlength=len(self.days))
+            suma = np.bincount(self._positions[validos], weights=valores[validos], minlength=len(self.days))
+            self._totals[variable] = (suma, n)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                self._daily[variable] = np.where(n > 0, suma / n, np.nan)
+        return self._daily[variable]
+
+    def updated(self, df, new_rows, cube):
+        # Motor para 'df' (los datos de este con 'new_rows' añadidas) que
+        # reutiliza las series ya calculadas: las diarias solo cambian en los
+        # días de las filas nuevas y las móviles se recalculan desde el
+        # primero de ellos (menos la ventana, o desde el 1 de enero en el
+        # acumulado). Las anomalías se descartan porque el promedio histórico
+        # cambia con cada registro. Sigue copiando arrays de un valor por día
+        # (no por fila); las posiciones de las filas de 'df' solo se calculan
+        # si se pide una variable que no estaba calculada.
+        dias = new_rows['DAY'].to_numpy().astype('datetime64[D]')
+        con_fecha = ~np.isnat(dias)
+        dias = dias[con_fecha]
+        if self.start is None:
+            return RollingEngine(df, cube)
+        nuevo = copy.copy(self)
+        nuevo.cube = cube
+        nuevo._df = df
+        nuevo._con_fecha = nuevo._positions = None
+        nuevo._totals, nuevo._daily, nuevo._series = dict(self._totals), dict(self._daily), {}
+        if not len(dias):
+            nuevo._series = {c: s for c, s in self._series.items() if c[1] != 'anomaly'}
+            return nuevo
+
+        fin_anterior = self.days[-1]
+        inicio, fin = min(self.start, dias.min()), max(fin_anterior, dias.max())
+        delante = int((self.start - inicio).astype('int64'))
+        detras = int((fin - fin_anterior).astype('int64'))
+        if delante or detras:
+            nuevo.start = inicio
+            nuevo.days = np.arange(inicio, fin + 1)
+            nuevo._day_of_year = None
+        posiciones = (dias - inicio).astype('int64')
+        # Primer día que cambia: el primero con registros nuevos o, si el
+        # periodo se alarga, el siguiente al último anterior (si empieza antes,
+        # es el 0 y no se conserva nada de las series anteriores)
+        desde = min(int(posiciones.min()), delante + len(self.days))
+
+        for variable, (suma, n) in self._totals.items():
+            valores = new_rows[variable].to_numpy(dtype='float64', na_value=np.nan)[con_fecha]
+            validos = ~np.isnan(valores)
+            suma = np.pad(suma, (delante, detras))
+            n = np.pad(n, (delante, detras))
+            np.add.at(suma, posiciones[validos], valores[validos])
+            np.add.at(n, posiciones[validos], 1)
+            media = np.pad(self._daily[variable], (delante, detras), constant_values=np.nan)
+            tocados = posiciones[validos]
+            media[tocados] = suma[tocados] / n[tocados]
+            nuevo._totals[variable] = (suma, n)
+            nuevo._daily[variable] = media
+
+        for (variable, kind, window), serie in self._series.items():
+            if kind == 'anomaly' or variable not in self._totals:
+                continue
+            if kind == 'cumulative':
+                año = nuevo.days[desde].astype('datetime64[Y]').astype('datetime64[D]')
+                inicio_cola = int(np.searchsorted(nuevo.days, año))
+            else:
+                inicio_cola = max(desde - window + 1, 0)
+            cola = nuevo._compute(variable, kind, window, inicio_cola)
+            nuevo._series[(variable, kind, window)] = serie._replace(
+                days=nuevo.days,
+                values=np.concatenate([serie.values[:desde], cola[desde - inicio_cola:]]),
+            )
+        return nuevo
+
+    def _climatology(self, variable):
+        # Promedio histórico del día del año de cada día del índice
+        if self._day_of_year is None:
+            años = self.days.astype('datetime64[Y]')
+            self._day_of_year = (self.days - años).astype('int64') + 1
+        promedios = self.cube.mean('Dia_del_Año', variable)
+        tabla = np.full(367, np.nan)
+        tabla[promedios.index.to_numpy(dtype='int64')] = promedios.to_numpy(dtype='float64')
+        return tabla[self._day_of_year]
+
+    def _compute(self, variable, kind, window, inicio=0):
+        # Serie desde la posición 'inicio' del índice (un 1 de enero en el
+        # acumulado; en las ventanas, las primeras window - 1 quedan cortas)
+        if kind == 'cumulative':
+            # Acumulado desde el 1 de enero de cada año (los días sin dato suman 0)
+            valores = self.daily(variable)[inicio:]
+            dias = self.days[inicio:]
+            acumulado = np.cumsum(np.where(np.isnan(valores), 0.0, valores))
+            años = dias.astype('datetime64[Y]')
+            inicio_año = np.searchsorted(dias, años.astype('datetime64[D]'))
+            base = np.concatenate([[0.0], acumulado])[inicio_año]
+            return acumulado - base
+        valores = self.daily(variable)[inicio:]
+        if kind == 'anomaly':
+            valores = valores - self._climatology(variable)[inicio:]
+        if window == 1:
+            return valores
+        suma, n = _window_sums(valores, window)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            resultado = suma if kind == 'sum' else suma / n
+        return np.where(n >= MIN_COVERAGE * window, resultado, np.nan)
+
+    def series(self, variable, kind, window=1):
+        if kind not in KINDS:
+            raise ValueError(f"kind debe ser uno de {KINDS}, no {kind!r}")
+        if kind == 'cumulative':
+            window = 1
+        clave = (variable, kind, window)
+        if clave not in self._series:
+            self._series[clave] = RollingSeries(variable, kind, window, self.days,
+                                                self._compute(variable, kind, window))
+        return self._series[clave]
@@ -0,0 +1,73 @@
+# modules/rolling_analysis.py
+import streamlit as st
+
+from modules.analytics import rolling_series
+from modules.climatology import ClimatologyCube
+from modules.figure_cache import show_figure
+from modules.rendering import rolling_figure
+from modules.rolling import KIND_NAMES, WINDOWS, RollingEngine, default_kind
+
+# Años que se muestran por defecto (los más recientes)
+DEFAULT_YEARS = 5
+
+
+def show_rolling_analysis(df, cube=None, version=None, rolling=None, quality=None):
+    st.header("📉 Medias Móviles y Anomalías")
+    st.write("Medias y sumas móviles, acumulados desde el 1 de enero y anomalías respecto al promedio histórico de cada día del año.")
+
+    # Las series salen del motor de series móviles precalculado (una por
+    # variable, tipo y ventana); si no se recibe se crea a partir del DataFrame
+    if rolling is None:
+        rolling = RollingEngine(df, cube if cube is not None else ClimatologyCube.build(df))
+
+    variables = rolling.variables
+    if not variables or rolling.start is None:
+        st.warning("No se encontraron columnas numéricas con fechas válidas para calcular series móviles.")
+        return
+
+    st.sidebar.header("Opciones de Medias Móviles")
+    selected_variable = st.sidebar.selectbox("Variable:", options=variables)
+
+    tipos = list(KIND_NAMES)
+    tipo_nombre = st.sidebar.radio(
+        "Tipo de serie:",
+        options=[KIND_NAMES[t] for t in tipos],
+        index=tipos.index(default_kind(selected_variable)),
+    )
+    tipo = tipos[[KIND_NAMES[t] for t in tipos].index(tipo_nombre)]
+
+    ventana = 1
+    if tipo != 'cumulative':
+        opciones_ventana = ([1] if tipo == 'anomaly' else []) + list(WINDOWS)
+        ventana = st.sidebar.selectbox(
+            "Ventana (días):",
+            options=opciones_ventana,
+            index=opciones_ventana.index(30),
+        )
+
+    # Rango de años: por defecto los DEFAULT_YEARS más recientes
+    primero, ultimo = (int(año) for año in rolling.days[[0, -1]].astype('datetime64[Y]').astype('int64') + 1970)
+    años = (primero, ultimo)
+    if ultimo > primero:
+        años = st.sidebar.slider(
+            "Años:",
+            min_value=primero,
+            max_value=ultimo,
+            value=(max(primero, ultimo - DEFAULT_YEARS + 1), ultimo),
+        )
+
+    st.subheader(f"{tipo_nombre} de {selected_variable} ({años[0]}-{años[1]})")
+
+    def render():
+        resultado = rolling_series(df, selected_variable, tipo, ventana, years=años, engine=rolling)
+        diario = None
+        if tipo in ('mean', 'sum'):
+            diario = rolling_series(df, selected_variable, 'mean', 1, years=años, engine=rolling).values
+        # Los tramos sin datos de la variable se marcan en el gráfico
+        huecos = None
+        if quality is not None and len(resultado.days):
+            huecos = quality.gaps(selected_variable, resultado.days[0], resultado.days[-1])
+        return rolling_figure(resultado, diario, huecos)
+
+    # El gráfico se reutiliza de la caché si ya se ha generado para esta versión de los datos
+    show_figure(version and (version, 'rolling', selected_variable, tipo, ventana, años), render)
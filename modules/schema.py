@@ -0,0 +1,128 @@
+# modules/schema.py
+import numpy as np
+import pandas as pd
+
+# Esquema del CSV de la estación (32 columnas). Las lecturas se guardan en
+# float32, los enteros pequeños con tipos enteros que admiten nulos y las
+# horas (HORA_*) como minutos desde medianoche en Int16.
+DATE_COLUMN = 'DAY'
+# La fecha se queda en datetime64[s] (8 bytes por fila) y no como un número de
+# día en int32: ahorraría 4 bytes por fila (menos del 5 % del DataFrame), pero
+# las vistas, el caché y los índices la usan como fecha (.dt, comparaciones
+# con Timestamp, horas en los datos subdiarios) y habría que convertirla en
+# cada uso.
+DATE_DTYPE = 'datetime64[s]'
+# Formatos de fecha aceptados, en orden (DD/MM/AA y DD/MM/AAAA)
+DATE_FORMATS = ['%d/%m/%y', '%d/%m/%Y']
+
+FLOAT_COLUMNS = [
+    'TEMP_MEDIA', 'TEMP_MAX', 'TEMP_MIN',
+    'TEMP_MEDIA_1,5m', 'TEMP_MAX_1,5m', 'TEMP_MIN_1,5m',
+    'GRADO-DIA_CALENTAMIENTO', 'GRADO-DIA_ENFRIAMIENTO', 'GRADOS_DIA_CRECIMIENTO',
+    'LLUVIA', 'VEL_VIENTO_MEDIA', 'VEL_VIENTO_MAX',
+    'HUMEDAD_MEDIA',
+    'PRESION_MEDIA', 'PRESION_MAX', 'PRESION_MIN',
+    'RADIACION_MEDIA', 'RADIACION_MAX', 'UV_MAX',
+]
+INTEGER_COLUMNS = {
+    'DIRECCION_DOMINANTE_VIENTO': 'Int16',
+    'HUMEDAD_MAX': 'UInt8',
+    'HUMEDAD_MIN': 'UInt8',
+}
+TIME_COLUMNS = [
+    'HORA_TEMP_MAX', 'HORA_TEMP_MIN', 'HORA_TEMP_MAX_1,5m', 'HORA_TEMP_MIN_1,5m',
+    'HORA_VEL_VIENTO_MAX', 'HORA_HUMEDAD_MAX', 'HORA_HUMEDAD_MIN',
+    'HORA_PRESION_MAX', 'HORA_PRESION_MIN',
+]
+TIME_DTYPE = 'Int16'
+
+# Tipos con los que se leen del CSV las columnas que no se dejan inferir
+CSV_DTYPES = {DATE_COLUMN: 'str', **{col: 'str' for col in TIME_COLUMNS}}
+
+
+def parse_dates(valores):
+    # Fechas con formato explícito (mucho más rápido que dejar que pandas lo
+    # deduzca fila a fila); lo que no encaja se intenta con dayfirst y lo que
+    # tampoco se queda sin fecha (NaT; el control de calidad lo cuenta)
+    fechas = pd.to_datetime(valores, format=DATE_FORMATS[0], errors='coerce')
+    for formato in DATE_FORMATS[1:]:
+        pendientes = fechas.isna() & valores.notna()
+        if not pendientes.any():
+            break
+        fechas = fechas.where(~pendientes, pd.to_datetime(valores, format=formato, errors='coerce'))
+    pendientes = fechas.isna() & valores.notna()
+    if pendientes.any():
+        fechas = fechas.where(~pendientes, pd.to_datetime(valores[pendientes], dayfirst=True, errors='coerce'))
+    return fechas.astype(DATE_DTYPE)
+
+
+def _parse_times_regex(valores):
+    partes = valores.str.extract(r'^\s*(\d{1,2}):(\d{2})', expand=True)
+    horas = pd.to_numeric(partes[0], errors='coerce')
+    minutos = pd.to_numeric(partes[1], errors='coerce')
+    return horas * 60 + minutos
+
+
+def parse_times(valores):
+    # 'HH:MM[:SS]' -> minutos desde medianoche (Int16, nulo si está vacío).
+    # Las horas con el formato fijo 'HH:MM' se convierten leyendo los
+    # caracteres como bytes (sin recorrer las filas en Python); solo el
+    # resto pasa por la expresión regular.
+    try:
+        caracteres = np.asarray(valores.fillna(''), dtype='S5').view(np.uint8)
+    except UnicodeEncodeError:
+        return _parse_times_regex(valores).astype(TIME_DTYPE)
+    cifras = caracteres.reshape(-1, 5).astype(np.int16) - ord('0')
+    digitos = cifras[:, [0, 1, 3, 4]]
+    fijo = ((digitos >= 0) & (digitos <= 9)).all(axis=1) & (cifras[:, 2] == ord(':') - ord('0'))
+    minutos = pd.Series(
+        (cifras[:, 0] * 10 + cifras[:, 1]) * 60 + cifras[:, 3] * 10 + cifras[:, 4],
+        index=valores.index, dtype='float64',
+    ).where(fijo)
+    resto = ~fijo & valores.notna().to_numpy()
+    if resto.any():
+        minutos[resto] = _parse_times_regex(valores[resto])
+    return minutos.astype(TIME_DTYPE)
+
+
+def format_times(minutos):
+    # Minutos desde medianoche -> 'HH:MM' (para mostrar las columnas HORA_*
+    # de las pocas filas que se enseñan en una tabla)
+    minutos = pd.Series(minutos)
+    valores = minutos.to_numpy(dtype='float64', na_value=np.nan)
+    return pd.Series(
+        ['' if np.isnan(v) else f'{int(v) // 60:02d}:{int(v) % 60:02d}' for v in valores],
+        index=minutos.index, dtype=object,
+    )
+
+
+def _to_number(valores):
+    if pd.api.types.is_numeric_dtype(valores):
+        return valores
+    # Valores que el lector no ha podido convertir (p. ej. texto suelto)
+    return pd.to_numeric(valores, errors='coerce')
+
+
+def apply_schema(df, drop_empty=True):
+    # Convierte un DataFrame leído del CSV a los tipos compactos del esquema.
+    # Las columnas que no están en el esquema se dejan como las infiere pandas.
+    if DATE_COLUMN in df.columns and not pd.api.types.is_datetime64_any_dtype(df[DATE_COLUMN]):
+        df[DATE_COLUMN] = parse_dates(df[DATE_COLUMN])
+    elif DATE_COLUMN in df.columns:
+        df[DATE_COLUMN] = df[DATE_COLUMN].astype(DATE_DTYPE)
+    for col in FLOAT_COLUMNS:
+        if col in df.columns:
+            df[col] = _to_number(df[col]).astype('float32')
+    for col, dtype in INTEGER_COLUMNS.items():
+        if col in df.columns:
+            valores = _to_number(df[col])
+            # Si hay decimales no se fuerza el entero
+            enteros = valores.dropna()
+            df[col] = valores.astype(dtype) if np.array_equal(enteros, np.round(enteros)) else valores.astype('float32')
+    for col in TIME_COLUMNS:
+        if col in df.columns and not pd.api.types.is_integer_dtype(df[col]):
+            df[col] = parse_times(df[col].astype('str').where(df[col].notna()))
+    if drop_empty:
+        vacias = [col for col in df.columns if col != DATE_COLUMN and df[col].isna().all()]
+        df = df.drop(columns=vacias)
+    return df
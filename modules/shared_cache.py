@@ -0,0 +1,410 @@
+# modules/shared_cache.py
+# Caché compartida entre procesos y réplicas de la aplicación: los datos de
+# cada estación con sus agregados (cubo climatológico e índice de extremos)
+# y los gráficos ya renderizados. La primera réplica que carga una estación
+# publica una instantánea (tablas Arrow IPC); las demás la leen en lugar de
+# parsear el CSV y recalcular los agregados, y solo procesan los registros
+# añadidos después. Las claves dependen del contenido del CSV (ver
+# content_versions), así que todas las réplicas con el mismo fichero usan
+# las mismas entradas.
+#
+# El almacén se elige con la variable de entorno METEO_SHARED_CACHE:
+#   (sin definir)           carpeta data/.cache/compartida
+#   /ruta/compartida        otra carpeta (p. ej. un volumen común a las réplicas)
+#   redis://host:6379/0     un servidor Redis (o compatible), con el paquete redis
+#   memory://               diccionario en memoria del proceso (pruebas)
+#   none                    sin caché compartida
+#
+#   python -m modules.shared_cache [--datos data]   precarga todas las estaciones
+import argparse
+import hashlib
+import json
+import logging
+import mmap
+import os
+import threading
+import time
+from typing import NamedTuple
+
+import pandas as pd
+
+from modules.climatology import ClimatologyCube
+from modules.data_loader import (
+    CACHE_DIR,
+    align_dtypes,
+    arrow_to_frame,
+    content_versions,
+    frame_to_arrow,
+    read_appended_rows,
+    schema_matches,
+)
+from modules.extremes_index import ExtremesIndex
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+except ImportError:  # pragma: no cover
+    pa = None
+    ipc = None
+
+# El cliente de Redis solo hace falta si se configura un servidor
+try:
+    import redis
+except ImportError:  # pragma: no cover
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+ENV_VAR = "METEO_SHARED_CACHE"
+DEFAULT_DIR = os.path.join(CACHE_DIR, "compartida")
+# Tamaño máximo de la carpeta compartida; al superarlo se borran las entradas
+# usadas hace más tiempo. Con Redis el límite es el 'maxmemory' del servidor
+# (con una política de descarte LRU, p. ej. allkeys-lru).
+MAX_DISK_BYTES = 2 * 1024 * 1024 * 1024
+# Se incrementa cuando cambia lo que se guarda en las instantáneas
+SNAPSHOT_FORMAT = 4
+
+
+class DiskBackend:
+    # Una entrada por fichero en una carpeta (local o montada en todas las
+    # réplicas). Las escrituras son atómicas (temporal + rename) y las
+    # lecturas se mapean en memoria: Arrow lee las tablas sin copiarlas.
+
+    def __init__(self, directory, max_bytes=MAX_DISK_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._written = 0
+        self._lock = threading.Lock()
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha1(key.encode("utf-8")).hexdigest())
+
+    def get(self, key):
+        try:
+            with open(self._path(key), "rb") as f:
+                datos = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+        # La fecha de modificación marca el último uso (para el descarte). En
+        # un volumen de solo lectura no se puede cambiar: la entrada se ha
+        # leído igualmente.
+        try:
+            os.utime(self._path(key))
+        except OSError:
+            pass
+        return memoryview(datos)
+
+    def set(self, key, data):
+        os.makedirs(self.directory, exist_ok=True)
+        ruta = self._path(key)
+        tmp_file = f"{ruta}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_file, "wb") as f:
+            f.write(data)
+        os.replace(tmp_file, ruta)
+        with self._lock:
+            self._written += memoryview(data).nbytes
+            podar = self._written > self.max_bytes // 10
+            if podar:
+                self._written = 0
+        if podar:
+            self.prune()
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def prune(self):
+        # Borra las entradas usadas hace más tiempo hasta quedar por debajo
+        # de max_bytes. Se llama cada vez que se ha escrito una décima parte.
+        try:
+            with os.scandir(self.directory) as entradas:
+                ficheros = [(e.stat().st_mtime, e.stat().st_size, e.path) for e in entradas if e.is_file()]
+        except OSError:
+            return
+        total = sum(size for _, size, _ in ficheros)
+        for _, size, ruta in sorted(ficheros):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(ruta)
+                total -= size
+            except OSError:
+                pass
+
+
+class LocalRedis:
+    # Sustituto en memoria de un cliente de Redis (solo get/set/delete), para
+    # pruebas y para ejecutar sin servidor. No se comparte entre procesos.
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, name):
+        with self._lock:
+            return self._data.get(name)
+
+    def set(self, name, value):
+        with self._lock:
+            self._data[name] = bytes(value)
+        return True
+
+    def delete(self, *names):
+        with self._lock:
+            return sum(self._data.pop(name, None) is not None for name in names)
+
+    def flushall(self):
+        with self._lock:
+            self._data.clear()
+        return True
+
+
+class RedisBackend:
+    # Entradas en un servidor Redis (o cualquier objeto con la interfaz de
+    # redis-py: get/set/delete con valores bytes), con un prefijo común
+
+    def __init__(self, client, prefix="meteo:"):
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, key):
+        return self.client.get(self.prefix + key)
+
+    def set(self, key, data):
+        self.client.set(self.prefix + key, bytes(data))
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+
+def backend_from_url(url):
+    # Almacén a partir de una URL como las de METEO_SHARED_CACHE (None = sin caché)
+    if not url:
+        return DiskBackend(DEFAULT_DIR)
+    if url.lower() in ("none", "off", "0"):
+        return None
+    if url.startswith("memory://"):
+        return RedisBackend(LocalRedis())
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        if redis is None:
+            logger.warning("%s apunta a Redis pero el paquete redis no está instalado; sin caché compartida", ENV_VAR)
+            return None
+        return RedisBackend(redis.Redis.from_url(url))
+    return DiskBackend(url)
+
+
+_default_backend = None
+_default_lock = threading.Lock()
+
+
+def default_backend():
+    # Almacén configurado en el entorno, creado la primera vez que se pide
+    global _default_backend
+    with _default_lock:
+        if _default_backend is None:
+            _default_backend = backend_from_url(os.environ.get(ENV_VAR, "")) or False
+        return _default_backend or None
+
+
+def set_default_backend(backend):
+    # Sustituye el almacén del proceso (None = sin caché compartida)
+    global _default_backend
+    with _default_lock:
+        _default_backend = backend if backend is not None else False
+
+
+# --- Serialización ---
+
+def _to_ipc(table):
+    sink = pa.BufferOutputStream()
+    with ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue()
+
+
+def _from_ipc(data):
+    # Sin copia: la tabla apunta a los bytes leídos (o mapeados) del almacén
+    return ipc.open_file(pa.py_buffer(data)).read_all()
+
+
+def _frame_to_ipc(frame):
+    return _to_ipc(pa.Table.from_pandas(frame, preserve_index=False))
+
+
+def _frame_from_ipc(data):
+    return _from_ipc(data).to_pandas(date_as_object=False)
+
+
+def _get_json(backend, key):
+    data = backend.get(key)
+    return json.loads(bytes(data)) if data is not None else None
+
+
+def _set_json(backend, key, value):
+    backend.set(key, json.dumps(value, sort_keys=True).encode("utf-8"))
+
+
+def station_key(file_path):
+    return f"estacion/{os.path.splitext(os.path.basename(file_path))[0]}"
+
+
+def _snapshot_keys(version, meta):
+    prefijo = f"datos/{SNAPSHOT_FORMAT}/{version}"
+    return (
+        [f"{prefijo}/df"]
+        + [f"{prefijo}/cubo/{name}" for name in meta["cubo"]]
+        + [f"{prefijo}/extremos/cubetas"]
+        + [f"{prefijo}/extremos/{i}" for i in range(len(meta["extremos"]["variables"]))]
+        + [f"{prefijo}/meta"]
+    )
+
+
+class Snapshot(NamedTuple):
+    df: pd.DataFrame
+    cube: ClimatologyCube
+    extremes: ExtremesIndex
+    state: dict             # estado de lectura del CSV (ver data_loader)
+    version: str            # huella del CSV hasta state['offset'] (state['version'])
+    new_rows: int           # registros añadidos al CSV después de la instantánea
+
+
+def publish_snapshot(backend, file_path, version, state, df, cube, extremes):
+    # Publica los datos y agregados de una estación. Las piezas se escriben
+    # antes que 'meta', y el puntero de la estación al final: un lector nunca
+    # ve una instantánea a medias. La instantánea anterior de la estación se
+    # borra, salvo que sea de un fichero más largo (otra réplica más al día).
+    if pa is None:
+        return False
+    prefijo = f"datos/{SNAPSHOT_FORMAT}/{version}"
+    clave = station_key(file_path)
+    anterior = _get_json(backend, clave)
+    if anterior is not None and anterior["state"]["offset"] > state["offset"]:
+        return False
+    if backend.get(f"{prefijo}/meta") is None:
+        backend.set(f"{prefijo}/df", _to_ipc(frame_to_arrow(df)))
+        tablas = cube.to_frames()
+        for name, frame in tablas.items():
+            backend.set(f"{prefijo}/cubo/{name}", _frame_to_ipc(frame))
+        ordenes = extremes.to_frames()
+        backend.set(f"{prefijo}/extremos/cubetas", _frame_to_ipc(ordenes["cubetas"]))
+        for i, variable in enumerate(extremes.variables):
+            backend.set(f"{prefijo}/extremos/{i}", _frame_to_ipc(ordenes[variable]))
+        _set_json(backend, f"{prefijo}/meta", {
+            "state": state,
+            "cubo": list(tablas),
+            "variables": cube.variables,
+            "extremos": {"variables": extremes.variables, "year_range": extremes.year_range, "k": extremes.k},
+        })
+    _set_json(backend, clave, {"version": version, "state": state})
+    if anterior is not None and anterior["version"] != version:
+        meta = _get_json(backend, f"datos/{SNAPSHOT_FORMAT}/{anterior['version']}/meta")
+        if meta is not None:
+            for key in _snapshot_keys(anterior["version"], meta):
+                backend.delete(key)
+    return True
+
+
+def _read_snapshot(backend, version):
+    # (df, cubo, índice, estado) de una instantánea, o None si falta alguna
+    # pieza (p. ej. descartada por el servidor)
+    prefijo = f"datos/{SNAPSHOT_FORMAT}/{version}"
+    meta = _get_json(backend, f"{prefijo}/meta")
+    if meta is None:
+        return None
+    piezas = {key: backend.get(key) for key in _snapshot_keys(version, meta)[:-1]}
+    if any(data is None for data in piezas.values()):
+        return None
+    df = arrow_to_frame(_from_ipc(piezas[f"{prefijo}/df"]))
+    cube = ClimatologyCube.from_frames(
+        {name: _frame_from_ipc(piezas[f"{prefijo}/cubo/{name}"]) for name in meta["cubo"]}, meta["variables"]
+    )
+    variables = meta["extremos"]["variables"]
+    ordenes = {"cubetas": _frame_from_ipc(piezas[f"{prefijo}/extremos/cubetas"])}
+    for i, variable in enumerate(variables):
+        ordenes[variable] = _frame_from_ipc(piezas[f"{prefijo}/extremos/{i}"])
+    extremes = ExtremesIndex.from_frames(ordenes, variables, meta["extremos"]["year_range"], meta["extremos"]["k"])
+    return df, cube, extremes, meta["state"]
+
+
+def load_snapshot(backend, file_path):
+    # Snapshot de la estación a partir de la caché compartida, o None. Se usa
+    # la instantánea del contenido actual del CSV o, si el CSV ha crecido
+    # desde la última publicada, esa más los registros añadidos.
+    if pa is None:
+        return None
+    size = os.path.getsize(file_path)
+    puntero = _get_json(backend, station_key(file_path))
+    offsets = [size]
+    if puntero is not None and puntero["state"]["offset"] < size:
+        offsets.append(puntero["state"]["offset"])
+    versiones = content_versions(file_path, offsets)
+    leido = _read_snapshot(backend, versiones[size])
+    if leido is None and len(offsets) > 1 and versiones[offsets[1]] == puntero["version"]:
+        leido = _read_snapshot(backend, puntero["version"])
+    if leido is None:
+        return None
+
+    df, cube, extremes, state = leido
+    nuevas = 0
+    if state["offset"] < size:
+        appended = read_appended_rows(file_path, state)
+        if appended is None:
+            return None
+        new_rows, state = appended
+        new_rows = align_dtypes(new_rows, df)
+        if not schema_matches(new_rows, df):
+            return None
+        if len(new_rows):
+            df = pd.concat([df, new_rows], ignore_index=True)
+            cube.update(new_rows)
+            extremes.update(new_rows)
+        nuevas = len(new_rows)
+    return Snapshot(df, cube, extremes, state, state["version"], nuevas)
+
+
+def figure_key(key):
+    # Clave compartida de un gráfico (las claves de FigureCache son tuplas)
+    return "figura/" + hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+
+
+def warm(data_dir):
+    # Carga todas las estaciones, publicando las que no estén en la caché,
+    # junto con el gráfico del dashboard (la primera página que se abre)
+    from modules.stations import StationRegistry
+
+    inicio = time.perf_counter()
+    registry = StationRegistry(data_dir)
+    backend = default_backend()
+    for station_id in registry.stations():
+        dataset = registry.get(station_id)
+        load = dataset.last_load
+        logger.info("%s: %s en %.2f s", station_id, load["origen"], load["total_s"])
+        if dataset.dashboard is not None and backend is not None:
+            clave = figure_key(dataset.dashboard.chart_key)
+            if backend.get(clave) is None:
+                png = dataset.dashboard.chart()
+                if png is not None:
+                    backend.set(clave, png)
+    for station_id, e in registry.errors.items():
+        logger.warning("%s: %s", station_id, e)
+    return len(registry.stations()), time.perf_counter() - inicio
+
+
+def main():
+    from modules.stations import DATA_DIR
+
+    parser = argparse.ArgumentParser(description="Precarga la caché compartida de MeteoAnalitica")
+    parser.add_argument("--datos", default=DATA_DIR, help="Carpeta con los CSV de las estaciones")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    if default_backend() is None:
+        parser.error(f"no hay caché compartida configurada ({ENV_VAR})")
+    estaciones, segundos = warm(args.datos)
+    print(f"{estaciones} estaciones en la caché compartida en {segundos:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+# modules/stations.py
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from modules.data_loader import source_signature
+from modules.dataset import Dataset, read_source
+
+logger = logging.getLogger(__name__)
+
+# Carpeta donde se buscan los CSV de las estaciones (uno por estación, todos
+# con el mismo formato de 32 columnas)
+DATA_DIR = "data"
+# Nombres legibles de las estaciones conocidas, por nombre de fichero
+STATION_NAMES = {
+    "datos_clima": "La Pobla Tornesa",
+}
+# Los procesos de lectura no se crean con fork: el servidor tiene hilos
+# (Streamlit, sesiones) y un fork copiaría sus cerrojos en cualquier estado
+MP_START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+
+def mp_context():
+    # Contexto de multiprocessing para los pools de procesos (ver MP_START_METHOD)
+    return multiprocessing.get_context(MP_START_METHOD)
+
+
+def discover_stations(data_dir=DATA_DIR):
+    # {id_estacion: ruta_csv} para cada CSV de la carpeta de datos
+    estaciones = {}
+    with os.scandir(data_dir) as entradas:
+        for entrada in entradas:
+            if entrada.is_file() and entrada.name.lower().endswith(".csv"):
+                estaciones[os.path.splitext(entrada.name)[0]] = entrada.path
+    return dict(sorted(estaciones.items()))
+
+
+def station_label(station_id):
+    return STATION_NAMES.get(station_id, station_id.replace("_", " "))
+
+
+def load_sources(paths, max_workers=None):
+    # Lee varios CSV en paralelo (un proceso por fichero). Con un solo
+    # fichero no compensa arrancar procesos y se lee directamente. Los
+    # ficheros que fallan en el pool (o todos, si el pool no llega a
+    # arrancar) quedan como None, para volver a leer solo esos.
+    paths = list(paths)
+    if len(paths) <= 1:
+        return [read_source(path) for path in paths]
+    workers = min(len(paths), max_workers or os.cpu_count() or 1)
+    resultados = [None] * len(paths)
+    try:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=mp_context()) as pool:
+            futuros = [pool.submit(read_source, path) for path in paths]
+            for i, (path, futuro) in enumerate(zip(paths, futuros)):
+                try:
+                    resultados[i] = futuro.result()
+                except Exception as e:
+                    logger.warning("Fallo al leer %s en paralelo: %s", path, e)
+    except Exception as e:
+        logger.warning("Fallo en la carga en paralelo: %s", e)
+    return resultados
+
+
+class StationRegistry:
+    # Datasets de todas las estaciones de la carpeta de datos, indexados por
+    # estación. Se comparte entre sesiones; las comparaciones entre
+    # estaciones usan los agregados ya calculados de cada una, sin volver a
+    # leer ningún fichero.
+
+    def __init__(self, data_dir=DATA_DIR, max_workers=None):
+        self.data_dir = data_dir
+        self.max_workers = max_workers
+        self.datasets = {}
+        self.errors = {}
+        # Firma del CSV de las estaciones que fallaron o no tenían datos: no
+        # se vuelven a intentar hasta que el fichero cambie
+        self._descartadas = {}
+        self._lock = threading.Lock()
+        self.refresh()
+
+    def refresh(self):
+        # Incorpora los CSV nuevos de la carpeta (leídos en paralelo) y
+        # actualiza los ya cargados (solo leen las filas añadidas)
+        estaciones = discover_stations(self.data_dir)
+        with self._lock:
+            for registro in (self.datasets, self.errors, self._descartadas):
+                for station_id in list(registro):
+                    if station_id not in estaciones:
+                        del registro[station_id]
+            nuevas = {
+                sid: path for sid, path in estaciones.items()
+                if sid not in self.datasets and not self._unchanged_discard(sid, path)
+            }
+            if nuevas:
+                self._load(nuevas)
+        for station_id, dataset in list(self.datasets.items()):
+            try:
+                dataset.refresh()
+            except (OSError, ValueError) as e:
+                logger.warning("No se pudo actualizar la estación %s: %s", station_id, e)
+
+    def _unchanged_discard(self, station_id, path):
+        try:
+            return self._descartadas.get(station_id) == source_signature(path)
+        except OSError:
+            return False
+
+    def _load(self, estaciones):
+        # Los ficheros que han fallado en el pool se vuelven a leer aquí, uno
+        # a uno, para aislar el error de cada estación. Las firmas se toman
+        # antes de leer: si un fichero cambia mientras tanto se reintentará.
+        firmas = {}
+        for station_id, path in estaciones.items():
+            try:
+                firmas[station_id] = source_signature(path)
+            except OSError:
+                pass
+        resultados = load_sources(estaciones.values(), self.max_workers)
+        for (station_id, path), loaded in zip(estaciones.items(), resultados):
+            try:
+                dataset = Dataset(path, loaded)
+            except Exception as e:
+                logger.error("No se pudo cargar la estación %s (%s): %s", station_id, path, e)
+                self.errors[station_id] = e
+                self._descartadas[station_id] = firmas.get(station_id)
+                continue
+            if dataset.df.empty:
+                self._descartadas[station_id] = firmas.get(station_id)
+                continue
+            self.errors.pop(station_id, None)
+            self._descartadas.pop(station_id, None)
+            self.datasets[station_id] = dataset
+
+    def stations(self):
+        return list(self.datasets)
+
+    def get(self, station_id):
+        return self.datasets[station_id]
@@ -0,0 +1,42 @@
+# modules/tables.py
+# Tablas HTML a partir de los resultados de modules.analytics (sin
+# Streamlit ni matplotlib)
+import html
+
+import pandas as pd
+
+from modules.schema import TIME_COLUMNS, format_times
+
+
+def extremes_table_html(df):
+    # Tabla HTML con los extremos (DAY ya formateado o como fecha)
+    if pd.api.types.is_datetime64_any_dtype(df['DAY']):
+        df = df.assign(DAY=df['DAY'].dt.strftime('%d/%m/%Y'))
+    # Las lecturas en float32 se muestran con su propia precisión (35.8 y no
+    # 35.79999923706055, que es lo que daría convertirlas a float de Python)
+    df = df.assign(**{col: df[col].to_numpy().astype(str) for col in df.columns if df[col].dtype == 'float32'})
+    # Las horas (minutos desde medianoche) como HH:MM
+    df = df.assign(**{col: format_times(df[col]) for col in df.columns if col in TIME_COLUMNS})
+
+    table_html = """
+    <div style="display: flex; justify-content: center;">
+        <table style="border-collapse: collapse; width: 100%; max-width: 800px; margin: 20px auto;">
+            <thead>
+                <tr style="background-color: #f0f0f0; color: #333;">
+    """
+
+    # Agregar las cabeceras de la tabla
+    for col in df.columns:
+        table_html += f"<th style='text-align: center; padding: 8px; border: 1px solid #ddd;'>{html.escape(str(col))}</th>"
+
+    table_html += "</tr></thead><tbody>"
+
+    # Agregar las filas de datos
+    celda = "<td style='text-align: center; padding: 8px; border: 1px solid #ddd;'>{}</td>"
+    table_html += "".join(
+        "<tr>" + "".join(celda.format(html.escape(str(value))) for value in row) + "</tr>"
+        for row in df.itertuples(index=False)
+    )
+
+    table_html += "</tbody></table></div>"
+    return table_html
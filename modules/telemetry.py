@@ -0,0 +1,327 @@
+# modules/telemetry.py
+# Instrumentación de las partes que más tardan, sin Streamlit:
+# - tramos (span) con su duración y la variación de la memoria residente del
+#   proceso, anidados ('vista/figura/render');
+# - contadores de eventos (aciertos y fallos de las cachés, origen de cada
+#   carga...);
+# - valores que se leen al exportar (p. ej. el tamaño de la caché de gráficos).
+# Cada ejecución de app.py es una traza: sus tramos y eventos se guardan
+# aparte para el panel de depuración y, al terminar, se suman a las métricas
+# del proceso con la vista y la estación como etiquetas y se escriben como
+# una línea JSON. Las métricas se exportan en el formato de texto de
+# Prometheus. Los tramos que se ejecutan en otro proceso (la lectura en
+# paralelo de varias estaciones) no llegan a las métricas de la aplicación.
+import bisect
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from functools import wraps
+from typing import NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+# Variables de entorno: "0" en METEO_TELEMETRY desactiva la instrumentación;
+# las otras dos son ficheros donde se añade una línea JSON por traza y donde
+# se reescriben las métricas (p. ej. para el textfile collector de
+# node_exporter)
+ENABLED_VAR = "METEO_TELEMETRY"
+LOG_VAR = "METEO_TELEMETRY_LOG"
+PROMETHEUS_VAR = "METEO_TELEMETRY_PROM"
+# El fichero de métricas se reescribe como mucho cada tantos segundos
+PROMETHEUS_INTERVAL_S = 15
+# Límites (en segundos) de los intervalos del histograma de duraciones
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+SEPARATOR = "/"
+PREFIX = "meteo_"
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def rss_bytes():
+    # Memoria residente actual del proceso (Linux); None donde no hay /proc
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _delta(antes, despues):
+    return despues - antes if antes is not None and despues is not None else None
+
+
+def _labels(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+class SpanRecord(NamedTuple):
+    name: str                      # ruta del tramo ('vista/figura/render')
+    start_s: float                 # inicio respecto al de la traza
+    seconds: float
+    memory_bytes: Optional[int]    # variación de la memoria residente
+
+
+class Trace:
+    # Tramos y eventos de una ejecución. Las etiquetas se pueden completar
+    # mientras dura (la vista se conoce después de cargar los datos).
+
+    def __init__(self, name, **labels):
+        self.name = name
+        self.labels = dict(labels)
+        self.spans = []
+        self.events = defaultdict(float)
+        self.started = time.time()
+        self.seconds = None
+        self.memory_bytes = None
+        self._t0 = time.perf_counter()
+        self._rss0 = rss_bytes()
+
+    def to_dict(self):
+        # Forma de la línea JSON del registro
+        eventos = defaultdict(dict)
+        for (nombre, etiquetas), valor in self.events.items():
+            eventos[nombre][",".join(f"{k}={v}" for k, v in etiquetas) or "total"] = valor
+        return {
+            "ts": datetime.fromtimestamp(self.started, timezone.utc).isoformat(timespec="milliseconds"),
+            "traza": self.name,
+            **self.labels,
+            "total_s": round(self.seconds, 6) if self.seconds is not None else None,
+            "memoria_bytes": self.memory_bytes,
+            "tramos": [
+                {"tramo": s.name, "inicio_s": round(s.start_s, 6), "s": round(s.seconds, 6), "memoria_bytes": s.memory_bytes}
+                for s in self.spans
+            ],
+            "eventos": dict(eventos),
+        }
+
+
+class Telemetry:
+    # Métricas de un proceso, compartidas por todas las sesiones. Cada hilo
+    # (Streamlit ejecuta cada sesión en el suyo) tiene su pila de tramos y
+    # su traza en curso.
+
+    def __init__(self, enabled=True, log_path=None, prometheus_path=None):
+        self.enabled = enabled
+        self.log_path = log_path
+        self.prometheus_path = prometheus_path
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._histograms = {}     # (tramo, etiquetas) -> [por intervalo..., suma]
+        self._memory = {}         # (tramo, etiquetas) -> [suma, n]
+        self._events = defaultdict(float)
+        self._collectors = {}
+        self._written = 0.0
+
+    # --- Registro ---
+
+    @contextmanager
+    def span(self, name):
+        if not self.enabled:
+            yield
+            return
+        pila = self._stack()
+        pila.append(name)
+        ruta = SEPARATOR.join(pila)
+        rss0 = rss_bytes()
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            segundos = time.perf_counter() - t0
+            memoria = _delta(rss0, rss_bytes())
+            pila.pop()
+            traza = getattr(self._local, "trace", None)
+            if traza is not None:
+                traza.spans.append(SpanRecord(ruta, t0 - traza._t0, segundos, memoria))
+            else:
+                with self._lock:
+                    self._observe(ruta, (), segundos, memoria)
+
+    def count(self, name, value=1, **labels):
+        if not self.enabled:
+            return
+        clave = (name, _labels(labels))
+        traza = getattr(self._local, "trace", None)
+        if traza is not None:
+            traza.events[clave] += value
+        else:
+            with self._lock:
+                self._events[clave] += value
+
+    def register(self, name, collector):
+        # 'collector()' devuelve {estadístico: valor}; se lee al exportar
+        self._collectors[name] = collector
+
+    def start_trace(self, name, **labels):
+        # Empieza la traza del hilo (descarta una anterior sin terminar, p. ej.
+        # de una ejecución detenida con st.stop)
+        traza = Trace(name, **labels)
+        if self.enabled:
+            self._local.trace = traza
+            self._local.stack = []
+        return traza
+
+    def finish_trace(self, traza):
+        # Cierra la traza, suma sus tramos y eventos a las métricas con sus
+        # etiquetas y la escribe en el registro
+        if getattr(self._local, "trace", None) is traza:
+            self._local.trace = None
+        traza.seconds = time.perf_counter() - traza._t0
+        traza.memory_bytes = _delta(traza._rss0, rss_bytes())
+        if not self.enabled:
+            return traza
+        etiquetas = _labels(traza.labels)
+        with self._lock:
+            self._observe(traza.name, etiquetas, traza.seconds, traza.memory_bytes)
+            for tramo in traza.spans:
+                self._observe(tramo.name, etiquetas, tramo.seconds, tramo.memory_bytes)
+            for (nombre, propias), valor in traza.events.items():
+                self._events[(nombre, tuple(sorted(dict(etiquetas, **dict(propias)).items())))] += valor
+        self._export(traza)
+        return traza
+
+    def _stack(self):
+        pila = getattr(self._local, "stack", None)
+        if pila is None:
+            pila = self._local.stack = []
+        return pila
+
+    def _observe(self, name, labels, seconds, memory):
+        # Con self._lock tomado
+        histograma = self._histograms.get((name, labels))
+        if histograma is None:
+            histograma = self._histograms[(name, labels)] = [0] * (len(BUCKETS) + 1) + [0.0]
+        histograma[bisect.bisect_left(BUCKETS, seconds)] += 1
+        histograma[-1] += seconds
+        if memory is not None:
+            suma = self._memory.setdefault((name, labels), [0, 0])
+            suma[0] += memory
+            suma[1] += 1
+
+    # --- Exportación ---
+
+    def _export(self, traza):
+        if self.log_path:
+            try:
+                linea = json.dumps(traza.to_dict(), ensure_ascii=False)
+                with self._lock, open(self.log_path, "a", encoding="utf-8") as f:
+                    f.write(linea + "\n")
+            except OSError as e:
+                logger.warning("No se pudo escribir la traza en %s: %s", self.log_path, e)
+        if self.prometheus_path and time.monotonic() - self._written >= PROMETHEUS_INTERVAL_S:
+            self._written = time.monotonic()
+            try:
+                self.write_prometheus(self.prometheus_path)
+            except OSError as e:
+                logger.warning("No se pudieron escribir las métricas en %s: %s", self.prometheus_path, e)
+
+    def snapshot(self):
+        # Copia de las métricas acumuladas: {'tramos': {(tramo, etiquetas):
+        # (n, segundos)}, 'eventos': {(evento, etiquetas): valor}}
+        with self._lock:
+            return {
+                "tramos": {clave: (sum(h[:-1]), h[-1]) for clave, h in self._histograms.items()},
+                "eventos": dict(self._events),
+            }
+
+    def prometheus_text(self):
+        with self._lock:
+            histogramas = {clave: list(h) for clave, h in self._histograms.items()}
+            memoria = {clave: list(m) for clave, m in self._memory.items()}
+            eventos = dict(self._events)
+        lineas = [
+            "# HELP meteo_span_seconds Duración de cada tramo instrumentado.",
+            "# TYPE meteo_span_seconds histogram",
+        ]
+        for (nombre, etiquetas), h in sorted(histogramas.items()):
+            base = (("span", nombre),) + etiquetas
+            acumulado = 0
+            for limite, n in zip(BUCKETS + ("+Inf",), h[:-1]):
+                acumulado += n
+                lineas.append(f"meteo_span_seconds_bucket{_format_labels(base + (('le', str(limite)),))} {acumulado}")
+            lineas.append(f"meteo_span_seconds_sum{_format_labels(base)} {h[-1]:.6f}")
+            lineas.append(f"meteo_span_seconds_count{_format_labels(base)} {acumulado}")
+        lineas += [
+            "# HELP meteo_span_memory_delta_bytes Variación de la memoria residente durante cada tramo.",
+            "# TYPE meteo_span_memory_delta_bytes summary",
+        ]
+        for (nombre, etiquetas), (suma, n) in sorted(memoria.items()):
+            base = _format_labels((("span", nombre),) + etiquetas)
+            lineas.append(f"meteo_span_memory_delta_bytes_sum{base} {suma}")
+            lineas.append(f"meteo_span_memory_delta_bytes_count{base} {n}")
+        lineas += [
+            "# HELP meteo_events_total Eventos contados (aciertos y fallos de las cachés, cargas...).",
+            "# TYPE meteo_events_total counter",
+        ]
+        for (nombre, etiquetas), valor in sorted(eventos.items()):
+            lineas.append(f"meteo_events_total{_format_labels((('event', nombre),) + etiquetas)} {valor:g}")
+        rss = rss_bytes()
+        if rss is not None:
+            lineas += [
+                "# HELP meteo_process_resident_bytes Memoria residente del proceso.",
+                "# TYPE meteo_process_resident_bytes gauge",
+                f"meteo_process_resident_bytes {rss}",
+            ]
+        for nombre, collector in sorted(self._collectors.items()):
+            try:
+                valores = collector()
+            except Exception as e:
+                logger.warning("No se pudieron leer las métricas de %s: %s", nombre, e)
+                continue
+            lineas.append(f"# TYPE {PREFIX}{nombre} gauge")
+            for stat, valor in sorted(valores.items()):
+                lineas.append(f"{PREFIX}{nombre}{_format_labels((('stat', stat),))} {valor:g}")
+        return "\n".join(lineas) + "\n"
+
+    def write_prometheus(self, path):
+        # Escritura atómica: quien lea el fichero nunca lo ve a medias
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(self.prometheus_text())
+        os.replace(tmp, path)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    partes = []
+    for clave, valor in labels:
+        valor = str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        partes.append(f'{clave}="{valor}"')
+    return "{" + ",".join(partes) + "}"
+
+
+# Instrumentación única por proceso, configurada con las variables de entorno
+TELEMETRY = Telemetry(
+    enabled=os.environ.get(ENABLED_VAR, "1") != "0",
+    log_path=os.environ.get(LOG_VAR) or None,
+    prometheus_path=os.environ.get(PROMETHEUS_VAR) or None,
+)
+
+
+def span(name):
+    return TELEMETRY.span(name)
+
+
+def count(name, value=1, **labels):
+    TELEMETRY.count(name, value, **labels)
+
+
+def timed(name=None):
+    # Decorador: cada llamada a la función es un tramo ('name' o su nombre)
+    def decorador(func):
+        nombre = name or func.__name__
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with TELEMETRY.span(nombre):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorador
@@ -0,0 +1,55 @@
+# modules/views.py
+import importlib
+
+# Vistas del menú lateral, en el orden en que se muestran. Cada opción
+# apunta a la función show_* de su módulo y a los datos que recibe; el
+# módulo (y con él matplotlib) solo se importa la primera vez que se elige
+# la opción, así que arrancar la aplicación no carga las vistas que no se usan.
+VIEWS = {
+    "Dashboard ultimos registros": {
+        "module": "modules.dashboard",
+        "function": "show_dashboard",
+        "args": ("df", "dashboard", "quality"),
+    },
+    "Comparación Mensual Detallada": {
+        "module": "modules.monthly_comparison",
+        "function": "show_monthly_comparison",
+        "args": ("df", "cube", "version", "quality"),
+        "sin_datos": "No hay datos cargados para realizar la comparación mensual.",
+    },
+    "Promedios Históricos": {
+        "module": "modules.historical_averages",
+        "function": "show_historical_averages",
+        "args": ("df", "cube", "version", "other_stations", "quality"),
+        "sin_datos": "No hay datos cargados para calcular promedios históricos.",
+    },
+    "Análisis de Extremos Climáticos": {
+        "module": "modules.extreme_analysis",
+        "function": "show_extreme_analysis",
+        "args": ("df", "extremes", "quality"),
+        "sin_datos": "No hay datos cargados para realizar el análisis de extremos climáticos.",
+    },
+    "Comparación Anual": {
+        "module": "modules.annual_comparison",
+        "function": "show_annual_comparison",
+        "args": ("df", "cube", "version", "detail"),
+        "sin_datos": "No hay datos cargados para realizar la comparación anual.",
+    },
+    "Medias Móviles y Anomalías": {
+        "module": "modules.rolling_analysis",
+        "function": "show_rolling_analysis",
+        "args": ("df", "cube", "version", "rolling", "quality"),
+        "sin_datos": "No hay datos cargados para calcular medias móviles.",
+    },
+}
+
+
+def load_view(label):
+    # Función show_* de la vista (importa su módulo si aún no se ha hecho)
+    vista = VIEWS[label]
+    return getattr(importlib.import_module(vista["module"]), vista["function"])
+
+
+def view_arguments(label, context):
+    # Argumentos de la vista sacados del contexto común de la aplicación
+    return [context[nombre] for nombre in VIEWS[label]["args"]]
@@ -0,0 +1,6 @@
+# tests/conftest.py
+# Los tests importan los módulos de la aplicación desde la raíz del repositorio
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
@@ -0,0 +1,74 @@
+# tests/test_figure_cache.py
+# Caché LRU de gráficos: aciertos, fallos, descartes por tamaño y gráficos
+# compartidos con otros procesos.
+import pytest
+
+from modules import figure_cache
+from modules.figure_cache import FigureCache
+from modules.shared_cache import DiskBackend
+
+
+@pytest.fixture(autouse=True)
+def png_directo(monkeypatch):
+    # Los 'render' de estos tests devuelven ya los bytes de la imagen
+    monkeypatch.setattr(figure_cache, "figure_to_png", lambda fig: fig)
+
+
+def test_lru_eviction_by_total_size():
+    cache = FigureCache(max_bytes=10)
+    cache.put("a", b"1234")
+    cache.put("b", b"1234")
+    assert cache.get("a") == b"1234"  # 'a' pasa a ser la más reciente
+    cache.put("c", b"1234")           # 12 bytes: se descarta 'b'
+
+    assert cache.get("b") is None
+    assert cache.get("a") == b"1234"
+    assert cache.get("c") == b"1234"
+    assert cache.stats() == {
+        "aciertos": 3, "compartidos": 0, "fallos": 1, "descartes": 1, "entradas": 2, "bytes": 8,
+    }
+
+
+def test_replacing_a_key_and_oversized_images():
+    cache = FigureCache(max_bytes=10)
+    cache.put("a", b"1234")
+    cache.put("a", b"123456")
+    cache.put("grande", b"x" * 11)   # no cabe nunca: no se guarda
+    assert cache.stats()["bytes"] == 6
+    assert cache.stats()["entradas"] == 1
+    assert cache.stats()["descartes"] == 0
+    assert cache.get("grande") is None
+    cache.clear()
+    assert cache.stats()["bytes"] == 0
+    assert cache.get("a") is None
+
+
+def test_get_or_render_renders_once():
+    cache = FigureCache()
+    llamadas = []
+
+    def render():
+        llamadas.append(1)
+        return b"png"
+
+    assert cache.get_or_render(("v1", "vista"), render) == b"png"
+    assert cache.get_or_render(("v1", "vista"), render) == b"png"
+    assert len(llamadas) == 1
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_shared_figures_are_reused_by_other_processes(tmp_path):
+    compartida = DiskBackend(str(tmp_path))
+    primera = FigureCache(shared=compartida)
+    assert primera.get_or_render(("v1", "vista"), lambda: b"png") == b"png"
+
+    # Otro proceso (otra caché en memoria) con el mismo almacén no renderiza
+    segunda = FigureCache(shared=compartida)
+
+    def render():
+        raise AssertionError("no debería renderizar")
+
+    assert segunda.get_or_render(("v1", "vista"), render) == b"png"
+    assert segunda.stats()["compartidos"] == 1
+    assert segunda.get_or_render(("v1", "vista"), render) == b"png"
+    assert segunda.stats()["aciertos"] == 1
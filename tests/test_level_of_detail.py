@@ -0,0 +1,65 @@
+# tests/test_level_of_detail.py
+# Series reducidas de los gráficos de muchos años: mínimo, máximo y media de
+# cada tramo, vértices en orden y elección de la resolución.
+import numpy as np
+import pandas as pd
+import pytest
+
+from modules.climatology import ClimatologyCube
+from modules.level_of_detail import LEVELS, LevelOfDetail, VERTICES_PER_PX, choose_width, decimate
+
+
+def test_decimate_keeps_extremes_in_order():
+    matriz = np.array([
+        [1.0, 5.0, 3.0, 2.0, np.nan, 4.0, 0.0],
+        [np.nan, np.nan, 7.0, 6.0, np.nan, np.nan, np.nan],
+    ])
+    reducida = decimate(np.arange(10, 17), matriz, [2020, 2021], 3)
+
+    assert reducida.width == 3
+    np.testing.assert_array_equal(reducida.minimum, [[1, 2, 0], [7, 6, np.nan]])
+    np.testing.assert_array_equal(reducida.maximum, [[5, 4, 0], [7, 6, np.nan]])
+    np.testing.assert_allclose(reducida.mean, [[3, 3, 0], [7, 6, np.nan]])
+    # Primer tramo del primer año: el mínimo (posición 10) va antes que el
+    # máximo (11); en el segundo, el máximo (15) va después del mínimo (13)
+    np.testing.assert_array_equal(reducida.x[0, :4], [10, 11, 13, 15])
+    np.testing.assert_array_equal(reducida.vertices[0, :4], [1, 5, 2, 4])
+    np.testing.assert_array_equal(reducida.years, [2020, 2021])
+
+
+def test_decimate_width_one_is_the_original_series():
+    matriz = np.array([[3.0, np.nan, 1.0]])
+    reducida = decimate([1, 2, 3], matriz, [2024], 1)
+    np.testing.assert_array_equal(reducida.minimum, matriz)
+    np.testing.assert_array_equal(reducida.maximum, matriz)
+
+
+@pytest.mark.parametrize("puntos, lineas, ancho_px", [(366, 1, 800), (366, 30, 800), (366, 200, 400), (5000, 50, 300)])
+def test_choose_width_fits_the_budget(puntos, lineas, ancho_px):
+    ancho = choose_width(puntos, lineas, ancho_px)
+    vertices = puntos if ancho == 1 else 2 * -(-puntos // ancho)
+    assert vertices <= 2 * ancho_px
+    assert vertices * lineas <= VERTICES_PER_PX * ancho_px
+    # Es el más pequeño de los niveles que cabe
+    menores = [w for w in LEVELS if w < ancho]
+    for w in menores:
+        v = puntos if w == 1 else 2 * -(-puntos // w)
+        assert v > 2 * ancho_px or v * lineas > VERTICES_PER_PX * ancho_px
+
+
+def test_level_of_detail_matches_decimating_the_cube():
+    dias = pd.date_range('2020-01-01', '2022-12-31', freq='D')
+    df = pd.DataFrame({'DAY': dias.astype('datetime64[s]'),
+                       'TEMP_MEDIA': np.sin(np.arange(len(dias)) / 20).astype('float32')})
+    cube = ClimatologyCube.build(df)
+    detalle = LevelOfDetail(cube)
+
+    pivote = cube.mean('Dia_del_Año_Año', 'TEMP_MEDIA').unstack(level='Año')
+    for ancho in LEVELS[1:]:
+        esperado = decimate(pivote.index.to_numpy(), pivote.to_numpy(dtype='float64').T, pivote.columns.to_numpy(), ancho)
+        obtenido = detalle.series('TEMP_MEDIA', ancho)
+        np.testing.assert_array_equal(obtenido.vertices, esperado.vertices)
+        np.testing.assert_array_equal(obtenido.x, esperado.x)
+        assert obtenido.vertices.shape == (3, 2 * -(-366 // ancho))
+    assert detalle.series('TEMP_MEDIA', 3) is None
+    assert detalle.series('TEMP_MEDIA', 4) is detalle.series('TEMP_MEDIA', 4)
@@ -0,0 +1,183 @@
+# tests/test_refresh.py
+# Añadir registros al CSV y llamar a refresh() debe dejar el Dataset igual
+# que cargarlo de nuevo desde cero.
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from modules import data_loader
+from modules.dataset import Dataset
+from modules.shared_cache import set_default_backend
+
+SOURCE = os.path.join(os.path.dirname(__file__), os.pardir, "data", "datos_clima.csv")
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    # Caché columnar (relativa al directorio de trabajo) en una carpeta
+    # temporal y sin caché compartida
+    monkeypatch.chdir(tmp_path)
+    set_default_backend(None)
+    yield tmp_path
+    set_default_backend(None)
+
+
+def _lines():
+    with open(SOURCE, encoding="utf-8") as f:
+        return f.read().splitlines(keepends=True)
+
+
+def _append(path, lines):
+    with open(path, "a", encoding="utf-8") as f:
+        f.writelines(lines)
+
+
+def _fresh(path, workdir):
+    # Carga completa del mismo contenido desde otra ruta (sin caché previa)
+    copia = workdir / "completo" / os.path.basename(path)
+    copia.parent.mkdir(exist_ok=True)
+    shutil.copyfile(path, copia)
+    return Dataset(str(copia))
+
+
+def assert_same_dataset(actualizado, completo):
+    pd.testing.assert_frame_equal(actualizado.df.reset_index(drop=True), completo.df.reset_index(drop=True))
+
+    assert actualizado.cube.variables == completo.cube.variables
+    for name, stats in completo.cube.tables.items():
+        for stat, esperado in stats.items():
+            obtenido = actualizado.cube.tables[name][stat]
+            pd.testing.assert_frame_equal(obtenido.sort_index(), esperado.sort_index(), check_exact=False, rtol=1e-5)
+    assert actualizado.cube.years() == completo.cube.years()
+    assert actualizado.cube.months() == completo.cube.months()
+
+    assert actualizado.extremes.year_range == completo.extremes.year_range
+    for variable in completo.extremes.variables:
+        for largest in (True, False):
+            for filtros in ({}, {"months": [6, 7]}, {"years": (2020, 2025)}):
+                pd.testing.assert_frame_equal(
+                    actualizado.extremes.query(variable, 10, largest, **filtros),
+                    completo.extremes.query(variable, 10, largest, **filtros),
+                )
+
+    calidad, esperada = actualizado.quality, completo.quality
+    assert calidad.summary() == esperada.summary()
+    assert (calidad.start, calidad.end) == (esperada.start, esperada.end)
+    for tabla in ("missing_days", "duplicate_days", "out_of_range", "counts", "expected_days"):
+        esperado = getattr(esperada, tabla)
+        obtenido = getattr(calidad, tabla)
+        if isinstance(esperado, pd.DataFrame):
+            pd.testing.assert_frame_equal(obtenido, esperado)
+        else:
+            pd.testing.assert_series_equal(obtenido, esperado)
+    for variable in esperada.variables:
+        pd.testing.assert_frame_equal(calidad.gaps(variable), esperada.gaps(variable))
+
+    tablero, esperado = actualizado.dashboard, completo.dashboard
+    assert tablero.latest.date == esperado.latest.date
+    pd.testing.assert_frame_equal(tablero.latest.rows.reset_index(drop=True), esperado.latest.rows.reset_index(drop=True))
+    pd.testing.assert_frame_equal(tablero.latest.summary, esperado.latest.summary)
+    pd.testing.assert_frame_equal(tablero.last_records.reset_index(drop=True), esperado.last_records.reset_index(drop=True))
+    pd.testing.assert_frame_equal(tablero.comparison, esperado.comparison, check_exact=False, rtol=1e-5)
+    assert list(tablero.bands) == list(esperado.bands)
+    for variable, bandas in esperado.bands.items():
+        np.testing.assert_allclose(tablero.bands[variable].values, bandas.values, rtol=1e-5)
+
+    assert actualizado.version == completo.version
+
+
+@pytest.mark.parametrize("añadidas", [1, 40])
+def test_refresh_matches_full_reload(workdir, añadidas):
+    lineas = _lines()
+    path = str(workdir / "datos_clima.csv")
+    with open(path, "w", encoding="utf-8") as f:
+        f.writelines(lineas[:-añadidas])
+
+    dataset = Dataset(path)
+    # En dos tandas, la segunda con un día repetido (claves ya existentes)
+    primera = lineas[-añadidas:][: añadidas // 2]
+    segunda = lineas[-añadidas:][añadidas // 2:] + [lineas[-1]]
+    for tanda in (primera, segunda):
+        if tanda:
+            _append(path, tanda)
+            assert dataset.refresh() == len(tanda)
+            assert dataset.last_load["origen"] == "incremental"
+
+    assert_same_dataset(dataset, _fresh(path, workdir))
+
+
+def test_edited_row_reloads_and_is_not_served_from_cache(workdir):
+    # Un registro corregido en su sitio, lejos del final (mismo tamaño del
+    # fichero): refresh() tiene que volver a cargarlo entero y la caché en
+    # disco no puede seguir sirviendo el valor anterior a otro proceso
+    lineas = _lines()
+    path = str(workdir / "datos_clima.csv")
+    with open(path, "w", encoding="utf-8") as f:
+        f.writelines(lineas)
+    dataset = Dataset(path)
+    version = dataset.version
+
+    original = lineas[1]
+    campos = original.split(",")
+    assert campos[1] == '"5'
+    corregida = ",".join([campos[0], '"9'] + campos[2:])
+    assert len(corregida) == len(original)
+    with open(path, "r+", encoding="utf-8") as f:
+        f.seek(len(lineas[0]))
+        f.write(corregida)
+    os.utime(path, ns=(os.stat(path).st_atime_ns, os.stat(path).st_mtime_ns + 1_000_000_000))
+
+    assert dataset.refresh() == len(dataset.df)
+    assert dataset.last_load["origen"] != "incremental"
+    assert dataset.df["TEMP_MEDIA"].iloc[0] == pytest.approx(9.6)
+    assert dataset.version != version
+
+    # Otro proceso (un Dataset nuevo) lee la caché en disco que ha quedado
+    otro = Dataset(path)
+    assert otro.last_load["origen"] == "cache"
+    assert otro.df["TEMP_MEDIA"].iloc[0] == pytest.approx(9.6)
+    assert otro.version == dataset.version
+    assert_same_dataset(otro, _fresh(path, workdir))
+
+
+def test_unchanged_content_does_not_rewrite_the_cache(workdir):
+    # Si el fichero cambia de fecha pero no tiene registros nuevos, la
+    # caché en disco no cambia de firma
+    path = str(workdir / "datos_clima.csv")
+    with open(path, "w", encoding="utf-8") as f:
+        f.writelines(_lines())
+    dataset = Dataset(path)
+    manifiestos = list((workdir / "data" / ".cache").glob("*.json"))
+    antes = [m.read_text() for m in manifiestos]
+    os.utime(path, ns=(os.stat(path).st_atime_ns, os.stat(path).st_mtime_ns + 1_000_000_000))
+
+    assert dataset.refresh() == 0
+    assert dataset.last_load["origen"] == "incremental"
+    assert [m.read_text() for m in manifiestos] == antes
+
+
+def test_chunked_load_matches_single_pass(workdir, monkeypatch):
+    # Lectura por bloques (segmentos de caché y agregados que se van
+    # actualizando con cada bloque), registros añadidos y segunda carga desde
+    # la caché: todo igual que una lectura del CSV de una vez
+    lineas = _lines()
+    path = str(workdir / "datos_clima.csv")
+    with open(path, "w", encoding="utf-8") as f:
+        f.writelines(lineas[:-5])
+    monkeypatch.setattr(data_loader, "CHUNKED_MIN_BYTES", 0)
+    monkeypatch.setattr(data_loader, "CHUNK_ROWS", 500)
+
+    dataset = Dataset(path)
+    assert dataset.last_load["origen"] == "csv por bloques"
+    assert dataset.last_load["bloques"] > 1
+    _append(path, lineas[-5:])
+    assert dataset.refresh() == 5
+    assert Dataset(path).last_load["origen"] == "cache"
+
+    monkeypatch.undo()
+    completo = _fresh(path, workdir)
+    assert completo.last_load["origen"] == "csv"
+    assert_same_dataset(dataset, completo)
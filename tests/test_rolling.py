@@ -0,0 +1,99 @@
+# tests/test_rolling.py
+# Series móviles sobre el índice diario continuo: ventanas, acumulado anual,
+# anomalías y actualización con registros añadidos.
+import numpy as np
+import pandas as pd
+import pytest
+
+from modules.climatology import ClimatologyCube
+from modules.data_loader import add_calendar_columns
+from modules.rolling import MIN_COVERAGE, RollingEngine
+
+
+def _frame(fechas, **columnas):
+    return add_calendar_columns(pd.DataFrame({
+        'DAY': pd.to_datetime(fechas).astype('datetime64[s]'),
+        **{k: np.asarray(v, dtype='float32') for k, v in columnas.items()},
+    }))
+
+
+def _engine(df):
+    return RollingEngine(df, ClimatologyCube.build(df))
+
+
+def test_daily_index_fills_missing_days_and_averages_repeated_ones():
+    df = _frame(['2024-01-01', '2024-01-03', '2024-01-03'], TEMP_MEDIA=[1, 2, 4])
+    motor = _engine(df)
+    np.testing.assert_array_equal(motor.days, np.arange(np.datetime64('2024-01-01'), np.datetime64('2024-01-04')))
+    np.testing.assert_array_equal(motor.daily('TEMP_MEDIA'), [1, np.nan, 3])
+
+
+def test_windows_match_pandas_rolling():
+    dias = pd.date_range('2023-01-01', periods=60, freq='D')
+    valores = np.arange(60, dtype='float64')
+    valores[[5, 6, 7, 30]] = np.nan
+    motor = _engine(_frame(dias, TEMP_MEDIA=valores, LLUVIA=valores))
+    serie = pd.Series(valores)
+    for ventana in (7, 30):
+        minimo = int(np.ceil(MIN_COVERAGE * ventana))
+        esperado = serie.rolling(ventana, min_periods=1)
+        validos = serie.notna().rolling(ventana, min_periods=1).sum() >= minimo
+        np.testing.assert_allclose(motor.series('TEMP_MEDIA', 'mean', ventana).values,
+                                   esperado.mean().where(validos), equal_nan=True)
+        np.testing.assert_allclose(motor.series('LLUVIA', 'sum', ventana).values,
+                                   esperado.sum().where(validos), equal_nan=True)
+
+
+def test_cumulative_restarts_each_year():
+    motor = _engine(_frame(['2023-12-30', '2023-12-31', '2024-01-01', '2024-01-03'],
+                           GRADOS_DIA_CRECIMIENTO=[1, 2, 3, 4]))
+    serie = motor.series('GRADOS_DIA_CRECIMIENTO', 'cumulative', 30)
+    assert serie.window == 1
+    np.testing.assert_array_equal(serie.values, [1, 3, 3, 3, 7])
+
+
+def test_anomaly_is_the_difference_to_the_day_of_year_mean():
+    motor = _engine(_frame(['2023-03-01', '2024-03-01'], TEMP_MEDIA=[10, 14]))
+    serie = motor.series('TEMP_MEDIA', 'anomaly', 1)
+    # 2024 es bisiesto: el 1 de marzo es otro día del año
+    np.testing.assert_array_equal(serie.values[[0, -1]], [0, 0])
+    motor = _engine(_frame(['2023-01-05', '2024-01-05'], TEMP_MEDIA=[10, 14]))
+    np.testing.assert_array_equal(motor.series('TEMP_MEDIA', 'anomaly', 1).values[[0, -1]], [-2, 2])
+
+
+def test_unknown_kind():
+    with pytest.raises(ValueError):
+        _engine(_frame(['2024-01-01'], TEMP_MEDIA=[1])).series('TEMP_MEDIA', 'median', 7)
+
+
+@pytest.mark.parametrize("nuevas", [
+    ['2024-03-01', '2024-03-02'],            # al final
+    ['2024-02-10', '2024-03-20'],            # un día repetido y un hueco
+    ['2023-12-20'],                          # antes del primer día
+    ['2025-01-03'],                          # otro año
+])
+def test_updated_matches_a_new_engine(nuevas):
+    dias = pd.date_range('2024-01-01', '2024-02-29', freq='D')
+    rng = np.random.default_rng(0)
+    base = _frame(dias, TEMP_MEDIA=rng.normal(10, 3, len(dias)), LLUVIA=rng.exponential(2, len(dias)),
+                  GRADOS_DIA_CRECIMIENTO=rng.uniform(0, 5, len(dias)))
+    añadidas = _frame(nuevas, TEMP_MEDIA=rng.normal(10, 3, len(nuevas)), LLUVIA=rng.exponential(2, len(nuevas)),
+                      GRADOS_DIA_CRECIMIENTO=rng.uniform(0, 5, len(nuevas)))
+    tipos = [('TEMP_MEDIA', 'mean', 7), ('TEMP_MEDIA', 'mean', 1), ('LLUVIA', 'sum', 30),
+             ('GRADOS_DIA_CRECIMIENTO', 'cumulative', 1), ('TEMP_MEDIA', 'anomaly', 7)]
+
+    cube = ClimatologyCube.build(base)
+    motor = RollingEngine(base, cube)
+    anteriores = {tipo: motor.series(*tipo) for tipo in tipos}
+    completo = pd.concat([base, añadidas], ignore_index=True)
+    cube.update(añadidas)
+    actualizado = motor.updated(completo, añadidas, cube)
+    nuevo = _engine(completo)
+
+    for tipo in tipos:
+        obtenida, esperada = actualizado.series(*tipo), nuevo.series(*tipo)
+        np.testing.assert_array_equal(obtenida.days, esperada.days)
+        np.testing.assert_allclose(obtenida.values, esperada.values, rtol=1e-9, atol=1e-9, equal_nan=True)
+        # El motor anterior no cambia (las vistas en curso siguen usándolo)
+        assert motor.series(*tipo) is anteriores[tipo]
+    np.testing.assert_array_equal(motor.days, np.arange(np.datetime64('2024-01-01'), np.datetime64('2024-03-01')))
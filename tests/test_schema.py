@@ -0,0 +1,43 @@
+# tests/test_schema.py
+# Conversión de las columnas del CSV a los tipos compactos del esquema.
+import numpy as np
+import pandas as pd
+import pytest
+
+from modules.schema import TIME_DTYPE, _parse_times_regex, format_times, parse_dates, parse_times
+
+HORAS = pd.Series(
+    ['00:00', '07:05', '23:59', '7:05', '07:05:30', ' 07:05', '', None, np.nan, 'sin dato', '12:3', 'á 10:00'],
+    dtype=object,
+)
+
+
+def test_parse_times_fixed_and_irregular_formats():
+    minutos = parse_times(HORAS)
+    assert minutos.dtype == TIME_DTYPE
+    esperado = pd.Series([0, 425, 1439, 425, 425, 425, None, None, None, None, None, None], dtype=TIME_DTYPE)
+    pd.testing.assert_series_equal(minutos, esperado)
+
+
+@pytest.mark.parametrize("valores", [HORAS, HORAS[HORAS.notna()], HORAS.astype('str').where(HORAS.notna())])
+def test_parse_times_matches_regex(valores):
+    # La conversión por bytes da lo mismo que la expresión regular
+    esperado = _parse_times_regex(valores.fillna('')).astype(TIME_DTYPE)
+    pd.testing.assert_series_equal(parse_times(valores), esperado)
+
+
+def test_parse_times_keeps_the_index():
+    valores = pd.Series(['10:30', None], index=[7, 3], dtype=object)
+    pd.testing.assert_series_equal(parse_times(valores), pd.Series([630, None], index=[7, 3], dtype=TIME_DTYPE))
+
+
+def test_format_times_round_trip():
+    horas = pd.Series(['00:00', '07:05', '23:59', None], dtype=object)
+    assert format_times(parse_times(horas)).tolist() == ['00:00', '07:05', '23:59', '']
+
+
+def test_parse_dates_both_year_formats():
+    fechas = parse_dates(pd.Series(['01/02/24', '01/02/2024', '31/12/99', '', None, '32/01/2024'], dtype=object))
+    assert fechas.dtype == 'datetime64[s]'
+    assert fechas.iloc[:3].tolist() == [pd.Timestamp('2024-02-01'), pd.Timestamp('2024-02-01'), pd.Timestamp('1999-12-31')]
+    assert fechas.iloc[3:].isna().all()
@@ -0,0 +1,103 @@
+# tests/test_shared_cache.py
+# Almacenes de la caché compartida (carpeta y Redis) e instantáneas de una
+# estación leídas por otra réplica.
+import os
+import shutil
+
+import pytest
+
+from modules.dataset import Dataset
+from modules.shared_cache import (
+    DiskBackend, LocalRedis, RedisBackend, backend_from_url, load_snapshot, set_default_backend,
+)
+from test_refresh import SOURCE, assert_same_dataset
+
+
+@pytest.fixture(params=["disco", "redis"])
+def backend(request, tmp_path):
+    if request.param == "disco":
+        return DiskBackend(str(tmp_path / "compartida"))
+    return RedisBackend(LocalRedis())
+
+
+def test_round_trip(backend):
+    assert backend.get("a") is None
+    backend.set("a", b"datos")
+    backend.set("b", memoryview(b"otros"))
+    assert bytes(backend.get("a")) == b"datos"
+    assert bytes(backend.get("b")) == b"otros"
+    backend.set("a", b"nuevos")
+    assert bytes(backend.get("a")) == b"nuevos"
+    backend.delete("a")
+    backend.delete("no-existe")
+    assert backend.get("a") is None
+
+
+def test_redis_keys_have_the_prefix():
+    cliente = LocalRedis()
+    RedisBackend(cliente, prefix="x:").set("a", b"1")
+    assert cliente.get("x:a") == b"1"
+    assert RedisBackend(cliente, prefix="y:").get("a") is None
+
+
+def test_disk_prune_removes_the_least_recently_used(tmp_path):
+    compartida = DiskBackend(str(tmp_path))
+    for i, clave in enumerate(("a", "b", "c")):
+        compartida.set(clave, b"x" * 100)
+        os.utime(compartida._path(clave), (1000 + i, 1000 + i))
+    compartida.get("a")  # 'a' pasa a ser la usada más recientemente
+    compartida.max_bytes = 250
+    compartida.prune()
+    assert compartida.get("b") is None
+    assert compartida.get("a") is not None
+    assert compartida.get("c") is not None
+
+
+def test_backend_from_url(tmp_path):
+    assert isinstance(backend_from_url(""), DiskBackend)
+    assert backend_from_url("off") is None
+    assert isinstance(backend_from_url("memory://"), RedisBackend)
+    carpeta = backend_from_url(str(tmp_path))
+    assert isinstance(carpeta, DiskBackend) and carpeta.directory == str(tmp_path)
+
+
+def test_snapshot_is_shared_between_replicas(backend, tmp_path, monkeypatch):
+    # Dos réplicas con su propia copia del CSV (y su propia caché local): la
+    # segunda lee la estación de la caché compartida, también cuando su CSV
+    # ya tiene registros añadidos después de publicarla
+    with open(SOURCE, encoding="utf-8") as f:
+        lineas = f.read().splitlines(keepends=True)
+    replicas = []
+    for nombre in ("a", "b"):
+        carpeta = tmp_path / nombre
+        (carpeta / "data").mkdir(parents=True)
+        with open(carpeta / "data" / "datos_clima.csv", "w", encoding="utf-8") as f:
+            f.writelines(lineas[:-3])
+        replicas.append(carpeta)
+    set_default_backend(backend)
+    try:
+        monkeypatch.chdir(replicas[0])
+        origen = Dataset(os.path.join("data", "datos_clima.csv"))
+        assert origen.last_load["origen"] == "csv"
+
+        monkeypatch.chdir(replicas[1])
+        path = os.path.join("data", "datos_clima.csv")
+        copia = Dataset(path)
+        assert copia.last_load["origen"] == "caché compartida"
+        assert_same_dataset(copia, origen)
+
+        with open(path, "a", encoding="utf-8") as f:
+            f.writelines(lineas[-3:])
+        snapshot = load_snapshot(backend, path)
+        assert snapshot.new_rows == 3
+        assert len(snapshot.df) == len(origen.df) + 3
+    finally:
+        set_default_backend(None)
+
+    completo = tmp_path / "completo"
+    completo.mkdir()
+    shutil.copyfile(path, completo / "datos_clima.csv")
+    monkeypatch.chdir(completo)
+    esperado = Dataset("datos_clima.csv")
+    assert snapshot.version == esperado.version
+    assert snapshot.state == esperado._state
@@ -0,0 +1,84 @@
+# tests/test_telemetry.py
+# Tramos, contadores y exportación de las métricas (línea JSON por traza y
+# formato de texto de Prometheus).
+import json
+
+from modules.telemetry import BUCKETS, Telemetry
+
+
+def _tramos(telemetria):
+    return telemetria.snapshot()["tramos"]
+
+
+def test_spans_and_events_outside_a_trace():
+    telemetria = Telemetry()
+    with telemetria.span("carga"):
+        with telemetria.span("lectura"):
+            pass
+    telemetria.count("cache", resultado="acierto")
+    telemetria.count("cache", 2, resultado="acierto")
+    telemetria.count("cache", resultado="fallo")
+
+    assert set(_tramos(telemetria)) == {("carga", ()), ("carga/lectura", ())}
+    assert _tramos(telemetria)[("carga", ())][0] == 1
+    assert telemetria.snapshot()["eventos"] == {
+        ("cache", (("resultado", "acierto"),)): 3,
+        ("cache", (("resultado", "fallo"),)): 1,
+    }
+
+
+def test_trace_adds_its_labels_when_it_finishes(tmp_path):
+    registro = tmp_path / "trazas.jsonl"
+    telemetria = Telemetry(log_path=str(registro))
+    traza = telemetria.start_trace("ejecucion", estacion="a")
+    with telemetria.span("vista"):
+        telemetria.count("cache", resultado="fallo")
+    traza.labels["vista"] = "dashboard"
+    # Hasta que termina la traza no llega nada a las métricas del proceso
+    assert telemetria.snapshot() == {"tramos": {}, "eventos": {}}
+    telemetria.finish_trace(traza)
+
+    etiquetas = (("estacion", "a"), ("vista", "dashboard"))
+    assert set(_tramos(telemetria)) == {("ejecucion", etiquetas), ("vista", etiquetas)}
+    assert telemetria.snapshot()["eventos"] == {
+        ("cache", (("estacion", "a"), ("resultado", "fallo"), ("vista", "dashboard"))): 1,
+    }
+    linea = json.loads(registro.read_text(encoding="utf-8"))
+    assert linea["traza"] == "ejecucion"
+    assert linea["vista"] == "dashboard"
+    assert [t["tramo"] for t in linea["tramos"]] == ["vista"]
+    assert linea["eventos"] == {"cache": {"resultado=fallo": 1}}
+
+
+def test_disabled_telemetry_records_nothing():
+    telemetria = Telemetry(enabled=False)
+    traza = telemetria.start_trace("ejecucion")
+    with telemetria.span("vista"):
+        telemetria.count("cache")
+    telemetria.finish_trace(traza)
+    assert telemetria.snapshot() == {"tramos": {}, "eventos": {}}
+
+
+def test_prometheus_export(tmp_path):
+    telemetria = Telemetry()
+    with telemetria.span("carga"):
+        pass
+    telemetria.count("cache", resultado='a"b')
+    telemetria.register("figuras", lambda: {"bytes": 10, "entradas": 2})
+    telemetria.register("roto", lambda: 1 / 0)
+    ruta = tmp_path / "metricas.prom"
+    telemetria.write_prometheus(str(ruta))
+    lineas = ruta.read_text(encoding="utf-8").splitlines()
+
+    cubetas = [l for l in lineas if l.startswith('meteo_span_seconds_bucket{span="carga"')]
+    assert len(cubetas) == len(BUCKETS) + 1
+    assert cubetas[-1] == 'meteo_span_seconds_bucket{span="carga",le="+Inf"} 1'
+    # Histograma acumulado: cada intervalo cuenta los anteriores
+    valores = [int(l.rsplit(" ", 1)[1]) for l in cubetas]
+    assert valores == sorted(valores)
+    assert 'meteo_span_seconds_count{span="carga"} 1' in lineas
+    assert 'meteo_events_total{event="cache",resultado="a\\"b"} 1' in lineas
+    assert 'meteo_figuras{stat="bytes"} 10' in lineas
+    assert 'meteo_figuras{stat="entradas"} 2' in lineas
+    # Un colector que falla no impide exportar el resto
+    assert not any(l.startswith("meteo_roto{") for l in lineas)